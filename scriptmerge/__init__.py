@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Any, Callable, List
+from typing import IO, Any, Callable, List
 import os
 
 __version__ = "3.1.0"
@@ -8,8 +8,20 @@ __version__ = "3.1.0"
 from scriptmerge import merge_common as mc
 from scriptmerge.merge_common import EventArgs as EventArgs
 from scriptmerge.merge_common import CancelEventArgs as CancelEventArgs
+from scriptmerge.merge_common import BuildResult as BuildResult
+from scriptmerge.cache import ArtifactCache as ArtifactCache
+from scriptmerge.cache import ImportCache as ImportCache
+from scriptmerge.module_graph import ModuleGraph as ModuleGraph
+from scriptmerge.module_graph import resolve_module_graph as resolve_module_graph
+from scriptmerge.module_filter import ModuleFilter as ModuleFilter
+from scriptmerge.source_store import SourceStore as SourceStore
+from scriptmerge.payload import PayloadEncoder as PayloadEncoder
+from scriptmerge.transforms import TransformPipeline as TransformPipeline
+from scriptmerge.transforms import TransformStage as TransformStage
+from scriptmerge.transforms import register_transform as register_transform
 from scriptmerge import merge_py as merge_py
 from scriptmerge import merge_pyz as merge_pyz
+from scriptmerge.watch import Watcher as Watcher
 
 # set a flag to indicate that we are running in the scriptmerge context
 os.environ["SCRIPT_MERGE_ENVIRONMENT"] = "1"
@@ -65,10 +77,10 @@ def script(
     if pyz_out:
         subscript = merge_pyz.script
 
-        include_main_py = bool(kwargs.get("include_main_py", True))
+        include_main_py = bool(kwargs.pop("include_main_py", True))
     else:
         subscript = merge_py.script
-        include_main_py = bool(kwargs.get("include_main_py", False))
+        include_main_py = bool(kwargs.pop("include_main_py", False))
     return subscript(
         path=path,
         add_python_modules=add_python_modules,
@@ -81,3 +93,60 @@ def script(
         include_main_py=include_main_py,
         **kwargs,
     )
+
+
+def script_to(
+    target: str | os.PathLike | IO,
+    path: str,
+    add_python_modules: List[str] | None = None,
+    add_python_paths: List[str] = None,
+    python_binary: str | None = None,
+    copy_shebang: bool = False,
+    exclude_python_modules: List[str] | None = None,
+    clean: bool = False,
+    pyz_out: bool = False,
+    callback: Callable[[Any, EventArgs], None] | None = None,
+    **kwargs: Any,
+) -> BuildResult:
+    """
+    Generate Script to a file or stream
+
+    Same as ``script()``, but the output is written to ``target`` as it is generated
+    instead of being returned, so the whole output is never held in memory.
+
+    Args:
+        target (str | os.PathLike | IO): Path of the output file, or a stream such as ``sys.stdout``.
+        path (str): Path to entry point py file
+        add_python_modules (List[str] | None, optional): Extra Python modules to include.
+        add_python_paths (List[str], optional): Extra Python paths used to search for modules.
+        python_binary (str | None, optional): Path to any binary to include.
+        copy_shebang (bool, optional): Copy Shebang.
+        exclude_python_modules (List[str] | None, optional): One or more regular expressions that match Module names to exclude as.
+            Such as ["greetings*"]
+        clean (bool, optional): Remove comments and doc strings. Defaults to False.
+        pyz_out (bool, optional): Specifies if the script should be written as a binary pyz file. Defaults to False.
+        callback (Callable[[Any, EventArgs], None] | None, optional): Callback function.
+
+    Returns:
+        BuildResult: Whether the output was written, its fingerprint with ``skip_unchanged``,
+        and the files the output depends on.
+    """
+    if pyz_out:
+        subscript_to = merge_pyz.script_to
+        include_main_py = bool(kwargs.pop("include_main_py", True))
+    else:
+        subscript_to = merge_py.script_to
+        include_main_py = bool(kwargs.pop("include_main_py", False))
+    return subscript_to(
+        target,
+        path=path,
+        add_python_modules=add_python_modules,
+        add_python_paths=add_python_paths,
+        python_binary=python_binary,
+        copy_shebang=copy_shebang,
+        exclude_python_modules=exclude_python_modules,
+        clean=clean,
+        callback=callback,
+        include_main_py=include_main_py,
+        **kwargs,
+    )
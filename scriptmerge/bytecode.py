@@ -0,0 +1,215 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
+import importlib.util
+import marshal
+import os.path
+import shutil
+import subprocess
+import sys
+
+BytecodeKey = Tuple[bytes, int]
+"""``(magic number, optimization level)`` the bytecode was compiled for."""
+
+BYTECODE_LOADER_MODULE = "_scriptmerge_bytecode"
+"""Name of the module of a ``.pyz`` output that names the code of its ``.pyc`` files."""
+
+# Compiles a module, in the running interpreter and in a target interpreter. A prologue is
+# added after the doc string and the __future__ imports of the module, on the line of the
+# statement that follows, so the line numbers of the module do not change.
+_COMPILE_MODULE = """
+def compile_module(path, source, prologue, optimize):
+    if prologue is None:
+        return compile(source, path, "exec", dont_inherit=True, optimize=optimize)
+    import ast
+    tree = ast.parse(source, path)
+    index = 0
+    for index, node in enumerate(tree.body):
+        is_doc_string = (
+            index == 0
+            and isinstance(node, ast.Expr)
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str)
+        )
+        is_future = isinstance(node, ast.ImportFrom) and node.module == "__future__"
+        if not (is_doc_string or is_future):
+            break
+    else:
+        index = len(tree.body)
+    lineno = tree.body[min(index, len(tree.body) - 1)].lineno if tree.body else 1
+    nodes = ast.parse(prologue).body
+    for node in nodes:
+        for child in ast.walk(node):
+            if "lineno" in child._attributes:
+                child.lineno = child.end_lineno = lineno
+                child.col_offset = child.end_col_offset = 0
+    tree.body[index:index] = nodes
+    return compile(tree, path, "exec", dont_inherit=True, optimize=optimize)
+"""
+
+# Run by a target interpreter: reads marshalled (path, source) pairs and prologues by path from
+# stdin and writes its magic number and the marshalled code of each source, None if it does not compile.
+_COMPILE_SCRIPT = _COMPILE_MODULE + """
+import importlib.util, marshal, sys
+items, prologues = marshal.loads(sys.stdin.buffer.read())
+optimize = int(sys.argv[1])
+codes = []
+for path, source in items:
+    try:
+        codes.append(marshal.dumps(compile_module(path, source, prologues.get(path), optimize)))
+    except (SyntaxError, ValueError):
+        codes.append(None)
+sys.stdout.buffer.write(marshal.dumps((importlib.util.MAGIC_NUMBER, codes), 4))
+"""
+# Run by a target interpreter: writes its version and magic number.
+_VERSION_SCRIPT = "import importlib.util, sys; print(sys.version, importlib.util.MAGIC_NUMBER.hex())"
+# versions of the target interpreters by binary, with the stat of the binary they were read for.
+_versions: Dict[str, Tuple[Any, str]] = {}
+_compile_namespace: Dict[str, Any] = {}
+exec(_COMPILE_MODULE, _compile_namespace)
+_compile_module = _compile_namespace["compile_module"]
+
+
+def compile_bytecode(
+    modules: Iterable[Tuple[str, bytes]],
+    python_binaries: Sequence[str | None] = (None,),
+    optimize: int = 0,
+    prologues: Mapping[str, str] | None = None,
+) -> Dict[str, Dict[BytecodeKey, bytes]]:
+    """
+    Compiles modules to marshalled code objects for one or more Python interpreters.
+
+    The running interpreter compiles in process, any other binary compiles all the
+    modules in a single subprocess. Binaries with the same magic number share one result.
+    A module that does not compile for a target has no bytecode for it, the output
+    falls back to its source.
+
+    Args:
+        modules (Iterable[Tuple[str, bytes]]): ``(relative path, source)`` of each module.
+        python_binaries (Sequence[str | None], optional): Interpreters to compile for,
+            ``None`` is the running interpreter. Defaults to the running interpreter.
+        optimize (int, optional): Optimization level, ``1`` as ``-O`` and ``2`` as ``-OO``. Defaults to ``0``.
+        prologues (Mapping[str, str], optional): Code compiled at the start of a module, by relative path.
+            It runs after the doc string and ``__future__`` imports, and leaves the line numbers as they are.
+
+    Raises:
+        ValueError: If ``optimize`` is not ``0``, ``1`` or ``2``.
+        subprocess.CalledProcessError: If a target interpreter fails to run.
+
+    Returns:
+        Dict[str, Dict[BytecodeKey, bytes]]: Marshalled code by relative path, then by ``(magic, optimize)``.
+    """
+    if optimize not in (0, 1, 2):
+        raise ValueError(f"optimize must be 0, 1 or 2, not {optimize!r}")
+    prologues = dict(prologues or {})
+    items = [(path, bytes(source)) for path, source in modules]
+    result: Dict[str, Dict[BytecodeKey, bytes]] = {path: {} for path, _ in items}
+    seen: List[bytes] = []
+    for python_binary in python_binaries:
+        if _is_running_python(python_binary):
+            magic, codes = importlib.util.MAGIC_NUMBER, _compile_in_process(
+                items, optimize, prologues
+            )
+        else:
+            magic, codes = _compile_with_binary(python_binary, items, optimize, prologues)
+        if magic in seen:
+            continue
+        seen.append(magic)
+        for (path, _), code in zip(items, codes):
+            if code is not None:
+                result[path][(magic, optimize)] = code
+    return result
+
+
+def interpreter_version(python_binary: str | None) -> str:
+    """
+    Gets the version and magic number of the interpreter bytecode is compiled for.
+
+    Another binary is run once and its version is kept until the binary changes.
+
+    Args:
+        python_binary (str | None): Python binary, ``None`` is the running interpreter.
+
+    Raises:
+        subprocess.CalledProcessError: If the interpreter fails to run.
+
+    Returns:
+        str: ``sys.version`` of the interpreter and its magic number in hex.
+    """
+    if _is_running_python(python_binary):
+        return f"{sys.version} {importlib.util.MAGIC_NUMBER.hex()}"
+    path = shutil.which(python_binary) or python_binary
+    try:
+        stat = os.stat(path)
+        key: Any = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        key = None
+    cached = _versions.get(python_binary)
+    if cached is not None and key is not None and cached[0] == key:
+        return cached[1]
+    version = subprocess.run(
+        [python_binary, "-c", _VERSION_SCRIPT],
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout.strip()
+    _versions[python_binary] = (key, version)
+    return version
+
+
+def _is_running_python(python_binary: str | None) -> bool:
+    if not python_binary:
+        return True
+    return os.path.realpath(python_binary) == os.path.realpath(sys.executable)
+
+
+def _compile_in_process(
+    items: List[Tuple[str, bytes]], optimize: int, prologues: Dict[str, str] | None = None
+) -> List[bytes | None]:
+    prologues = prologues or {}
+    codes: List[bytes | None] = []
+    for path, source in items:
+        try:
+            code = _compile_module(path, source, prologues.get(path), optimize)
+        except (SyntaxError, ValueError):
+            codes.append(None)
+        else:
+            codes.append(marshal.dumps(code))
+    return codes
+
+
+def _compile_with_binary(
+    python_binary: str,
+    items: List[Tuple[str, bytes]],
+    optimize: int,
+    prologues: Dict[str, str] | None = None,
+) -> Tuple[bytes, List[bytes | None]]:
+    output = subprocess.run(
+        [python_binary, "-c", _COMPILE_SCRIPT, str(optimize)],
+        input=marshal.dumps((items, prologues or {}), 4),
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    magic, codes = marshal.loads(output)
+    return magic, list(codes)
+
+
+def bytecode_loader_source() -> str:
+    """
+    Gets the source of the module a ``.pyz`` output with ``.pyc`` files imports first.
+
+    zipimport runs the code of a ``.pyc`` with the file name it was compiled with, the path
+    of the module in the archive. The module gives that code the path of the archive in front,
+    as the code compiled from a source gets, so tracebacks are the same with or without bytecode.
+
+    Returns:
+        str: Loader source.
+    """
+    with open(bytecode_loader_path(), encoding="utf-8") as loader_file:
+        return loader_file.read()
+
+
+def bytecode_loader_path() -> str:
+    """
+    Gets the path of the file the bytecode loader is read from.
+    """
+    return os.path.join(os.path.dirname(__file__), "prelude_bytecode.py")
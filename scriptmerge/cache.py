@@ -0,0 +1,383 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# bump when the layout of cached entries changes so stale entries are ignored.
+CACHE_FORMAT = "1"
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+# the Python an entry was made by, ast and tokenize change between versions.
+_PYTHON_TAG = sys.implementation.cache_tag or "{}-{}{}".format(
+    sys.implementation.name, *sys.version_info[:2]
+)
+
+RawImport = Tuple[Any, int, List[str]]
+
+
+def default_cache_dir() -> Path:
+    """
+    Gets the default cache directory.
+
+    ``SCRIPTMERGE_CACHE_DIR`` takes priority, then ``XDG_CACHE_HOME``
+    and finally ``~/.cache/scriptmerge``.
+    """
+    env_dir = os.environ.get("SCRIPTMERGE_CACHE_DIR", "")
+    if env_dir:
+        return Path(env_dir)
+    xdg_dir = os.environ.get("XDG_CACHE_HOME", "")
+    if xdg_dir:
+        return Path(xdg_dir) / "scriptmerge"
+    return Path.home() / ".cache" / "scriptmerge"
+
+
+class DiskCache:
+    """
+    Size bounded key/value store of small binary blobs on disk.
+
+    Entries are written atomically and evicted least recently used first
+    once the total size of the store grows past ``max_size`` bytes.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        namespace: str = "",
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            cache_dir (str | Path, optional): Root cache directory. Defaults to ``default_cache_dir()``.
+            namespace (str, optional): Sub directory of ``cache_dir`` used by this store.
+            max_size (int, optional): Maximum size in bytes before old entries are evicted.
+        """
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        root = Path(cache_dir)
+        self.cache_dir = root / namespace if namespace else root
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Gets the entry stored for ``key`` or ``None``.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            # refresh mtime, it is the recency used by prune()
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return data
+
+    def set(self, key: str, data: bytes) -> None:
+        """
+        Stores ``data`` for ``key``.
+
+        The entry is written to a temporary file and renamed into place so
+        concurrent readers never see a partial entry. Errors are ignored, a
+        cache that cannot be written behaves like an empty cache.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=entry_path.parent, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_name, entry_path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_name)
+                raise
+        except OSError:
+            return
+        self._dirty = True
+
+    def prune(self) -> int:
+        """
+        Evicts least recently used entries until the store is at most ``max_size`` bytes.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        if not self._dirty:
+            return 0
+        self._dirty = False
+        entries = []
+        total = 0
+        try:
+            shards = list(os.scandir(self.cache_dir))
+        except OSError:
+            return 0
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            with contextlib.suppress(OSError):
+                for entry in os.scandir(shard.path):
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                    total += st.st_size
+        if total <= self.max_size:
+            return 0
+        removed = 0
+        entries.sort()
+        for _, size, entry_path in entries:
+            if total <= self.max_size:
+                break
+            with contextlib.suppress(OSError):
+                os.remove(entry_path)
+                removed += 1
+            total -= size
+        return removed
+
+    def clear(self) -> None:
+        """
+        Removes every entry in the store.
+        """
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Gets hit and miss counters for this instance.
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Gets the share of lookups of this instance that were hits, from ``0.0`` to ``1.0``.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ImportCache(DiskCache):
+    """
+    Persistent cache of the import statements found in a module.
+
+    Entries are keyed by the path, ``st_mtime_ns`` and size of the file, and by the
+    version of Python that parsed it. When that key misses, for instance after a fresh checkout, the content
+    hash of the file is tried before the file is parsed again.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            cache_dir (str | Path, optional): Root cache directory. Defaults to ``default_cache_dir()``.
+            max_size (int, optional): Maximum size in bytes before old entries are evicted.
+        """
+        super().__init__(cache_dir=cache_dir, namespace="imports", max_size=max_size)
+
+    def get_imports(
+        self,
+        path: str,
+        parse: Callable[[bytes], List[RawImport]],
+        read: Callable[[str], bytes],
+    ) -> List[RawImport]:
+        """
+        Gets the raw imports of a file, parsing it only on a cache miss.
+
+        Args:
+            path (str): Path of the python file.
+            parse (Callable[[bytes], List[RawImport]]): Extracts ``(module, level, names)`` tuples from source.
+            read (Callable[[str], bytes]): Reads the source of ``path``.
+
+        Returns:
+            List[RawImport]: ``(module, level, names)`` for each import statement.
+        """
+        lookup = self.lookup(path, read)
+        if lookup.imports is not None:
+            return lookup.imports
+        imports = parse(lookup.source)
+        self.store(lookup, imports)
+        return imports
+
+    def lookup(self, path: str, read: Callable[[str], bytes]) -> ImportLookup:
+        """
+        Looks up the raw imports of a file without parsing it.
+
+        On a miss the returned lookup carries the source that was read to compute
+        the content hash; parse it and pass the result to ``store()``.
+
+        Args:
+            path (str): Path of the python file.
+            read (Callable[[str], bytes]): Reads the source of ``path``.
+
+        Returns:
+            ImportLookup: Lookup result, ``imports`` is ``None`` on a miss.
+        """
+        lookup = ImportLookup(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.misses += 1
+            lookup.source = read(path)
+            return lookup
+        lookup.stat_key = _hash_key(
+            "s", _PYTHON_TAG, os.path.abspath(path), str(st.st_mtime_ns), str(st.st_size)
+        )
+        lookup.imports = self._load(lookup.stat_key)
+        if lookup.imports is not None:
+            self.hits += 1
+            return lookup
+
+        lookup.source = read(path)
+        lookup.content_key = _hash_key(
+            "c", _PYTHON_TAG, hashlib.sha256(lookup.source).hexdigest()
+        )
+        lookup.imports = self._load(lookup.content_key)
+        if lookup.imports is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._store(lookup.stat_key, lookup.imports)
+        return lookup
+
+    def store(self, lookup: ImportLookup, imports: List[RawImport]) -> None:
+        """
+        Stores the imports parsed after a missed ``lookup()``.
+        """
+        lookup.imports = imports
+        for key in (lookup.content_key, lookup.stat_key):
+            if key:
+                self._store(key, imports)
+
+    def _load(self, key: str) -> List[RawImport] | None:
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return [
+                (module, level, list(names))
+                for module, level, names in json.loads(data.decode("utf-8"))
+            ]
+        except (ValueError, TypeError):
+            return None
+
+    def _store(self, key: str, imports: List[RawImport]) -> None:
+        self.set(key, json.dumps(imports).encode("utf-8"))
+
+
+class ArtifactCache(DiskCache):
+    """
+    Persistent cache of the transformed contents of modules, such as cleaned source.
+
+    Entries are keyed by the transform, the content hash of the module and the version
+    of Python, not by its path, so ``.py`` and ``.pyz`` builds, and other projects bundling the same
+    file, share them.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            cache_dir (str | Path, optional): Root cache directory. Defaults to ``default_cache_dir()``.
+            max_size (int, optional): Maximum size in bytes before old entries are evicted.
+        """
+        super().__init__(cache_dir=cache_dir, namespace="artifacts", max_size=max_size)
+
+    def get_artifact(
+        self,
+        transform: str,
+        source: bytes,
+        build: Callable[[bytes], bytes],
+    ) -> bytes:
+        """
+        Gets the result of a transform of a module, building it only on a cache miss.
+
+        Args:
+            transform (str): Name of the transform, including anything its result depends on
+                besides the source, such as a version.
+            source (bytes): Contents of the module.
+            build (Callable[[bytes], bytes]): Transforms ``source``.
+
+        Returns:
+            bytes: Transformed contents.
+        """
+        data = self.lookup(transform, source)
+        if data is None:
+            data = build(source)
+            self.store(transform, source, data)
+        return data
+
+    def lookup(self, transform: str, source: bytes) -> bytes | None:
+        """
+        Looks up the result of a transform of a module without building it.
+
+        Args:
+            transform (str): Name of the transform.
+            source (bytes): Contents of the module.
+
+        Returns:
+            bytes | None: Transformed contents, ``None`` on a miss.
+        """
+        data = self.get(self._artifact_key(transform, source))
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def store(self, transform: str, source: bytes, data: bytes) -> None:
+        """
+        Stores the result of a transform built after a missed ``lookup()``.
+
+        Args:
+            transform (str): Name of the transform.
+            source (bytes): Contents of the module.
+            data (bytes): Transformed contents.
+        """
+        self.set(self._artifact_key(transform, source), data)
+
+    def _artifact_key(self, transform: str, source: bytes) -> str:
+        return _hash_key("a", _PYTHON_TAG, transform, hashlib.sha256(source).hexdigest())
+
+
+class ImportLookup:
+    """
+    Result of ``ImportCache.lookup()``.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.imports: List[RawImport] | None = None
+        self.source: bytes | None = None
+        self.stat_key = ""
+        self.content_key = ""
+
+
+def _hash_key(*parts: str) -> str:
+    return hashlib.sha256(
+        "\0".join((CACHE_FORMAT,) + parts).encode("utf-8")
+    ).hexdigest()
+
@@ -0,0 +1,67 @@
+from __future__ import annotations
+from typing import IO, Iterable, List
+import os
+
+from scriptmerge import merge_common
+from scriptmerge.extensions import loader_path
+from scriptmerge.module_graph import ModuleGraph
+
+
+def graph_dependencies(module_graph: ModuleGraph, extra: Iterable[str] = ()) -> List[str]:
+    """
+    Gets the files an output built from a graph depends on.
+
+    Args:
+        module_graph (ModuleGraph): Resolved modules of the build.
+        extra (Iterable[str], optional): More files read by the writer, such as its prelude.
+
+    Returns:
+        List[str]: The entry point script, each module in the order it is written, the
+        extension module loader when the graph has extension modules, and ``extra``.
+        Each path is given once.
+    """
+    paths = [module_graph.path]
+    has_extensions = False
+    for module in module_graph:
+        paths.append(module.absolute_path)
+        has_extensions = has_extensions or module.is_extension
+    if has_extensions:
+        paths.append(loader_path())
+    paths.extend(extra)
+    return list(dict.fromkeys(paths))
+
+
+def format_depfile(targets: Iterable[str], dependencies: Iterable[str]) -> str:
+    """
+    Gets a Makefile rule of the targets and the files they depend on, as read by ``make`` and ``ninja``.
+
+    Args:
+        targets (Iterable[str]): Paths of the outputs.
+        dependencies (Iterable[str]): Paths of the files the outputs are built from.
+
+    Returns:
+        str: Depfile contents.
+    """
+    lines = [" ".join(_escape(target) for target in targets) + ":"]
+    lines.extend(" " + _escape(path) for path in dependencies)
+    return " \\\n".join(lines) + "\n"
+
+
+def write_depfile(
+    target: str | os.PathLike | IO, targets: Iterable[str], dependencies: Iterable[str]
+) -> None:
+    """
+    Writes a depfile, see ``format_depfile()``.
+
+    Args:
+        target (str | os.PathLike | IO): Path of the depfile, or a stream.
+        targets (Iterable[str]): Paths of the outputs.
+        dependencies (Iterable[str]): Paths of the files the outputs are built from.
+    """
+    with merge_common.open_output(target) as output:
+        output.write(format_depfile(targets, dependencies))
+
+
+def _escape(path: str) -> str:
+    # the escapes make and ninja both read back, a backslash only escapes a space or '#'.
+    return path.replace("$", "$$").replace("#", "\\#").replace(" ", "\\ ")
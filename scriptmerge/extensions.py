@@ -0,0 +1,81 @@
+from __future__ import annotations
+import ast
+import hashlib
+import os
+
+EXTENSION_LOADER_MODULE = "_scriptmerge_extensions"
+"""Name of the module of a ``.pyz`` output that loads its extension modules."""
+
+
+def extension_key(contents: bytes) -> str:
+    """
+    Gets the name of the cache directory an extension module is extracted to at runtime.
+
+    Args:
+        contents (bytes): Contents of the extension module.
+
+    Returns:
+        str: Hash of the contents.
+    """
+    return hashlib.sha256(contents).hexdigest()[:32]
+
+
+def loader_source() -> str:
+    """
+    Gets the source of the extension module loader.
+
+    It defines ``__scriptmerge_add_extension(name, path, key, contents=None, encoding=None)``,
+    which registers an extension module with a ``sys.meta_path`` finder. The loader holds no
+    multi-line strings, so it can be indented into a block of a ``.py`` output.
+
+    Returns:
+        str: Loader source.
+    """
+    with open(loader_path(), encoding="utf-8") as loader_file:
+        return loader_file.read()
+
+
+def loader_path() -> str:
+    """
+    Gets the path of the file the extension module loader is read from.
+    """
+    return os.path.join(os.path.dirname(__file__), "prelude_extensions.py")
+
+
+def insert_loader_import(source: bytes) -> bytes:
+    """
+    Imports the extension module loader at the start of a ``__main__.py``.
+
+    The import goes after the module doc string and any ``from __future__`` imports,
+    which must come first, and after a shebang or encoding declaration.
+
+    Args:
+        source (bytes): ``__main__.py`` contents.
+
+    Returns:
+        bytes: Contents with the import.
+    """
+    lines = source.splitlines(True)
+    index = 0
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        tree = None
+    if tree is not None:
+        for position, node in enumerate(tree.body):
+            is_doc_string = (
+                position == 0
+                and isinstance(node, ast.Expr)
+                and isinstance(node.value, ast.Constant)
+                and isinstance(node.value.value, str)
+            )
+            is_future = isinstance(node, ast.ImportFrom) and node.module == "__future__"
+            if not (is_doc_string or is_future):
+                break
+            index = node.end_lineno
+    while index < min(2, len(lines)) and lines[index].lstrip().startswith(b"#"):
+        index += 1
+    if index > 0 and not lines[index - 1].endswith((b"\n", b"\r")):
+        lines[index - 1] += b"\n"
+    lines.insert(index, f"import {EXTENSION_LOADER_MODULE}  # loads the bundled extension modules\n".encode())
+    return b"".join(lines)
@@ -0,0 +1,199 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Mapping, Tuple
+import hashlib
+import os
+import sys
+import zipfile
+
+from scriptmerge.bytecode import interpreter_version
+from scriptmerge.merge_common import BuildResult
+from scriptmerge.module_graph import ModuleGraph, resolve_module_graph
+from scriptmerge.payload import PayloadEncoder
+from scriptmerge.source_store import SourceStore
+from scriptmerge.transforms import TransformPipeline, build_pipeline
+
+FINGERPRINT_FORMAT = "1"
+# the line the ``.py`` output has after its shebang, and the comment of the ``.pyz`` archive.
+FINGERPRINT_PREFIX = "scriptmerge-fingerprint: "
+
+# arguments that change how an output is built, but not what is written.
+_IGNORED_OPTIONS = frozenset(
+    (
+        "artifact_cache",
+        "callback",
+        "fingerprint",
+        "import_cache",
+        "jobs",
+        "module_filter",
+        "module_graph",
+        "release_sources",
+        "skip_unchanged",
+        "sources",
+        "stream_sources",
+    )
+)
+# lines of a ``.py`` output searched for the fingerprint
+_FINGERPRINT_LINES = 2
+
+
+def build_fingerprint(
+    kind: str, module_graph: ModuleGraph, options: Mapping[str, Any], prelude: str = ""
+) -> str:
+    """
+    Gets a hash of everything an output is built from.
+
+    The hash covers the version of scriptmerge and of the running Python, the
+    ``options`` of the build, the version of each interpreter bytecode is compiled for,
+    ``SOURCE_DATE_EPOCH``, the ``prelude`` text, the entry point script and, in the
+    order they are written, the name, path and content hash of each module of the graph.
+    Two builds with the same fingerprint write the same output.
+
+    Args:
+        kind (str): Kind of output, ``"py"`` or ``"pyz"``.
+        module_graph (ModuleGraph): Resolved modules of the build.
+        options (Mapping[str, Any]): Arguments of the build. Caches, ``jobs`` and
+            other arguments that do not change the output are left out.
+        prelude (str, optional): Code the writer adds to the output. Defaults to ``""``.
+
+    Returns:
+        str: Hex digest of the inputs.
+    """
+    from scriptmerge import __version__
+
+    digest = hashlib.sha256()
+
+    def add(*parts: str) -> None:
+        for part in parts:
+            data = part.encode("utf-8", "surrogateescape")
+            digest.update(str(len(data)).encode("ascii") + b":" + data)
+
+    add(FINGERPRINT_FORMAT, __version__, kind, sys.version)
+    for name in sorted(options):
+        if name not in _IGNORED_OPTIONS:
+            add(name, _option_value(options[name]))
+    # a binary is named by its path, which can point to another version than the last build.
+    for python_binary in _bytecode_binaries(options):
+        add(interpreter_version(python_binary))
+    # the date of the entries of a .pyz archive
+    add(os.environ.get("SOURCE_DATE_EPOCH", ""))
+    add(prelude)
+    sources = module_graph.sources
+    add(_file_hash(sources, module_graph.path))
+    for module in module_graph:
+        add(
+            module.module_name,
+            module.relative_path,
+            str(module.is_extension),
+            _file_hash(sources, module.absolute_path),
+        )
+    return digest.hexdigest()
+
+
+def check_unchanged(
+    kind: str,
+    target: str | os.PathLike,
+    path: str,
+    options: Dict[str, Any],
+    prelude: str = "",
+    force: bool = False,
+) -> Tuple[BuildResult, ModuleGraph, bool]:
+    """
+    Resolves the modules of a build and compares its fingerprint with the one of the existing output.
+
+    Args:
+        kind (str): Kind of output, ``"py"`` or ``"pyz"``.
+        target (str | os.PathLike): Path of the output.
+        path (str): Path to entry point py file.
+        options (Dict[str, Any]): Arguments of the build, as given to ``script_to()``.
+            A ``module_graph`` is used instead of resolving the modules again.
+        prelude (str, optional): Code the writer adds to the output. Defaults to ``""``.
+        force (bool, optional): The output is written even when its fingerprint is the same.
+            Defaults to False.
+
+    Returns:
+        Tuple[BuildResult, ModuleGraph, bool]: Result of the build, not ``written`` when the output
+        is unchanged, the resolved modules, and whether the graph was resolved here so the
+        writer may release its sources.
+    """
+    module_graph: ModuleGraph | None = options.get("module_graph", None)
+    resolved = module_graph is None
+    # the stages that run, however they were given.
+    pipeline = build_pipeline(bool(options.get("clean", False)), options.get("transforms", None))
+    if module_graph is None:
+        sources: SourceStore | None = options.get("sources", None)
+        if sources is None:
+            sources = SourceStore(
+                import_scanner=str(options.get("import_scanner", "ast")),
+                artifact_cache=options.get("artifact_cache", None),
+                pipeline=pipeline,
+                streaming=bool(options.get("stream_sources", False)),
+            )
+        module_graph = resolve_module_graph(path, **dict(options, sources=sources))
+        import_cache = options.get("import_cache", None)
+        if import_cache is not None:
+            import_cache.prune()
+    values = dict(options, transforms=None if pipeline is None else pipeline.config)
+    fingerprint = build_fingerprint(kind, module_graph, values, prelude)
+    written = force or read_fingerprint(target, kind) != fingerprint
+    return BuildResult(target, written=written, fingerprint=fingerprint), module_graph, resolved
+
+
+def read_fingerprint(path: str | os.PathLike, kind: str) -> str | None:
+    """
+    Gets the fingerprint embedded in an output written by an earlier build.
+
+    Args:
+        path (str | os.PathLike): Path of the output.
+        kind (str): Kind of output, ``"py"`` or ``"pyz"``.
+
+    Returns:
+        str | None: Fingerprint, ``None`` when the output does not exist or has none.
+    """
+    try:
+        if kind == "pyz":
+            with zipfile.ZipFile(path) as archive:
+                lines = [archive.comment.decode("utf-8", "replace")]
+        else:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                lines = [f.readline() for _ in range(_FINGERPRINT_LINES)]
+    except (OSError, zipfile.BadZipFile):
+        return None
+    for line in lines:
+        line = line.lstrip("#").strip()
+        if line.startswith(FINGERPRINT_PREFIX):
+            return line[len(FINGERPRINT_PREFIX) :]
+    return None
+
+
+def fingerprint_line(fingerprint: str) -> str:
+    """
+    Gets the comment line that embeds a fingerprint in a ``.py`` output.
+    """
+    return f"# {FINGERPRINT_PREFIX}{fingerprint}\n"
+
+
+def _file_hash(sources: SourceStore, path: str) -> str:
+    # a streaming store does not keep the file, it is read again when it is written.
+    digest = hashlib.sha256(sources.read(path)).hexdigest()
+    sources.unload(path)
+    return digest
+
+
+def _bytecode_binaries(options: Mapping[str, Any]) -> List[str | None]:
+    # the interpreters the .pyc files of a .pyz, or the bytecode of a .py, are compiled for.
+    binaries: List[str | None] = list(options.get("bytecode_targets", None) or [])
+    if options.get("precompile", False) or options.get("bytecode_only", False):
+        binaries.append(options.get("precompile_binary", None))
+    return binaries
+
+
+def _option_value(value: Any) -> str:
+    if isinstance(value, TransformPipeline):
+        return value.config
+    if isinstance(value, PayloadEncoder):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return repr([_option_value(item) for item in value])
+    if isinstance(value, (set, frozenset)):
+        return repr(sorted(_option_value(item) for item in value))
+    return repr(value)
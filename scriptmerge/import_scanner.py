@@ -0,0 +1,443 @@
+from __future__ import annotations
+from typing import Any, List, Tuple
+import io
+import keyword
+import re
+import tokenize
+
+import scriptmerge.merge_common as merge_common
+
+IMPORT_SCANNER_AST = "ast"
+IMPORT_SCANNER_TOKENS = "tokens"
+IMPORT_SCANNERS = (IMPORT_SCANNER_AST, IMPORT_SCANNER_TOKENS)
+
+RawImport = Tuple[Any, int, List[str]]
+
+# Strings, comments and line continuations, replaced in one pass so the rest
+# of the scanner only sees code. The string patterns are unrolled so an
+# unterminated string fails in linear time, its quote is then caught by "bad".
+_SKELETON = re.compile(
+    r"""
+    (?:(?<!\w)(?P<prefix>[rRbBuUfF]{1,2}))?
+    (?P<str>
+        '''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''
+        | \"\"\"[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*\"\"\"
+        | '[^'\\\n]*(?:\\.[^'\\\n]*)*'
+        | "[^"\\\n]*(?:\\.[^"\\\n]*)*"
+      )
+    | (?P<comment>\#[^\n]*)
+    | (?P<cont>\\\n)
+    | (?P<bad>['"\\])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_STATEMENT_WORD = re.compile(r"\s*([^\W\d]\w*)")
+_IMPORT_WORD = re.compile(r"\bimport\b")
+_LAMBDA = re.compile(r"(?<![\w.])lambda\b")
+_IMPORT_TOKEN = re.compile(r"\s*(?:([A-Za-z_][A-Za-z0-9_]*)|(\.\.\.|[.,()*]))")
+
+_COMPOUND = frozenset(
+    [
+        "if",
+        "elif",
+        "else",
+        "for",
+        "while",
+        "try",
+        "except",
+        "finally",
+        "with",
+        "def",
+        "class",
+    ]
+)
+_SOFT_KEYWORDS = frozenset(["match", "case"])
+_OPEN = "([{"
+_CLOSE = ")]}"
+
+
+class _Ambiguous(Exception):
+    pass
+
+
+def scan_imports(source: bytes, filename: str) -> List[RawImport]:
+    """
+    Gets the import statements of a python source without building an ``ast`` tree.
+
+    Gives the same ``(module, level, names)`` tuples in the same order as
+    ``merge_common.find_raw_imports()``. Sources the scanner cannot read with
+    certainty, such as ``match`` statements, tabs in indentation or syntax
+    errors, are passed to ``merge_common.find_raw_imports()`` instead.
+
+    Args:
+        source (bytes): Python source.
+        filename (str): File name used in syntax errors.
+
+    Returns:
+        List[RawImport]: ``(module, level, names)`` for each import statement.
+    """
+    raw_imports = try_scan_imports(source)
+    if raw_imports is None:
+        return merge_common.find_raw_imports(source, filename)
+    return raw_imports
+
+
+def try_scan_imports(source: bytes) -> List[RawImport] | None:
+    """
+    Gets the import statements of a python source with the token scanner only.
+
+    Returns:
+        List[RawImport] | None: Import tuples, ``None`` when the source is ambiguous to the scanner.
+    """
+    try:
+        return _Scanner(_decode(source)).scan()
+    except _Ambiguous:
+        return None
+
+
+def _decode(source: bytes) -> str:
+    if b"\0" in source:
+        raise _Ambiguous()
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(source).readline)
+        text = source.decode(encoding)
+    except (SyntaxError, LookupError, UnicodeDecodeError):
+        raise _Ambiguous()
+    if text.startswith("\ufeff"):
+        text = text[1:]
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _replace_token(m: re.Match) -> str:
+    kind = m.lastgroup
+    if kind == "str":
+        prefix = m.group("prefix")
+        if prefix and "f" in prefix.lower():
+            # python 3.12 f-strings may nest the same quotes, which ends the string early here.
+            body = m.group("str").replace("{{", "").replace("}}", "")
+            if body.count("{") != body.count("}"):
+                raise _Ambiguous()
+        return '""'
+    if kind == "comment":
+        return ""
+    if kind == "cont":
+        return " "
+    # an unterminated string or a stray backslash
+    raise _Ambiguous()
+
+
+def _has_bracket(line: str) -> bool:
+    return (
+        "(" in line
+        or "[" in line
+        or "{" in line
+        or ")" in line
+        or "]" in line
+        or "}" in line
+    )
+
+
+class _Block:
+    __slots__ = ("indent", "depth", "chain")
+
+    def __init__(self, indent: int, depth: int) -> None:
+        self.indent = indent
+        # ast depth of the statements in this block, the module body is 1.
+        self.depth = depth
+        # (kind, depth) of the last compound statement, for elif/else/except/finally.
+        self.chain: Tuple[str, int] | None = None
+
+
+class _Scanner:
+    def __init__(self, text: str) -> None:
+        self._text = text
+        self._blocks = [_Block(0, 1)]
+        self._pending_depth: int | None = None
+        self._found: List[Tuple[int, int, RawImport]] = []
+
+    def scan(self) -> List[RawImport]:
+        text = self._text
+        if "import" not in text:
+            return []
+        skeleton = _SKELETON.sub(_replace_token, text)
+        pieces: List[str] = []
+        depth = 0
+        for line in skeleton.split("\n"):
+            if not pieces and not _has_bracket(line):
+                self._logical_line(line)
+                continue
+            depth += line.count("(") + line.count("[") + line.count("{")
+            depth -= line.count(")") + line.count("]") + line.count("}")
+            if depth < 0:
+                raise _Ambiguous()
+            pieces.append(line)
+            if depth == 0:
+                self._logical_line(" ".join(pieces))
+                pieces = []
+        if pieces or self._pending_depth is not None:
+            raise _Ambiguous()
+        # ast.walk is breadth first; within one depth it follows the source order.
+        self._found.sort(key=lambda item: (item[0], item[1]))
+        return [item[2] for item in self._found]
+
+    def _logical_line(self, line: str) -> None:
+        code = line.lstrip(" ")
+        if not code or code.isspace():
+            return
+        if code[0].isspace():
+            # tabs and form feeds in indentation
+            raise _Ambiguous()
+        self._set_indent(len(line) - len(code))
+        self._statement(code, self._blocks[-1])
+
+    def _set_indent(self, indent: int) -> None:
+        blocks = self._blocks
+        if self._pending_depth is not None:
+            if indent <= blocks[-1].indent:
+                raise _Ambiguous()
+            blocks.append(_Block(indent, self._pending_depth))
+            self._pending_depth = None
+            return
+        while indent < blocks[-1].indent:
+            blocks.pop()
+        if indent != blocks[-1].indent:
+            raise _Ambiguous()
+
+    def _statement(self, code: str, block: _Block) -> None:
+        word_match = _STATEMENT_WORD.match(code)
+        word = word_match.group(1) if word_match else ""
+        if word == "async":
+            next_match = _STATEMENT_WORD.match(code, word_match.end())
+            word = next_match.group(1) if next_match else ""
+            if word not in ("def", "for", "with"):
+                word = ""
+        if word in _SOFT_KEYWORDS and _split_statement(code)[1] is not None:
+            # possibly a match statement
+            raise _Ambiguous()
+
+        if word in _COMPOUND:
+            head, rest = _split_statement(code)
+            if rest is None or _IMPORT_WORD.search(head):
+                raise _Ambiguous()
+            body_depth = self._header(word, block)
+            if rest.strip():
+                # a suite on the same line as its header
+                for simple in _split_simple(rest):
+                    sub_word = _STATEMENT_WORD.match(simple)
+                    if sub_word and sub_word.group(1) in _COMPOUND:
+                        raise _Ambiguous()
+                    self._simple(simple, body_depth)
+            else:
+                self._pending_depth = body_depth
+            return
+
+        block.chain = None
+        for simple in _split_simple(code):
+            self._simple(simple, block.depth)
+
+    def _header(self, word: str, block: _Block) -> int:
+        depth = block.depth
+        chain = block.chain
+        if word == "if":
+            block.chain = ("if", depth)
+            return depth + 1
+        if word == "elif":
+            if chain is None or chain[0] != "if":
+                raise _Ambiguous()
+            # an elif is an If node in the orelse of the previous one.
+            block.chain = ("if", chain[1] + 1)
+            return chain[1] + 2
+        if word == "else":
+            if chain is None:
+                raise _Ambiguous()
+            block.chain = chain if chain[0] == "try" else None
+            return chain[1] + 1
+        if word in ("for", "while"):
+            block.chain = ("loop", depth)
+            return depth + 1
+        if word == "try":
+            block.chain = ("try", depth)
+            return depth + 1
+        if word == "except":
+            if chain is None or chain[0] != "try":
+                raise _Ambiguous()
+            # the body of an ExceptHandler node
+            return chain[1] + 2
+        if word == "finally":
+            if chain is None or chain[0] != "try":
+                raise _Ambiguous()
+            block.chain = None
+            return chain[1] + 1
+        # with, def, class
+        block.chain = None
+        return depth + 1
+
+    def _simple(self, statement: str, depth: int) -> None:
+        stripped = statement.strip()
+        if not stripped:
+            return
+        if "import" not in stripped:
+            return
+        if stripped.startswith("import") and _IMPORT_WORD.match(stripped):
+            names = _parse_import(stripped[len("import") :])
+            for name in names:
+                self._found.append((depth, len(self._found), (name, 0, [])))
+            return
+        if stripped.startswith("from") and re.match(r"from\b", stripped):
+            raw = _parse_from_import(stripped[len("from") :])
+            self._found.append((depth, len(self._found), raw))
+            return
+        if _IMPORT_WORD.search(stripped):
+            raise _Ambiguous()
+
+
+def _split_statement(code: str) -> Tuple[str, str | None]:
+    """
+    Splits a logical line at its first colon outside brackets.
+
+    Returns the text before the colon and the text after it, or ``None`` when there is no such colon.
+    """
+    colon = code.find(":")
+    if colon == -1:
+        return code, None
+    head = code[:colon]
+    if not _has_bracket(head) and not code.startswith("=", colon + 1):
+        if _LAMBDA.search(head):
+            raise _Ambiguous()
+        return head, code[colon + 1 :]
+    depth = 0
+    index = 0
+    length = len(code)
+    while index < length:
+        c = code[index]
+        if c in _OPEN:
+            depth += 1
+        elif c in _CLOSE:
+            depth -= 1
+        elif depth == 0:
+            if c == ":":
+                if index + 1 < length and code[index + 1] == "=":
+                    index += 2
+                    continue
+                return code[:index], code[index + 1 :]
+            if c == "l" and _LAMBDA.match(code, index):
+                # the colon of a lambda is not the end of the header
+                raise _Ambiguous()
+        index += 1
+    return code, None
+
+
+def _split_simple(code: str) -> List[str]:
+    if ";" not in code:
+        return [code]
+    parts = []
+    depth = 0
+    start = 0
+    for index, c in enumerate(code):
+        if c in _OPEN:
+            depth += 1
+        elif c in _CLOSE:
+            depth -= 1
+        elif c == ";" and depth == 0:
+            parts.append(code[start:index])
+            start = index + 1
+    parts.append(code[start:])
+    return parts
+
+
+def _tokens(code: str) -> List[str]:
+    tokens = []
+    pos = 0
+    code = code.rstrip()
+    while pos < len(code):
+        m = _IMPORT_TOKEN.match(code, pos)
+        if m is None:
+            # non ascii names are normalized by the parser, leave them to it.
+            raise _Ambiguous()
+        tokens.append(m.group(1) or m.group(2))
+        pos = m.end()
+    return tokens
+
+
+def _dotted_name(tokens: List[str], index: int) -> Tuple[str, int]:
+    parts = []
+    while True:
+        if index >= len(tokens) or not _is_name(tokens[index]):
+            raise _Ambiguous()
+        parts.append(tokens[index])
+        index += 1
+        if index < len(tokens) and tokens[index] == ".":
+            index += 1
+            continue
+        return ".".join(parts), index
+
+
+def _is_name(token: str) -> bool:
+    return (token[0].isalpha() or token[0] == "_") and not keyword.iskeyword(token)
+
+
+def _skip_alias(tokens: List[str], index: int) -> int:
+    if index < len(tokens) and tokens[index] == "as":
+        if index + 1 >= len(tokens) or not _is_name(tokens[index + 1]):
+            raise _Ambiguous()
+        return index + 2
+    return index
+
+
+def _parse_import(code: str) -> List[str]:
+    tokens = _tokens(code)
+    names = []
+    index = 0
+    while True:
+        name, index = _dotted_name(tokens, index)
+        index = _skip_alias(tokens, index)
+        names.append(name)
+        if index == len(tokens):
+            return names
+        if tokens[index] != ",":
+            raise _Ambiguous()
+        index += 1
+
+
+def _parse_from_import(code: str) -> RawImport:
+    tokens = _tokens(code)
+    index = 0
+    level = 0
+    while index < len(tokens) and tokens[index] in (".", "..."):
+        level += len(tokens[index])
+        index += 1
+    module = None
+    if index < len(tokens) and tokens[index] != "import":
+        module, index = _dotted_name(tokens, index)
+    if index >= len(tokens) or tokens[index] != "import":
+        raise _Ambiguous()
+    index += 1
+    if module is None and level == 0:
+        raise _Ambiguous()
+    if index < len(tokens) and tokens[index] == "*":
+        if index + 1 != len(tokens):
+            raise _Ambiguous()
+        return (module, level, ["*"])
+    closing = False
+    if index < len(tokens) and tokens[index] == "(":
+        closing = True
+        index += 1
+    names = []
+    while True:
+        if index >= len(tokens) or not _is_name(tokens[index]):
+            raise _Ambiguous()
+        names.append(tokens[index])
+        index = _skip_alias(tokens, index + 1)
+        if index < len(tokens) and tokens[index] == ",":
+            index += 1
+            if closing and index < len(tokens) and tokens[index] == ")":
+                break
+            continue
+        break
+    if closing:
+        if index >= len(tokens) or tokens[index] != ")":
+            raise _Ambiguous()
+        index += 1
+    if index != len(tokens):
+        raise _Ambiguous()
+    return (module, level, names)
@@ -1,9 +1,27 @@
+from __future__ import annotations
 import argparse
 import sys
+from typing import IO, List
 
 from scriptmerge import __version__
-from scriptmerge.merge_py import script as mergepy_script
-from scriptmerge.merge_pyz import script as mergepyz_script
+from scriptmerge.cache import ArtifactCache, ImportCache
+from scriptmerge.merge_py import PRELUDE_MODES, PRELUDE_TEMPDIR
+from scriptmerge.merge_py import script_to as mergepy_script_to
+from scriptmerge.merge_pyz import COMPRESS_METHODS, COMPRESS_NONE
+from scriptmerge.merge_pyz import script_to as mergepyz_script_to
+from scriptmerge.depfile import write_depfile
+from scriptmerge.merge_common import BuildResult
+from scriptmerge.module_filter import ModuleFilter
+from scriptmerge.module_graph import resolve_module_graph
+from scriptmerge.transforms import TRANSFORMS, TransformPipeline, build_pipeline
+from scriptmerge.watch import DEFAULT_INTERVAL, Watcher
+from scriptmerge.payload import (
+    PAYLOAD_ALPHABETS,
+    PAYLOAD_BASE85,
+    PAYLOAD_ENCODINGS,
+    PAYLOAD_REPR,
+    PayloadEncoder,
+)
 import os
 
 
@@ -12,12 +30,82 @@ def is_posix() -> bool:
     return os.pathsep == ":"
 
 
+def _get_import_cache(args: argparse.Namespace) -> ImportCache | None:
+    if args.no_cache:
+        return None
+    return ImportCache(cache_dir=args.cache_dir)
+
+
+def _get_artifact_cache(args: argparse.Namespace) -> ArtifactCache | None:
+    if args.no_cache:
+        return None
+    return ArtifactCache(cache_dir=args.cache_dir)
+
+
+def _print_stats(
+    args: argparse.Namespace,
+    import_cache: ImportCache | None,
+    module_filter: ModuleFilter | None = None,
+    artifact_cache: ArtifactCache | None = None,
+    pipeline: TransformPipeline | None = None,
+) -> None:
+    if not args.verbose:
+        return
+    if import_cache is not None:
+        print(
+            f"import cache: {import_cache.hits} hits, {import_cache.misses} misses",
+            file=sys.stderr,
+        )
+    if artifact_cache is not None and artifact_cache.hits + artifact_cache.misses > 0:
+        print(
+            f"artifact cache: {artifact_cache.hits} hits, {artifact_cache.misses} misses, "
+            f"{artifact_cache.hit_rate:.0%} hit rate",
+            file=sys.stderr,
+        )
+    if pipeline is not None and pipeline.modules > 0:
+        timings = ", ".join(
+            f"{name} {seconds * 1000:.1f} ms" for name, seconds in pipeline.timings.items()
+        )
+        print(f"transforms: {pipeline.modules} modules, {timings}", file=sys.stderr)
+    if module_filter is not None and len(module_filter) > 0:
+        print(
+            f"exclude filter: {module_filter.lookups} lookups, "
+            f"{module_filter.short_circuited} short-circuited",
+            file=sys.stderr,
+        )
+
+
+def _print_result(args: argparse.Namespace, result: BuildResult) -> None:
+    if args.verbose and not result.written:
+        print(f"unchanged: {result.target}", file=sys.stderr)
+
+
+def _write_depfile(args: argparse.Namespace, targets: List[str], result: BuildResult) -> None:
+    if args.depfile:
+        write_depfile(args.depfile, targets, result.dependencies)
+
+
+def _get_output_target(args: argparse.Namespace) -> str | IO:
+    if args.output_file == "-":
+        return sys.stdout
+    return args.output_file
+
+
+def _get_bytecode_targets(args: argparse.Namespace) -> List[str]:
+    return [target or args.python_binary or sys.executable for target in args.bytecode]
+
+
+def _get_precompile_binary(args: argparse.Namespace) -> str | None:
+    return args.precompile or args.python_binary
+
+
 # endregion helper methods
 
 
 # region Argument parsing
 def _args_compile_pyz(parser: argparse.ArgumentParser) -> None:
     _parse_args_common(parser)
+    _args_pyz_output(parser)
     # parser.add_argument(
     #     "-n",
     #     "--no-main-py",
@@ -34,6 +122,37 @@ def _args_compile_py(parser: argparse.ArgumentParser) -> None:
         action="store_true",
         help="Include '__init__.py' file in the output. Default is False.",
     )
+    _args_py_output(parser)
+
+
+def _args_compile_both(parser: argparse.ArgumentParser) -> None:
+    _parse_args_common(parser)
+    parser.add_argument(
+        "-i",
+        "--init-py",
+        action="store_true",
+        help="Include '__init__.py' file in the '.py' output. Default is False.",
+    )
+    _args_py_output(parser)
+    _args_pyz_output(parser)
+
+
+def _args_watch(parser: argparse.ArgumentParser) -> None:
+    _parse_args_common(parser)
+    parser.add_argument(
+        "-i",
+        "--init-py",
+        action="store_true",
+        help="Include '__init__.py' file in the '.py' output. Default is False.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help=f"Seconds between two checks of the files for changes. Default is {DEFAULT_INTERVAL}.",
+    )
+    _args_py_output(parser)
+    _args_pyz_output(parser)
 
 
 def _args_compile_original(parser: argparse.ArgumentParser) -> None:
@@ -41,6 +160,95 @@ def _args_compile_original(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "-z", "--pyz-out", action="store_true", help="Output as a binary pyz file"
     )
+    _args_py_output(parser)
+
+
+def _args_py_output(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--prelude",
+        choices=list(PRELUDE_MODES),
+        default=PRELUDE_TEMPDIR,
+        help="How the '.py' output makes its modules importable. 'tempdir' writes them "
+        "to a temporary directory at startup, 'memory' imports them from memory, "
+        "'cache' extracts them once to a cache directory shared by later runs. "
+        "Default is 'tempdir'.",
+    )
+    parser.add_argument(
+        "--bytecode",
+        action="append",
+        nargs="?",
+        const="",
+        default=[],
+        metavar="PYTHON",
+        help="Embed precompiled bytecode in the '.py' output for a Python binary, "
+        "the --python-binary or the running Python when none is given. Can be repeated.",
+    )
+    parser.add_argument(
+        "--bytecode-optimize",
+        type=int,
+        choices=[0, 1, 2],
+        default=0,
+        help="Optimization level of the embedded bytecode, 1 as -O and 2 as -OO. Default is 0.",
+    )
+    parser.add_argument(
+        "--payload",
+        choices=list(PAYLOAD_ENCODINGS),
+        default=PAYLOAD_REPR,
+        help="Encoding of the modules in the '.py' output. 'zlib' and 'lzma' compress them, "
+        "each module is decoded when it is first needed. Default is 'repr'.",
+    )
+    parser.add_argument(
+        "--payload-level",
+        type=int,
+        choices=range(10),
+        metavar="{0-9}",
+        help="Compression level of the 'zlib' or 'lzma' payload",
+    )
+    parser.add_argument(
+        "--payload-alphabet",
+        choices=list(PAYLOAD_ALPHABETS),
+        default=PAYLOAD_BASE85,
+        help="Text encoding of a compressed payload. 'base64' is larger and decodes faster. "
+        "Default is 'base85'.",
+    )
+
+
+def _args_pyz_output(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--compress",
+        choices=list(COMPRESS_METHODS),
+        default=COMPRESS_NONE,
+        help="Compression of the '.pyz' entries. 'deflate' is the only method Python can "
+        "import from. Default is 'none'.",
+    )
+    parser.add_argument(
+        "--compress-level",
+        type=int,
+        choices=range(10),
+        metavar="{0-9}",
+        help="Deflate level of the '.pyz' entries",
+    )
+    parser.add_argument(
+        "--precompile",
+        nargs="?",
+        const="",
+        metavar="PYTHON",
+        help="Add a '.pyc' next to each module in the '.pyz' output, compiled for a Python "
+        "binary, the --python-binary or the running Python when none is given",
+    )
+    parser.add_argument(
+        "--precompile-optimize",
+        type=int,
+        choices=[0, 1, 2],
+        default=0,
+        help="Optimization level of the '.pyc' files, 1 as -O and 2 as -OO. Default is 0.",
+    )
+    parser.add_argument(
+        "--bytecode-only",
+        action="store_true",
+        help="Write the '.pyc' files without the sources. The '.pyz' output only runs on "
+        "the version of Python it was compiled for.",
+    )
 
 
 def _parse_args_common(parser: argparse.ArgumentParser) -> None:
@@ -58,7 +266,8 @@ def _parse_args_common(parser: argparse.ArgumentParser) -> None:
         "--exclude-python-module",
         action="append",
         default=[],
-        help="Exclude python modules from the output",
+        help="Exclude python modules from the output. A regular expression, "
+        "or 'glob:pkg.*' or 'prefix:pkg' to exclude a package and its modules",
     )
     parser.add_argument(
         "-p",
@@ -73,7 +282,13 @@ def _parse_args_common(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "-o",
         "--output-file",
-        help="Output file",
+        help="Output file, '-' writes to stdout",
+    )
+    parser.add_argument(
+        "--depfile",
+        metavar="PATH",
+        help="Write the files the output is built from to PATH as a Makefile rule, "
+        "read by make and ninja",
     )
     parser.add_argument(
         "-s",
@@ -87,6 +302,50 @@ def _parse_args_common(parser: argparse.ArgumentParser) -> None:
         action="store_true",
         help="Remove docstring and comments from the script",
     )
+    parser.add_argument(
+        "--transform",
+        action="append",
+        choices=list(TRANSFORMS),
+        help="Transform applied to each module, can be given more than once. "
+        "'strip-annotations' removes the annotations of functions. --clean adds 'clean'.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory of the persistent import and artifact caches. Default is '~/.cache/scriptmerge'.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not use the persistent import and artifact caches",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="Write the output even when it was built from the same inputs. "
+        "By default an output with the same fingerprint is left as it is.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to parse and transform modules. 0 uses one per CPU. "
+        "'.pyz' entries are compressed in the main process. Default is 1.",
+    )
+    parser.add_argument(
+        "--import-scanner",
+        choices=["ast", "tokens"],
+        default="ast",
+        help="How import statements are found. 'tokens' skips building a syntax tree, "
+        "which is faster on very large modules. Default is 'ast'.",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Print build statistics to stderr",
+    )
     if is_posix():
         parser.add_argument(
             "-x",
@@ -105,74 +364,280 @@ def _parse_args_common(parser: argparse.ArgumentParser) -> None:
 
 # region Argument actions
 def _args_process_cmd(args: argparse.Namespace) -> int:
+    if getattr(args, "depfile", None) and (not args.output_file or args.output_file == "-"):
+        print("--depfile requires an --output-file path", file=sys.stderr)
+        return 2
     if args.command == "compile_original":
         return _args_compile_default_action(args)
     elif args.command == "compilepy":
         return _args_compile_py_action(args)
     elif args.command == "compilepyz":
         return _args_compile_pyz_action(args)
+    elif args.command == "compileboth":
+        return _args_compile_both_action(args)
+    elif args.command == "watch":
+        return _args_watch_action(args)
     elif args.command == "version":
         print(__version__)
     return 0
 
 
 def _args_compile_default_action(args: argparse.Namespace) -> int:
-    output = mergepy_script(
+    import_cache = _get_import_cache(args)
+    artifact_cache = _get_artifact_cache(args)
+    pipeline = build_pipeline(args.clean, args.transform)
+    module_filter = ModuleFilter(args.exclude_python_module)
+    result = mergepy_script_to(
+        _get_output_target(args),
         args.script,
         add_python_modules=args.add_python_module,
         add_python_paths=args.add_python_path,
         python_binary=args.python_binary,
         copy_shebang=args.copy_shebang,
         exclude_python_modules=args.exclude_python_module,
+        module_filter=module_filter,
         clean=args.clean,
+        import_cache=import_cache,
+        artifact_cache=artifact_cache,
+        transforms=pipeline,
+        jobs=args.jobs,
+        import_scanner=args.import_scanner,
+        prelude_mode=args.prelude,
+        bytecode_targets=_get_bytecode_targets(args),
+        bytecode_optimize=args.bytecode_optimize,
+        payload=PayloadEncoder(args.payload, args.payload_level, args.payload_alphabet),
+        skip_unchanged=True,
+        force=args.force,
     )
-    with open(args.output_file, "w") as output_file:
-        output_file.write(output)
+    _print_result(args, result)
+    _write_depfile(args, [args.output_file], result)
+    _print_stats(args, import_cache, module_filter, artifact_cache, pipeline)
     make_executable = getattr(args, "make_executable", False)  # only posix
-    if make_executable:
+    if make_executable and args.output_file != "-":
         os.chmod(args.output_file, 0o755)
     return 0
 
 
 def _args_compile_py_action(args: argparse.Namespace) -> int:
-    output = mergepy_script(
+    import_cache = _get_import_cache(args)
+    artifact_cache = _get_artifact_cache(args)
+    pipeline = build_pipeline(args.clean, args.transform)
+    module_filter = ModuleFilter(args.exclude_python_module)
+    result = mergepy_script_to(
+        _get_output_target(args),
         args.script,
         add_python_modules=args.add_python_module,
         add_python_paths=args.add_python_path,
         python_binary=args.python_binary,
         copy_shebang=args.copy_shebang,
         exclude_python_modules=args.exclude_python_module,
+        module_filter=module_filter,
         clean=args.clean,
         include_init_py=args.init_py,
+        import_cache=import_cache,
+        artifact_cache=artifact_cache,
+        transforms=pipeline,
+        jobs=args.jobs,
+        import_scanner=args.import_scanner,
+        prelude_mode=args.prelude,
+        bytecode_targets=_get_bytecode_targets(args),
+        bytecode_optimize=args.bytecode_optimize,
+        payload=PayloadEncoder(args.payload, args.payload_level, args.payload_alphabet),
+        skip_unchanged=True,
+        force=args.force,
     )
-    with open(args.output_file, "w") as output_file:
-        output_file.write(output)
+    _print_result(args, result)
+    _write_depfile(args, [args.output_file], result)
+    _print_stats(args, import_cache, module_filter, artifact_cache, pipeline)
     make_executable = getattr(args, "make_executable", False)  # only posix
-    if make_executable:
+    if make_executable and args.output_file != "-":
         os.chmod(args.output_file, 0o755)
     return 0
 
 
 def _args_compile_pyz_action(args: argparse.Namespace) -> int:
     # output_file = _open_output(args)
-    output = mergepyz_script(
+    import_cache = _get_import_cache(args)
+    artifact_cache = _get_artifact_cache(args)
+    pipeline = build_pipeline(args.clean, args.transform)
+    module_filter = ModuleFilter(args.exclude_python_module)
+    result = mergepyz_script_to(
+        _get_output_target(args),
         args.script,
         add_python_modules=args.add_python_module,
         add_python_paths=args.add_python_path,
         python_binary=args.python_binary,
         copy_shebang=args.copy_shebang,
         exclude_python_modules=args.exclude_python_module,
+        module_filter=module_filter,
         clean=args.clean,
+        import_cache=import_cache,
+        artifact_cache=artifact_cache,
+        transforms=pipeline,
+        jobs=args.jobs,
+        import_scanner=args.import_scanner,
+        compression=args.compress,
+        compress_level=args.compress_level,
+        precompile=args.precompile is not None,
+        precompile_binary=_get_precompile_binary(args),
+        precompile_optimize=args.precompile_optimize,
+        bytecode_only=args.bytecode_only,
+        skip_unchanged=True,
+        force=args.force,
     )
+    _print_result(args, result)
+    _write_depfile(args, [args.output_file], result)
     # output_file.write(output)
-    with open(args.output_file, "wb") as output_file:
-        output_file.write(output)
+    _print_stats(args, import_cache, module_filter, artifact_cache, pipeline)
     make_executable = getattr(args, "make_executable", False)  # only posix
-    if make_executable:
+    if make_executable and args.output_file != "-":
         os.chmod(args.output_file, 0o755)
     return 0
 
 
+def _args_compile_both_action(args: argparse.Namespace) -> int:
+    if not args.output_file or args.output_file == "-":
+        print("compileboth requires an --output-file path", file=sys.stderr)
+        return 2
+    import_cache = _get_import_cache(args)
+    artifact_cache = _get_artifact_cache(args)
+    pipeline = build_pipeline(args.clean, args.transform)
+    module_filter = ModuleFilter(args.exclude_python_module)
+    # resolve once, both writers share the graph and its file reads.
+    module_graph = resolve_module_graph(
+        args.script,
+        add_python_modules=args.add_python_module,
+        add_python_paths=args.add_python_path,
+        python_binary=args.python_binary,
+        exclude_python_modules=args.exclude_python_module,
+        module_filter=module_filter,
+        clean=args.clean,
+        import_cache=import_cache,
+        artifact_cache=artifact_cache,
+        transforms=pipeline,
+        jobs=args.jobs,
+        import_scanner=args.import_scanner,
+        copy_shebang=args.copy_shebang,
+    )
+    if import_cache is not None:
+        import_cache.prune()
+    base_name, ext = os.path.splitext(args.output_file)
+    if ext not in (".py", ".pyz"):
+        base_name = args.output_file
+    py_result = mergepy_script_to(
+        base_name + ".py",
+        args.script,
+        copy_shebang=args.copy_shebang,
+        clean=args.clean,
+        include_init_py=args.init_py,
+        module_graph=module_graph,
+        transforms=pipeline,
+        jobs=args.jobs,
+        prelude_mode=args.prelude,
+        bytecode_targets=_get_bytecode_targets(args),
+        bytecode_optimize=args.bytecode_optimize,
+        payload=PayloadEncoder(args.payload, args.payload_level, args.payload_alphabet),
+        skip_unchanged=True,
+        force=args.force,
+    )
+    pyz_result = mergepyz_script_to(
+        base_name + ".pyz",
+        args.script,
+        copy_shebang=args.copy_shebang,
+        clean=args.clean,
+        module_graph=module_graph,
+        transforms=pipeline,
+        jobs=args.jobs,
+        compression=args.compress,
+        compress_level=args.compress_level,
+        precompile=args.precompile is not None,
+        precompile_binary=_get_precompile_binary(args),
+        precompile_optimize=args.precompile_optimize,
+        bytecode_only=args.bytecode_only,
+        skip_unchanged=True,
+        force=args.force,
+    )
+    if artifact_cache is not None:
+        artifact_cache.prune()
+    _print_result(args, py_result)
+    _print_result(args, pyz_result)
+    py_result.dependencies = list(
+        dict.fromkeys(py_result.dependencies + pyz_result.dependencies)
+    )
+    _write_depfile(args, [base_name + ".py", base_name + ".pyz"], py_result)
+    _print_stats(args, import_cache, module_filter, artifact_cache, pipeline)
+    make_executable = getattr(args, "make_executable", False)  # only posix
+    if make_executable:
+        os.chmod(base_name + ".py", 0o755)
+        os.chmod(base_name + ".pyz", 0o755)
+    return 0
+
+
+def _args_watch_action(args: argparse.Namespace) -> int:
+    if not args.output_file or args.output_file == "-":
+        print("watch requires an --output-file path", file=sys.stderr)
+        return 2
+    pyz_out = args.output_file.endswith(".pyz")
+    options = dict(
+        add_python_modules=args.add_python_module,
+        add_python_paths=args.add_python_path,
+        python_binary=args.python_binary,
+        copy_shebang=args.copy_shebang,
+        exclude_python_modules=args.exclude_python_module,
+        module_filter=ModuleFilter(args.exclude_python_module),
+        clean=args.clean,
+        artifact_cache=_get_artifact_cache(args),
+        transforms=build_pipeline(args.clean, args.transform),
+        jobs=args.jobs,
+        import_scanner=args.import_scanner,
+    )
+    if pyz_out:
+        options.update(
+            compression=args.compress,
+            compress_level=args.compress_level,
+            precompile=args.precompile is not None,
+            precompile_binary=_get_precompile_binary(args),
+            precompile_optimize=args.precompile_optimize,
+            bytecode_only=args.bytecode_only,
+        )
+    else:
+        options.update(
+            include_init_py=args.init_py,
+            prelude_mode=args.prelude,
+            bytecode_targets=_get_bytecode_targets(args),
+            bytecode_optimize=args.bytecode_optimize,
+            payload=PayloadEncoder(args.payload, args.payload_level, args.payload_alphabet),
+        )
+    watcher = Watcher(
+        args.script,
+        args.output_file,
+        pyz_out=pyz_out,
+        interval=args.interval,
+        depfile=args.depfile or None,
+        **options,
+    )
+    make_executable = getattr(args, "make_executable", False)  # only posix
+
+    def on_build(watcher: Watcher) -> None:
+        if watcher.error is not None:
+            print(f"error: {watcher.error}", file=sys.stderr)
+            return
+        changed = f", {len(watcher.changed)} changed" if watcher.changed else ""
+        print(
+            f"built {args.output_file} in {watcher.seconds * 1000:.1f} ms{changed}",
+            file=sys.stderr,
+            flush=True,
+        )
+        if make_executable:
+            os.chmod(args.output_file, 0o755)
+
+    try:
+        watcher.run(on_build)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
 # endregion Argument actions
 
 
@@ -189,7 +654,16 @@ def _main() -> int:
 def main() -> int:
     # List of valid subcommands
     subcommands = set(
-        ["version", "compilepy", "compilepyz", "compile_original", "-h", "--help"]
+        [
+            "version",
+            "compilepy",
+            "compilepyz",
+            "compileboth",
+            "watch",
+            "compile_original",
+            "-h",
+            "--help",
+        ]
     )
     # subcommands = set(["version", "compilepy", "compilepyz", "compile_original"])
 
@@ -225,6 +699,18 @@ def main() -> int:
     )
     _args_compile_pyz(cmd_compile_pyz)
 
+    cmd_compile_both = subparsers.add_parser(
+        name="compileboth",
+        help="compile into a '.py' and a '.pyz' file from a single resolution of the modules",
+    )
+    _args_compile_both(cmd_compile_both)
+
+    cmd_watch = subparsers.add_parser(
+        name="watch",
+        help="rebuild a '.py' or '.pyz' file each time a module it is built from changes",
+    )
+    _args_watch(cmd_watch)
+
     # Parse the initial arguments
     # args, remaining_args = parser.parse_known_args()
     args = parser.parse_args()
@@ -232,8 +718,7 @@ def main() -> int:
     if len(sys.argv) <= 1:
         parser.print_help()
         return 0
-    _args_process_cmd(args)
-    return 0
+    return _args_process_cmd(args)
 
 
 # endregion Main
@@ -1,10 +1,13 @@
 from __future__ import annotations
-from typing import Any
+from typing import IO, Any, Iterator, List, Tuple
+import ast
 import io
 import os
+import secrets
 import tokenize
 import tempfile
 import shutil
+import stat
 import contextlib
 from pathlib import Path
 
@@ -18,21 +21,29 @@ CALLBACK_GENERATING_INIT_PY_FILE = "GENERATING_INIT_PY_FILE"
 def remove_comments_and_doc_strings(source: str) -> str:
     """
     Returns 'source' minus comments and doc strings.
+
+    The output is written to a single growing buffer instead of being built by
+    string concatenation, so cleaning takes time and memory linear in the size
+    of the source.
     """
     # https://stackoverflow.com/questions/1769332/script-to-remove-python-comments-docstrings
-    io_obj = io.StringIO(source)
-    out = ""
-    prev_toktype = tokenize.INDENT
+    comment_type = tokenize.COMMENT
+    string_type = tokenize.STRING
+    indent_type = tokenize.INDENT
+    newline_type = tokenize.NEWLINE
+    out = io.StringIO()
+    write = out.write
+    prev_toktype = indent_type
     last_lineno = -1
     last_col = 0
-    i = 0
-
-    for tok in tokenize.generate_tokens(io_obj.readline):
-        token_type = tok[0]
-        token_string = tok[1]
-        start_line, start_col = tok[2]
-        end_line, end_col = tok[3]
-        ltext = tok[4]
+
+    for (
+        token_type,
+        token_string,
+        (start_line, start_col),
+        (end_line, end_col),
+        _,
+    ) in tokenize.generate_tokens(io.StringIO(source).readline):
         # The following two conditionals preserve indentation.
         # This is necessary because we're not using tokenize.untokenize()
         # (because it spits out code with copious amounts of oddly-placed
@@ -40,46 +51,34 @@ def remove_comments_and_doc_strings(source: str) -> str:
         if start_line > last_lineno:
             last_col = 0
         if start_col > last_col:
-            out += " " * (start_col - last_col)
+            write(" " * (start_col - last_col))
         # Remove comments if not coding or shebang:
-        if token_type == tokenize.COMMENT:
-            if i > 0:
-                pass
-            else:
-                if token_string.startswith("#!"):
-                    out += token_string
-        # This series of conditionals removes docstrings:
-        elif token_type == tokenize.STRING:
-            if prev_toktype != tokenize.INDENT:
-                # This is likely a docstring; double-check we're not inside an operator:
-                if prev_toktype != tokenize.NEWLINE:
-                    # Note regarding NEWLINE vs NL: The tokenize module
-                    # differentiates between newlines that start a new statement
-                    # and newlines inside of operators such as parens, brackes,
-                    # and curly braces.  Newlines inside of operators are
-                    # NEWLINE and newlines that start new code are NL.
-                    # Catch whole-module docstrings:
-                    if start_col > 0:
-                        # Unlabelled indentation means we're inside an operator
-                        out += token_string
-                    # Note regarding the INDENT token: The tokenize module does
-                    # not label indentation inside of an operator (parens,
-                    # brackets, and curly braces) as actual indentation.
-                    # For example:
-                    # def foo():
-                    #     "The spaces before this docstring are tokenize.INDENT"
-                    #     test = [
-                    #         "The spaces before this string do not get a token"
-                    #     ]
+        if token_type == comment_type:
+            if token_string.startswith("#!"):
+                write(token_string)
+        # A string that starts a statement is a doc string and is removed.
+        # Note regarding NEWLINE vs NL: The tokenize module differentiates between
+        # newlines that start a new statement (NEWLINE) and newlines inside of
+        # operators such as parens, brackets and curly braces (NL).
+        # The tokenize module does not label indentation inside of an operator
+        # as INDENT either, so a string there with unlabelled indentation is kept.
+        # For example:
+        # def foo():
+        #     "The spaces before this docstring are tokenize.INDENT"
+        #     test = [
+        #         "The spaces before this string do not get a token"
+        #     ]
+        elif token_type == string_type:
+            if prev_toktype != indent_type and prev_toktype != newline_type and start_col > 0:
+                write(token_string)
         else:
-            out += token_string
+            write(token_string)
         prev_toktype = token_type
         last_col = end_col
         last_lineno = end_line
-    i += 1
 
     # replace multiple new-lines with single new-line
-    result = out.strip()
+    result = out.getvalue().strip()
     if len(result) > 0:
         # remove empty lines
         lines = [line for line in result.splitlines() if line.strip() != ""]
@@ -88,6 +87,32 @@ def remove_comments_and_doc_strings(source: str) -> str:
     return result
 
 
+def find_raw_imports(source: bytes, filename: str) -> List[Tuple[Any, int, List[str]]]:
+    """
+    Gets the import statements of a python source as ``(module, level, names)`` tuples.
+
+    ``module`` is ``None`` for ``from . import x`` style imports and ``level``
+    is the number of leading dots of a relative import.
+    Plain ``import a, b`` statements give one tuple per name with empty ``names``.
+    """
+    return find_raw_imports_in_tree(ast.parse(source, filename))
+
+
+def find_raw_imports_in_tree(parse_tree: ast.AST) -> List[Tuple[Any, int, List[str]]]:
+    """
+    Gets the import statements of an already parsed tree, see ``find_raw_imports()``.
+    """
+    results = []
+    for node in ast.walk(parse_tree):
+        if isinstance(node, ast.Import):
+            for name in node.names:
+                results.append((name.name, 0, []))
+
+        if isinstance(node, ast.ImportFrom):
+            results.append((node.module, node.level, [name.name for name in node.names]))
+    return results
+
+
 def remove_shebang(source: str) -> str:
     """
     Removes Shebang from source if it exists.
@@ -107,6 +132,22 @@ def read_str_file(file_path: str | Path) -> str:
         return f.read()
 
 
+def read_bin_file(file_path: str | Path) -> bytes:
+    """
+    Reads a file and returns its content as bytes.
+    """
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def decode_source(data: bytes) -> str:
+    """
+    Decodes the contents of a file as utf-8 text, translating newlines as ``read_str_file()`` does.
+    """
+    with io.TextIOWrapper(io.BytesIO(data), encoding="utf-8") as f:
+        return f.read()
+
+
 def write_str_file(file_path: str | Path, content: str) -> None:
     """
     Writes content to a file.
@@ -217,3 +258,114 @@ def temp_file_manager(content: str, manual_file_name: str = ""):
             yield temp_file_name
         finally:
             os.remove(temp_file_name)
+
+
+@contextlib.contextmanager
+def open_output(target: str | os.PathLike | IO, binary: bool = False) -> Iterator[IO]:
+    """
+    Opens the target of a generated output for writing.
+
+    A path is written to a temporary file next to it, which replaces the file at the
+    path once the output is complete, so the path never holds a partial output. If the
+    output fails the temporary file is removed and an existing file is left as it was.
+    A path that is not a regular file, such as ``/dev/null``, is written directly.
+    A stream is written as it is: for text output a text stream gets ``str`` and any
+    other stream gets utf-8 bytes, for binary output a text stream such as ``sys.stdout``
+    is written through its ``buffer``.
+
+    Args:
+        target (str | os.PathLike | IO): Path of the output file, or a stream.
+        binary (bool, optional): Output is bytes. Defaults to False.
+
+    Yields:
+        IO: Stream to write the output to.
+    """
+    if isinstance(target, (str, os.PathLike)):
+        # the file a symbolic link points to is replaced, not the link.
+        path = os.path.realpath(target)
+        try:
+            mode = os.stat(path).st_mode
+        except FileNotFoundError:
+            mode = None
+        if mode is not None and not stat.S_ISREG(mode):
+            f = open(path, "wb") if binary else open(path, "w", encoding="utf-8")
+            with f:
+                yield f
+            return
+        if mode is None:
+            fd, temp_path = _create_temp_file(path)
+        else:
+            fd, temp_path = tempfile.mkstemp(
+                prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path)
+            )
+        try:
+            f = os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")
+            with f:
+                yield f
+            if mode is not None:
+                # mkstemp() creates the file readable by its owner only.
+                os.chmod(temp_path, stat.S_IMODE(mode))
+            os.replace(temp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+    elif binary:
+        yield target.buffer if isinstance(target, io.TextIOBase) else target
+    elif isinstance(target, io.TextIOBase):
+        yield target
+    else:
+        wrapper = io.TextIOWrapper(target, encoding="utf-8", newline="", write_through=True)
+        try:
+            yield wrapper
+        finally:
+            wrapper.flush()
+            wrapper.detach()
+
+
+def _create_temp_file(path: str) -> Tuple[int, str]:
+    # as mkstemp(), but with the mode open() gives a new file, which the umask applies to.
+    prefix = os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        temp_path = prefix + secrets.token_hex(4) + ".tmp"
+        try:
+            return os.open(temp_path, flags, 0o666), temp_path
+        except FileExistsError:
+            continue
+
+
+class BuildResult:
+    """
+    Outcome of writing an output with ``script_to()``.
+    """
+
+    def __init__(
+        self,
+        target: str | os.PathLike | IO,
+        written: bool = True,
+        fingerprint: str | None = None,
+        dependencies: List[str] | None = None,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            target (str | os.PathLike | IO): Path of the output file, or a stream.
+            written (bool, optional): The output was written, ``False`` when an output
+                with the same fingerprint was left as it was. Defaults to True.
+            fingerprint (str, optional): Hash of the inputs of the build embedded in the output,
+                ``None`` when the build was not fingerprinted.
+            dependencies (List[str], optional): Files the output was built from, see
+                ``depfile.graph_dependencies()``.
+        """
+        self.target = target
+        self.written = written
+        self.fingerprint = fingerprint
+        self.dependencies = [] if dependencies is None else dependencies
+
+    def __repr__(self) -> str:
+        return (
+            f"BuildResult({self.target!r}, written={self.written!r}, "
+            f"fingerprint={self.fingerprint!r})"
+        )
@@ -1,18 +1,46 @@
 from __future__ import annotations
-from typing import Any, List, Set, Callable
-import ast
+from typing import IO, Any, Dict, Iterable, Iterator, List, Sequence, Tuple, Callable
 import os
 import os.path
-import subprocess
-import re
 from pathlib import Path
 
-from scriptmerge.stdlib import is_stdlib_module
+from scriptmerge.bytecode import BytecodeKey, compile_bytecode
+from scriptmerge.extensions import extension_key, loader_source
+from scriptmerge.cache import ArtifactCache, ImportCache
+from scriptmerge.module_graph import (
+    ImportLine as ImportLine,
+    ImportTarget as ImportTarget,
+    ModuleGraph,
+    ModuleGraphBuilder,
+    get_python_paths,
+    read_extension_suffixes_from_python_bin,
+    read_python_version_from_python_bin,
+    read_module_binary,
+)
 import scriptmerge.merge_common as merge_common
-from scriptmerge.merge_common import EventArgs, CancelEventArgs
+from scriptmerge.merge_common import BuildResult, EventArgs, CancelEventArgs
+from scriptmerge.depfile import graph_dependencies
+from scriptmerge.fingerprint import check_unchanged, fingerprint_line
+from scriptmerge.module_filter import ModuleFilter
+from scriptmerge.payload import PayloadEncoder
+from scriptmerge.parallel import resolve_jobs
+from scriptmerge.source_store import SourceStore
+from scriptmerge.transforms import build_pipeline
 
 CALLBACK_GENERATING_PRELUDE = "GENERATING_PRELUDE"
 
+PRELUDE_TEMPDIR = "tempdir"
+PRELUDE_MEMORY = "memory"
+PRELUDE_CACHE = "cache"
+PRELUDE_MODES = (PRELUDE_TEMPDIR, PRELUDE_MEMORY, PRELUDE_CACHE)
+_PRELUDE_FILES = {
+    PRELUDE_TEMPDIR: "prelude.py",
+    PRELUDE_MEMORY: "prelude_memory.py",
+    PRELUDE_CACHE: "prelude_cache.py",
+}
+# written after the module writers, before the script
+_PRELUDE_EPILOGUES = {PRELUDE_CACHE: "    __scriptmerge_finish_modules()\n"}
+
 
 # _RE_CODING =  re.compile(r"^[ \t\f]*#.*?coding[:=][ \t]*([-_.a-zA-Z0-9]+)")
 # https://peps.python.org/pep-0263/
@@ -44,44 +72,198 @@ def script(
         clean (bool, optional): Specifies if the source code should be cleaned.
         callback (Callable[[Any, EventArgs], None], optional): Callback function.
         include_init_py (bool, optional): Include ``__init__.py`` file. Defaults to False.
+        import_cache (ImportCache, optional): Persistent cache of the imports found in each module.
+            Hit and miss counters are available on the instance after the build.
+        artifact_cache (ArtifactCache, optional): Persistent cache of cleaned module contents, shared
+            by ``.py`` and ``.pyz`` builds. Hit and miss counters are available on the instance after the build.
+        transforms (List[str] | TransformPipeline, optional): Names of the transform stages run on each
+            module, such as ``"strip-annotations"``, ``clean`` adds the ``"clean"`` stage. A pipeline is
+            used as it is, and its timings are available on the instance after the build.
+        jobs (int, optional): Number of processes used to parse and transform modules. ``0`` uses one
+            per CPU. Defaults to 1.
+        module_graph (ModuleGraph, optional): Graph from ``resolve_module_graph()`` to build from
+            instead of resolving the modules again.
+        module_filter (ModuleFilter, optional): Compiled exclude patterns, used instead of
+            ``exclude_python_modules``. Lookup counters are available on the instance after the build.
+        import_scanner (str, optional): ``"tokens"`` finds imports with a token scanner instead of
+            parsing each module with ``ast``, faster on very large modules. Defaults to ``"ast"``.
+        prelude_mode (str, optional): How the script makes its modules importable. ``"tempdir"`` writes
+            them to a temporary directory at startup, ``"memory"`` imports them from memory with a
+            ``sys.meta_path`` finder, ``"cache"`` extracts them once to a cache directory keyed by a hash
+            of the output and reuses it on later runs. Defaults to ``"tempdir"``.
+        bytecode_targets (List[str | None], optional): Python binaries to embed precompiled bytecode for,
+            ``None`` is the running interpreter. At runtime the bytecode matching the interpreter is
+            used and the source otherwise. Defaults to no bytecode.
+        bytecode_optimize (int, optional): Optimization level of the bytecode, ``1`` as ``-O`` and ``2`` as ``-OO``.
+            It is only used by an interpreter running at the same level. Defaults to ``0``.
+        payload (PayloadEncoder, optional): Encoding of the module payloads. A compressed payload is
+            decoded when the module is first imported with the ``"memory"`` prelude, and at startup
+            with the ``"tempdir"`` prelude. Defaults to ``repr()`` of the bytes.
+        skip_unchanged (bool, optional): Only used by ``script_to()`` with a path and no ``callback``.
+            Embeds a fingerprint of the inputs of the build in the output, and leaves an existing
+            output with the same fingerprint as it is. Defaults to False.
+        force (bool, optional): With ``skip_unchanged``, writes the output even when its fingerprint
+            is the same. Defaults to False.
+        build_result (BuildResult, optional): Gets the ``dependencies`` of the output, the files
+            it is built from. ``script_to()`` returns one.
         **kwargs (Any): Additional arguments.
+    Raises:
+        ValueError: If ``prelude_mode`` is not a known mode.
     Returns:
         str: Python modules compiled into single file contents.
     """
+    return "".join(
+        _generate(
+            path,
+            add_python_modules=add_python_modules,
+            add_python_paths=add_python_paths,
+            python_binary=python_binary,
+            copy_shebang=copy_shebang,
+            exclude_python_modules=exclude_python_modules,
+            clean=clean,
+            callback=callback,
+            **kwargs,
+        )
+    )
 
-    if add_python_modules is None:
-        add_python_modules = []
 
-    if add_python_paths is None:
-        add_python_paths = []
-    if exclude_python_modules is None:
-        exclude_python_modules = []
+def script_to(
+    target: str | os.PathLike | IO,
+    path: str,
+    *,
+    add_python_modules: List[str] | None = None,
+    add_python_paths: List[str] = None,
+    python_binary: str | None = None,
+    copy_shebang: bool = False,
+    exclude_python_modules: List[str] | None = None,
+    clean: bool = False,
+    callback: Callable[[Any, EventArgs], None] | None = None,
+    **kwargs: Any,
+) -> BuildResult:
+    """
+    Generate Script to a file or stream
+
+    The output is written as it is generated, so only one module is held in memory
+    at a time instead of the whole output. A file is replaced once the output is complete.
 
-    include_init_py = bool(kwargs.get("include_init_py", False))
-    _exclude_python_modules = set(exclude_python_modules)
+    With ``skip_unchanged``, the modules are resolved first and the fingerprint of the
+    inputs is compared with the one embedded in the existing output, which is left as it
+    is when they match.
 
-    python_paths = (
-        [os.path.dirname(path)]
-        + add_python_paths
-        + _read_sys_path_from_python_bin(python_binary)
-    )
-    if callback is not None:
-        ev_args = EventArgs(
-            name=merge_common.CALLBACK_GENERATED_PYTHON_PATHS, source="script"
+    Args:
+        target (str | os.PathLike | IO): Path of the output file, or a stream. A text stream such as
+            ``sys.stdout`` is written as text, any other stream as utf-8 bytes.
+        path (str): Path to entry point py file
+        **kwargs (Any): The arguments of ``script()``.
+
+    Raises:
+        ValueError: If ``prelude_mode`` is not a known mode.
+
+    Returns:
+        BuildResult: Whether the output was written, its fingerprint and the files it depends on.
+    """
+    result = BuildResult(target)
+    force = bool(kwargs.pop("force", False))
+    # the sources are read again when written, so the whole tree is never held in memory.
+    kwargs.setdefault("stream_sources", True)
+    if (
+        kwargs.pop("skip_unchanged", False)
+        and callback is None
+        and isinstance(target, (str, os.PathLike))
+    ):
+        options = dict(
+            kwargs,
+            add_python_modules=add_python_modules,
+            add_python_paths=add_python_paths,
+            python_binary=python_binary,
+            copy_shebang=copy_shebang,
+            exclude_python_modules=exclude_python_modules,
+            clean=clean,
         )
-        event_data = {
-            "python_paths": python_paths,
-            "path": path,
-            "copy": copy_shebang,
-            "clean": clean,
-        }
-        ev_args.event_data = event_data
-        callback("script", ev_args)
-        python_paths = ev_args.event_data.get("python_paths", python_paths)
+        prelude_mode = str(kwargs.get("prelude_mode", PRELUDE_TEMPDIR))
+        prelude = _prelude(prelude_mode) if prelude_mode in PRELUDE_MODES else ""
+        result, module_graph, resolved = check_unchanged(
+            "py", target, path, options, prelude, force=force
+        )
+        if not result.written:
+            result.dependencies = _dependencies(module_graph, prelude_mode)
+            return result
+        kwargs.update(
+            module_graph=module_graph, release_sources=resolved, fingerprint=result.fingerprint
+        )
+    kwargs["build_result"] = result
+    with merge_common.open_output(target) as output:
+        for chunk in _generate(
+            path,
+            add_python_modules=add_python_modules,
+            add_python_paths=add_python_paths,
+            python_binary=python_binary,
+            copy_shebang=copy_shebang,
+            exclude_python_modules=exclude_python_modules,
+            clean=clean,
+            callback=callback,
+            **kwargs,
+        ):
+            output.write(chunk)
+    return result
+
 
-    output = []
+def _generate(
+    path: str,
+    *,
+    add_python_modules: List[str] | None = None,
+    add_python_paths: List[str] = None,
+    python_binary: str | None = None,
+    copy_shebang: bool = False,
+    exclude_python_modules: List[str] | None = None,
+    clean: bool = False,
+    callback: Callable[[Any, EventArgs], None] | None = None,
+    **kwargs: Any,
+) -> Iterator[str]:
+    if add_python_modules is None:
+        add_python_modules = []
+
+    include_init_py = bool(kwargs.get("include_init_py", False))
+    import_cache: ImportCache | None = kwargs.get("import_cache", None)
+    artifact_cache: ArtifactCache | None = kwargs.get("artifact_cache", None)
+    pipeline = build_pipeline(clean, kwargs.get("transforms", None))
+    jobs = resolve_jobs(int(kwargs.get("jobs", 1)))
+    module_graph: ModuleGraph | None = kwargs.get("module_graph", None)
+    module_filter: ModuleFilter | None = kwargs.get("module_filter", None)
+    import_scanner = str(kwargs.get("import_scanner", "ast"))
+    prelude_mode = str(kwargs.get("prelude_mode", PRELUDE_TEMPDIR))
+    if prelude_mode not in PRELUDE_MODES:
+        raise ValueError(f"prelude_mode must be one of {PRELUDE_MODES}, not {prelude_mode!r}")
+    bytecode_targets: List[str | None] = list(kwargs.get("bytecode_targets", None) or [])
+    bytecode_optimize = int(kwargs.get("bytecode_optimize", 0))
+    payload: PayloadEncoder | None = kwargs.get("payload", None)
+    fingerprint: str | None = kwargs.get("fingerprint", None)
+    build_result: BuildResult | None = kwargs.get("build_result", None)
+    if module_filter is not None:
+        exclude_python_modules = list(module_filter.patterns)
+
+    # a graph passed in belongs to the caller, which may build more outputs from it.
+    release = bool(kwargs.get("release_sources", module_graph is None))
+    if module_graph is None:
+        sources = SourceStore(
+            import_scanner=import_scanner,
+            artifact_cache=artifact_cache,
+            pipeline=pipeline,
+            streaming=release and bool(kwargs.get("stream_sources", False)),
+        )
+        python_paths = get_python_paths(
+            path,
+            add_python_paths=add_python_paths,
+            python_binary=python_binary,
+            callback=callback,
+            copy_shebang=copy_shebang,
+            clean=clean,
+        )
+    else:
+        sources = module_graph.sources
+        python_paths = list(module_graph.sys_path)
 
-    shebang = _generate_shebang(path, copy=copy_shebang)
+    shebang = _generate_shebang(path, copy=copy_shebang, sources=sources)
 
     if callback is not None:
         ev_args = CancelEventArgs(
@@ -106,9 +288,11 @@ def script(
                     shebang += "\n"
 
     if shebang:
-        output.append(shebang)
+        yield shebang
+    if fingerprint is not None:
+        yield fingerprint_line(fingerprint)
 
-    prelude = _prelude()
+    prelude = _prelude(prelude_mode)
 
     if callback is not None:
         cancel_args = CancelEventArgs(name=CALLBACK_GENERATING_PRELUDE, source="script")
@@ -128,7 +312,7 @@ def script(
                 prelude += "\n"
 
     if prelude:
-        output.append(prelude)
+        yield prelude
 
     if include_init_py:
         content = ""
@@ -154,332 +338,188 @@ def script(
                 content=content, manual_file_name="__init__.py"
             ) as init_py_name:
                 merge_item = ScriptMergeItem(init_py_name, clean)
-                mod_gen = ModuleWriterGenerator(
-                    sys_path=python_paths, clean=clean, callback=callback
+                yield from _iter_module_writers(
+                    merge_item.get_build_item(),
+                    bytecode_targets,
+                    bytecode_optimize,
+                    payload,
                 )
-                output.append(mod_gen.build_script_merge_items(merge_item))
 
-    output.append(
-        _generate_module_writers(
-            path,
+    if module_graph is None:
+        builder = ModuleGraphBuilder(
             sys_path=python_paths,
-            add_python_modules=add_python_modules,
-            exclude_python_modules=_exclude_python_modules,
             clean=clean,
             callback=callback,
+            import_cache=import_cache,
+            jobs=jobs,
+            sources=sources,
+            module_filter=module_filter,
+            python_version=read_python_version_from_python_bin(python_binary),
+            extension_suffixes=read_extension_suffixes_from_python_bin(python_binary),
+        )
+        builder.generate_for_file(
+            path,
+            add_python_modules=add_python_modules,
+            exclude_python_modules=set(exclude_python_modules or []),
         )
+        module_graph = builder.graph()
+        if import_cache is not None:
+            import_cache.prune()
+    if build_result is not None:
+        build_result.dependencies = _dependencies(module_graph, prelude_mode)
+
+    yield from _iter_module_writers(
+        (
+            (module.relative_path, contents)
+            for module, contents in module_graph.iter_contents(
+                pipeline is not None, release=release, extensions=False, jobs=jobs
+            )
+        ),
+        bytecode_targets,
+        bytecode_optimize,
+        payload,
     )
+    yield from _iter_extension_writers(module_graph, release, payload)
+    if artifact_cache is not None:
+        artifact_cache.prune()
+    if prelude and prelude_mode in _PRELUDE_EPILOGUES:
+        yield _PRELUDE_EPILOGUES[prelude_mode]
 
     # The script will be written directly to the output.
-    source_contents = merge_common.read_str_file(path)
+    source_contents = sources.text(path)
+    if release:
+        sources.release(path)
     shebang_cleaned = merge_common.remove_shebang(source_contents)
-    output.append(_indent(shebang_cleaned))
-
-    return "".join(output)
-
-
-def _read_sys_path_from_python_bin(binary_path: str):
-    if binary_path is None:
-        return []
-    else:
-        output = subprocess.check_output(
-            [binary_path, "-E", "-c", "import sys;\nfor path in sys.path: print(path)"],
-        )
-        return [
-            # TODO: handle non-UTF-8 encodings
-            line.strip().decode("utf-8")
-            for line in output.split(b"\n")
-            if line.strip()
-        ]
+    yield _indent(shebang_cleaned)
 
 
 def _indent(string: str):
     return "    " + string.replace("\n", "\n    ")
 
 
-def _generate_shebang(path: str, copy: bool):
+def _generate_shebang(path: str, copy: bool, sources: SourceStore | None = None):
     if copy:
-        with _open_source_file(path) as script_file:
-            first_line = script_file.readline()
-            if first_line.startswith("#!"):
-                return first_line
+        first_line = _read_first_line(path, sources)
+        if first_line.startswith("#!"):
+            return first_line
 
     return "#!/usr/bin/env python3\n"
 
 
-def _prelude():
-    prelude_path = os.path.join(os.path.dirname(__file__), "prelude.py")
-    with open(prelude_path, encoding="utf-8") as prelude_file:
+def _prelude(mode: str = PRELUDE_TEMPDIR):
+    with open(_prelude_path(mode), encoding="utf-8") as prelude_file:
         return prelude_file.read()
 
 
-def _generate_module_writers(
-    path: str,
-    sys_path: List[str],
-    add_python_modules: List[str],
-    exclude_python_modules: Set[str],
-    clean: bool,
-    callback: Callable[[Any, EventArgs], None] | None = None,
-):
-    generator = ModuleWriterGenerator(sys_path, clean, callback=callback)
-    generator.generate_for_file(
-        path,
-        add_python_modules=add_python_modules,
-        exclude_python_modules=exclude_python_modules,
-    )
-    return generator.build()
-
-
-class ModuleWriterGenerator:
-
-    def __init__(
-        self,
-        sys_path: List[str],
-        clean: bool,
-        callback: Callable[[Any, EventArgs], None] | None = None,
-    ):
-        self._sys_path = sys_path
-        self._modules = {}
-        self._clean = clean
-        self._callback = callback
-
-    def build(self):
-        output = []
-        for module_path, module_source in self._modules.values():
-            output.append(
-                "    __scriptmerge_write_module({0}, {1})\n".format(
-                    repr(module_path), repr(module_source)
-                )
-            )
-        return "".join(output)
-
-    def build_script_merge_items(self, item: ScriptMergeItem) -> str:
-        mods = self._modules.copy()
-        self._modules = item.get_build_item()
-        output = self.build()
-        self._modules = mods
-        return output
-
-    def generate_for_file(
-        self,
-        python_file_path: str,
-        add_python_modules: List[str],
-        exclude_python_modules: Set[str],
-    ) -> None:
-        if self._callback is not None:
-            cancel_args = CancelEventArgs(
-                name=merge_common.CALLBACK_GENERATING_FOR_FILE, source=self
-            )
-            event_data = {
-                "path": python_file_path,
-                "add_python_modules": add_python_modules,
-                "exclude_python_modules": exclude_python_modules,
-            }
-            cancel_args.event_data = event_data
-            self._callback(self, cancel_args)
-            if cancel_args.cancel:
-                return
-            python_file_path = cancel_args.event_data.get("path", python_file_path)
-            add_python_modules = cancel_args.event_data.get(
-                "add_python_modules", add_python_modules
-            )
-            exclude_python_modules = cancel_args.event_data.get(
-                "exclude_python_modules", exclude_python_modules
-            )
-
-        self._generate_for_module(
-            ImportTarget(
-                python_file_path,
-                relative_path=None,
-                is_package=False,
-                module_name=None,
-                clean=self._clean,
-            ),
-            exclude_python_modules,
-        )
-
-        for add_python_module in add_python_modules:
-            import_line = ImportLine(module_name=add_python_module, items=[])
-            self._generate_for_import(
-                python_module=None,
-                import_line=import_line,
-                exclude_python_modules=exclude_python_modules,
-            )
-
-    def _generate_for_module(
-        self, python_module: ImportTarget, exclude_python_modules: Set[str]
-    ) -> None:
-        def is_excluded(line: ImportLine):
-            for exclude in exclude_python_modules:
-                if re.match(exclude, line.module_name):
-                    return True
-            return False
-
-        if self._callback is not None:
-            cancel_args = CancelEventArgs(
-                name=merge_common.CALLBACK_GENERATING_FOR_MODULE, source=self
-            )
-            event_data = {
-                "module": python_module,
-                "exclude_python_modules": exclude_python_modules,
-            }
-            cancel_args.event_data = event_data
-            self._callback(self, cancel_args)
-            if cancel_args.cancel:
-                return
-            python_module = cancel_args.event_data.get("module", python_module)
-            exclude_python_modules = cancel_args.event_data.get(
-                "exclude_python_modules", exclude_python_modules
+def _prelude_path(mode: str) -> str:
+    return os.path.join(os.path.dirname(__file__), _PRELUDE_FILES[mode])
+
+
+def _dependencies(module_graph: ModuleGraph, prelude_mode: str) -> List[str]:
+    return graph_dependencies(module_graph, [_prelude_path(prelude_mode)])
+
+
+def _iter_module_writers(
+    modules: Iterable[Tuple[str, bytes]],
+    bytecode_targets: Sequence[str | None],
+    bytecode_optimize: int,
+    payload: PayloadEncoder | None = None,
+) -> Iterator[str]:
+    if not bytecode_targets:
+        return _iter_writer_lines(modules, payload=payload)
+    # bytecode is compiled for all the modules at once, one process per target.
+    modules = list(modules)
+    bytecode = compile_bytecode(modules, bytecode_targets, bytecode_optimize)
+    return _iter_writer_lines(modules, bytecode, payload)
+
+
+def _iter_extension_writers(
+    module_graph: ModuleGraph, release: bool, payload: PayloadEncoder | None = None
+) -> Iterator[str]:
+    if payload is not None and payload.is_raw:
+        payload = None
+    loader_written = False
+    for module in module_graph:
+        if not module.is_extension:
+            continue
+        if not loader_written:
+            # only an output with extension modules has the loader.
+            loader_written = True
+            yield "".join(
+                "    " + line if line.strip() else line
+                for line in loader_source().splitlines(True)
             )
+        contents = module_graph.read_module(module, False)
+        args = [
+            repr(module.module_name),
+            repr(module.relative_path),
+            repr(extension_key(contents)),
+        ]
+        if payload is None:
+            args.append(repr(contents))
+        else:
+            args.append(repr(payload.encode(contents)))
+            args.append(f"encoding={payload.name!r}")
+        yield "    __scriptmerge_add_extension({0})\n".format(", ".join(args))
+        if release:
+            module_graph.release(module)
 
-        import_lines = _find_imports_in_module(python_module)
-        for import_line in import_lines:
-            if not _is_stdlib_import(import_line) and not is_excluded(import_line):
-                self._generate_for_import(
-                    python_module, import_line, exclude_python_modules
-                )
 
-    def _generate_for_import(
-        self,
-        python_module: ImportTarget,
-        import_line: ImportTarget,
-        exclude_python_modules: Set[str],
-    ) -> None:
-        import_targets = self._read_possible_import_targets(python_module, import_line)
-
-        for import_target in import_targets:
-            if import_target.module_name not in self._modules:
-                self._modules[import_target.module_name] = (
-                    import_target.relative_path,
-                    import_target.read_binary(),
-                )
-                self._generate_for_module(
-                    python_module=import_target,
-                    exclude_python_modules=exclude_python_modules,
-                )
+def _build_module_writers(
+    modules: Iterable[Tuple[str, bytes]],
+    bytecode: Dict[str, Dict[BytecodeKey, bytes]] | None = None,
+    payload: PayloadEncoder | None = None,
+) -> str:
+    return "".join(_iter_writer_lines(modules, bytecode, payload))
+
+
+def _iter_writer_lines(
+    modules: Iterable[Tuple[str, bytes]],
+    bytecode: Dict[str, Dict[BytecodeKey, bytes]] | None = None,
+    payload: PayloadEncoder | None = None,
+) -> Iterator[str]:
+    if payload is not None and payload.is_raw:
+        payload = None
+    for module_path, module_source in modules:
+        args = [repr(module_path)]
+        code = bytecode.get(module_path) if bytecode else None
+        if payload is None:
+            args.append(repr(module_source))
+            if code:
+                args.append(repr(code))
+        else:
+            args.append(repr(payload.encode(module_source)))
+            if code:
+                args.append(repr({key: payload.encode(value) for key, value in code.items()}))
+            args.append(f"encoding={payload.name!r}")
+        yield "    __scriptmerge_write_module({0})\n".format(", ".join(args))
 
-    def _read_possible_import_targets(
-        self, python_module: ImportTarget, import_line: ImportLine
-    ) -> List[ImportTarget]:
-        module_name_parts = import_line.module_name.split(".")
 
-        module_names = [
-            ".".join(module_name_parts[0 : index + 1])
-            for index in range(len(module_name_parts))
-        ] + [import_line.module_name + "." + item for item in import_line.items]
+class ModuleWriterGenerator(ModuleGraphBuilder):
+    """
+    Collects the modules of a script and writes them as ``__scriptmerge_write_module`` calls.
+    """
 
-        import_targets = [
-            self._find_module(module_name) for module_name in module_names
-        ]
+    def build(self) -> str:
+        return _build_module_writers(
+            (module.relative_path, module.read_binary())
+            for module in self._modules.values()
+        )
 
-        valid_import_targets = [
-            target for target in import_targets if target is not None
-        ]
-        return valid_import_targets
-        # TODO: allow the user some choice in what happens in this case?
-        # Detection of try/except blocks is possibly over-complicating things
-        # ~ if len(valid_import_targets) > 0:
-        # ~ return valid_import_targets
-        # ~ else:
-        # ~ raise RuntimeError("Could not find module: " + import_line.import_path)
-
-    def _find_module(self, module_name: str) -> ImportTarget | None:
-        for sys_path in self._sys_path:
-            for is_package in (True, False):
-                if is_package:
-                    suffix = "/__init__.py"
-                else:
-                    suffix = ".py"
-
-                relative_path = module_name.replace(".", "/") + suffix
-                full_module_path = os.path.join(sys_path, relative_path)
-                if os.path.exists(full_module_path):
-                    return ImportTarget(
-                        full_module_path,
-                        relative_path=relative_path,
-                        is_package=is_package,
-                        module_name=module_name,
-                        clean=self._clean,
-                    )
-        return None
-
-
-def _find_imports_in_module(python_module: ImportTarget):
-    source = _read_binary(python_module.absolute_path)
-    parse_tree = ast.parse(source, python_module.absolute_path)
-
-    for node in ast.walk(parse_tree):
-        if isinstance(node, ast.Import):
-            for name in node.names:
-                yield ImportLine(name.name, [])
-
-        if isinstance(node, ast.ImportFrom):
-            if node.level == 0:
-                module = node.module
-            else:
-                level = node.level
-
-                if python_module.is_package:
-                    level -= 1
-
-                if level == 0:
-                    package_name = python_module.module_name
-                else:
-                    package_name = ".".join(
-                        python_module.module_name.split(".")[:-level]
-                    )
-
-                if node.module is None:
-                    module = package_name
-                else:
-                    module = package_name + "." + node.module
-
-            yield ImportLine(module, [name.name for name in node.names])
-
-
-def _read_binary(path: str) -> bytes:
-    with open(path, "rb") as file:
-        return file.read()
+    def build_script_merge_items(self, item: ScriptMergeItem) -> str:
+        return _build_module_writers(item.get_build_item())
 
 
 def _open_source_file(path: str):
     return open(path, "rt", encoding="utf-8")
 
 
-def _is_stdlib_import(import_line: ImportLine) -> bool:
-    return is_stdlib_module(import_line.module_name)
-
-
-class ImportTarget:
-
-    def __init__(
-        self,
-        absolute_path: str,
-        relative_path: str,
-        is_package: bool,
-        module_name: str,
-        clean: bool,
-    ):
-        self.absolute_path = absolute_path
-        self.relative_path = relative_path
-        self.is_package = is_package
-        self.module_name = module_name
-        self._clean = clean
-
-    def read_binary(self) -> bytes:
-        if self._clean:
-            with open(self.absolute_path, "rt", encoding="utf-8") as file:
-                file_str = merge_common.remove_comments_and_doc_strings(file.read())
-                return file_str.encode("utf-8")
-
-        with open(self.absolute_path, "rb") as file:
-            return file.read()
-
-
-class ImportLine:
-    def __init__(self, module_name: str, items: List[str]):
-        self.module_name = module_name
-        self.items = items
+def _read_first_line(path: str, sources: SourceStore | None) -> str:
+    if sources is None:
+        with _open_source_file(path) as script_file:
+            return script_file.readline()
+    text = sources.text(path)
+    return text[: text.find("\n") + 1] if "\n" in text else text
 
 
 class ScriptMergeItem:
@@ -488,19 +528,12 @@ class ScriptMergeItem:
         self.clean = clean
 
     def _read_binary(self) -> bytes:
-        if self.clean:
-            with open(self.absolute_path, "rt", encoding="utf-8") as file:
-                file_str = merge_common.remove_comments_and_doc_strings(file.read())
-                return file_str.encode("utf-8")
-
-        with open(self.absolute_path, "rb") as file:
-            return file.read()
+        return read_module_binary(self.absolute_path, self.clean)
 
-    def get_build_item(self):
+    def get_build_item(self) -> List[Tuple[str, bytes]]:
         abs_path = Path(self.absolute_path)
         module_rel_path = abs_path.name
-        module_name = module_rel_path.replace(".py", "")
-        return {module_name: (module_rel_path, self._read_binary())}
+        return [(module_rel_path, self._read_binary())]
 
     def __repr__(self):
         return f"ScriptMergeItem({self.absolute_path!r}, {self.clean!r})"
@@ -1,23 +1,57 @@
 from __future__ import annotations
-from typing import Any, List, Set, Callable
-import ast
+from typing import IO, Any, Dict, Iterable, List, Callable, Tuple
 import os
 import os.path
-import subprocess
-import re
 import io
-import zipapp
+import contextlib
+import importlib.util
 import tempfile
-import shutil
+import time
+import zipfile
 from pathlib import Path
-from scriptmerge.stdlib import is_stdlib_module
+from scriptmerge.bytecode import (
+    BYTECODE_LOADER_MODULE,
+    bytecode_loader_path,
+    bytecode_loader_source,
+    compile_bytecode,
+)
+from scriptmerge.cache import ArtifactCache, ImportCache
+from scriptmerge.extensions import (
+    EXTENSION_LOADER_MODULE,
+    extension_key,
+    insert_loader_import,
+    loader_source,
+)
+from scriptmerge.module_graph import (
+    ImportLine as ImportLine,
+    ImportTarget as ImportTarget,
+    ModuleGraph,
+    ModuleGraphBuilder,
+    get_python_paths,
+    read_extension_suffixes_from_python_bin,
+    read_python_version_from_python_bin,
+)
 import scriptmerge.merge_common as merge_common
-from scriptmerge.merge_common import EventArgs, CancelEventArgs
+from scriptmerge.merge_common import BuildResult, EventArgs, CancelEventArgs
+from scriptmerge.depfile import graph_dependencies
+from scriptmerge.fingerprint import FINGERPRINT_PREFIX, check_unchanged
+from scriptmerge.module_filter import ModuleFilter
+from scriptmerge.parallel import resolve_jobs
+from scriptmerge.source_store import SourceStore
+from scriptmerge.transforms import build_pipeline
 
 
 CALLBACK_GENERATING_MAIN_PY_FILE = "GENERATING_MAIN_PY_FILE"
 CALLBACK_GENERATED_MAIN_PY_FILE_CONTENT = "GENERATED_MAIN_PY_FILE_CONTENT"
 
+# zipimport reads stored and deflated entries only, other zip methods cannot be imported.
+COMPRESS_NONE = "none"
+COMPRESS_DEFLATE = "deflate"
+COMPRESS_METHODS = (COMPRESS_NONE, COMPRESS_DEFLATE)
+_ZIP_METHODS = {COMPRESS_NONE: zipfile.ZIP_STORED, COMPRESS_DEFLATE: zipfile.ZIP_DEFLATED}
+# the earliest date a zip entry can have
+_ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
 
 # _RE_CODING =  re.compile(r"^[ \t\f]*#.*?coding[:=][ \t]*([-_.a-zA-Z0-9]+)")
 # https://peps.python.org/pep-0263/
@@ -38,6 +72,9 @@ def script(
     """
     Generate Script
 
+    The entries of the archive are dated ``SOURCE_DATE_EPOCH`` when it is set, and
+    1980-01-01 otherwise, so the same inputs always give the same archive.
+
     Args:
         path (str): Path to entry point py file
         add_python_modules (List[str], optional): Extra Python modules to include.
@@ -48,42 +85,203 @@ def script(
             Such as ["__init__", "greetings*"]
         clean (bool, optional): Specifies if the source code should be cleaned. Defaults to False.
         callback (Callable[[Any, EventArgs], None], optional): Callback function.
+        import_cache (ImportCache, optional): Persistent cache of the imports found in each module.
+            Hit and miss counters are available on the instance after the build.
+        artifact_cache (ArtifactCache, optional): Persistent cache of cleaned module contents, shared
+            by ``.py`` and ``.pyz`` builds. Hit and miss counters are available on the instance after the build.
+        transforms (List[str] | TransformPipeline, optional): Names of the transform stages run on each
+            module, such as ``"strip-annotations"``, ``clean`` adds the ``"clean"`` stage. A pipeline is
+            used as it is, and its timings are available on the instance after the build.
+        jobs (int, optional): Number of processes used to parse and transform modules. ``0`` uses one
+            per CPU. Defaults to 1.
+        module_graph (ModuleGraph, optional): Graph from ``resolve_module_graph()`` to build from
+            instead of resolving the modules again.
+        module_filter (ModuleFilter, optional): Compiled exclude patterns, used instead of
+            ``exclude_python_modules``. Lookup counters are available on the instance after the build.
+        import_scanner (str, optional): ``"tokens"`` finds imports with a token scanner instead of
+            parsing each module with ``ast``, faster on very large modules. Defaults to ``"ast"``.
+        compression (str, optional): ``"deflate"`` compresses the archive entries, one after
+            another as ``zipfile`` writes them. Defaults to ``"none"``.
+        compress_level (int, optional): Deflate level from ``0`` to ``9``. Defaults to zlib's default.
+        precompile (bool, optional): Adds a ``.pyc`` next to each module, which ``zipimport`` loads
+            instead of compiling the source on each run. Defaults to False.
+        precompile_binary (str, optional): Python binary the ``.pyc`` files are compiled for. Another
+            version of Python compiles the sources instead. Defaults to the running interpreter.
+        precompile_optimize (int, optional): Optimization level of the ``.pyc`` files, ``1`` as ``-O``
+            and ``2`` as ``-OO``. They are loaded at any level. Defaults to ``0``.
+        bytecode_only (bool, optional): Writes the ``.pyc`` files without the sources, so the archive
+            only runs on the version of Python it was compiled for. Implies ``precompile``. Defaults to False.
+        skip_unchanged (bool, optional): Only used by ``script_to()`` with a path and no ``callback``.
+            Embeds a fingerprint of the inputs of the build as the archive comment, and leaves an
+            existing output with the same fingerprint as it is. Defaults to False.
+        force (bool, optional): With ``skip_unchanged``, writes the output even when its fingerprint
+            is the same. Defaults to False.
+        build_result (BuildResult, optional): Gets the ``dependencies`` of the output, the files
+            it is built from. ``script_to()`` returns one.
+
+    Raises:
+        ValueError: If ``compression``, ``compress_level`` or ``precompile_optimize`` is not valid.
 
     Returns:
         bytes: Python modules compiled into bytes.
     """
+    output = io.BytesIO()
+    _write_archive(
+        output,
+        path,
+        add_python_modules=add_python_modules,
+        add_python_paths=add_python_paths,
+        python_binary=python_binary,
+        copy_shebang=copy_shebang,
+        exclude_python_modules=exclude_python_modules,
+        clean=clean,
+        callback=callback,
+        **kwargs,
+    )
+    return output.getvalue()
 
-    if add_python_modules is None:
-        add_python_modules = []
 
-    if add_python_paths is None:
-        add_python_paths = []
-    if exclude_python_modules is None:
-        exclude_python_modules = []
+def script_to(
+    target: str | os.PathLike | IO,
+    path: str,
+    *,
+    add_python_modules: List[str] | None = None,
+    add_python_paths: List[str] = None,
+    python_binary: str | None = None,
+    copy_shebang: bool = False,
+    exclude_python_modules: List[str] | None = None,
+    clean: bool = False,
+    callback: Callable[[Any, EventArgs], None] | None = None,
+    **kwargs: Any,
+) -> BuildResult:
+    """
+    Generate Script to a file or stream
 
-    _exclude_python_modules = set(exclude_python_modules)
+    The archive is written to the target as it is built, without a copy of it in memory.
+    A file is replaced once the archive is complete.
 
-    python_paths = (
-        [os.path.dirname(path)]
-        + add_python_paths
-        + _read_sys_path_from_python_bin(python_binary)
-    )
+    With ``skip_unchanged``, the modules are resolved first and the fingerprint of the
+    inputs is compared with the one embedded in the existing archive, which is left as it
+    is when they match.
 
-    if callback is not None:
-        ev_args = EventArgs(
-            name=merge_common.CALLBACK_GENERATED_PYTHON_PATHS, source="script"
+    Args:
+        target (str | os.PathLike | IO): Path of the output file, or a binary stream.
+            A text stream such as ``sys.stdout`` is written through its ``buffer``.
+        path (str): Path to entry point py file
+        **kwargs (Any): The arguments of ``script()``.
+
+    Returns:
+        BuildResult: Whether the output was written, its fingerprint and the files it depends on.
+    """
+    result = BuildResult(target)
+    force = bool(kwargs.pop("force", False))
+    # the sources are read again when written, so the whole tree is never held in memory.
+    kwargs.setdefault("stream_sources", True)
+    if (
+        kwargs.pop("skip_unchanged", False)
+        and callback is None
+        and isinstance(target, (str, os.PathLike))
+    ):
+        options = dict(
+            kwargs,
+            add_python_modules=add_python_modules,
+            add_python_paths=add_python_paths,
+            python_binary=python_binary,
+            copy_shebang=copy_shebang,
+            exclude_python_modules=exclude_python_modules,
+            clean=clean,
         )
-        event_data = {
-            "python_paths": python_paths,
-            "path": path,
-            "copy": copy_shebang,
-            "clean": clean,
-        }
-        ev_args.event_data = event_data
-        callback("script", ev_args)
-        python_paths = ev_args.event_data.get("python_paths", python_paths)
+        result, module_graph, resolved = check_unchanged(
+            "pyz", target, path, options, loader_source() + bytecode_loader_source(), force=force
+        )
+        if not result.written:
+            result.dependencies = _dependencies(
+                module_graph, bool(kwargs.get("precompile") or kwargs.get("bytecode_only"))
+            )
+            return result
+        kwargs.update(
+            module_graph=module_graph, release_sources=resolved, fingerprint=result.fingerprint
+        )
+    kwargs["build_result"] = result
+    with merge_common.open_output(target, binary=True) as output:
+        _write_archive(
+            output,
+            path,
+            add_python_modules=add_python_modules,
+            add_python_paths=add_python_paths,
+            python_binary=python_binary,
+            copy_shebang=copy_shebang,
+            exclude_python_modules=exclude_python_modules,
+            clean=clean,
+            callback=callback,
+            **kwargs,
+        )
+    return result
+
 
-    shebang = _generate_interpreter(path, copy=copy_shebang)
+def _write_archive(
+    output: IO[bytes],
+    path: str,
+    *,
+    add_python_modules: List[str] | None = None,
+    add_python_paths: List[str] = None,
+    python_binary: str | None = None,
+    copy_shebang: bool = False,
+    exclude_python_modules: List[str] | None = None,
+    clean: bool = False,
+    callback: Callable[[Any, EventArgs], None] | None = None,
+    **kwargs: Any,
+) -> None:
+
+    if add_python_modules is None:
+        add_python_modules = []
+
+    import_cache: ImportCache | None = kwargs.get("import_cache", None)
+    artifact_cache: ArtifactCache | None = kwargs.get("artifact_cache", None)
+    pipeline = build_pipeline(clean, kwargs.get("transforms", None))
+    jobs = resolve_jobs(int(kwargs.get("jobs", 1)))
+    module_graph: ModuleGraph | None = kwargs.get("module_graph", None)
+    module_filter: ModuleFilter | None = kwargs.get("module_filter", None)
+    import_scanner = str(kwargs.get("import_scanner", "ast"))
+    compression = str(kwargs.get("compression", COMPRESS_NONE))
+    if compression not in COMPRESS_METHODS:
+        raise ValueError(f"compression must be one of {COMPRESS_METHODS}, not {compression!r}")
+    compress_level: int | None = kwargs.get("compress_level", None)
+    if compress_level is not None and not 0 <= compress_level <= 9:
+        raise ValueError(f"compress_level must be from 0 to 9, not {compress_level!r}")
+    bytecode_only = bool(kwargs.get("bytecode_only", False))
+    precompile = bytecode_only or bool(kwargs.get("precompile", False))
+    precompile_binary: str | None = kwargs.get("precompile_binary", None)
+    precompile_optimize = int(kwargs.get("precompile_optimize", 0))
+    if precompile_optimize not in (0, 1, 2):
+        raise ValueError(f"precompile_optimize must be 0, 1 or 2, not {precompile_optimize!r}")
+    fingerprint: str | None = kwargs.get("fingerprint", None)
+    build_result: BuildResult | None = kwargs.get("build_result", None)
+    if module_filter is not None:
+        exclude_python_modules = list(module_filter.patterns)
+
+    # a graph passed in belongs to the caller, which may build more outputs from it.
+    release = bool(kwargs.get("release_sources", module_graph is None))
+    if module_graph is None:
+        sources = SourceStore(
+            import_scanner=import_scanner,
+            artifact_cache=artifact_cache,
+            pipeline=pipeline,
+            streaming=release and bool(kwargs.get("stream_sources", False)),
+        )
+        python_paths = get_python_paths(
+            path,
+            add_python_paths=add_python_paths,
+            python_binary=python_binary,
+            callback=callback,
+            copy_shebang=copy_shebang,
+            clean=clean,
+        )
+    else:
+        sources = module_graph.sources
+        python_paths = list(module_graph.sys_path)
+
+    shebang = _generate_interpreter(path, copy=copy_shebang, sources=sources)
     if callback is not None:
         ev_args = CancelEventArgs(
             name=merge_common.CALLBACK_GENERATED_SHEBANG, source="script"
@@ -103,42 +301,40 @@ def script(
             if shebang.startswith("#!"):
                 shebang = str(shebang[2:]).lstrip()
 
-    source_contents = merge_common.read_str_file(path)
+    source_contents = sources.text(path)
     shebang_src = merge_common.remove_shebang(source_contents)
     if shebang:
         gen_shebang_src = f"#!{shebang}\n" + shebang_src
     else:
         gen_shebang_src = shebang_src
 
-    with tempfile.TemporaryDirectory() as archive_dir:
+    with contextlib.ExitStack() as stack:
+        extra_dir = None
         if callback is not None:
             # This event give a chance to modify the path of the __main__.py file.
             # If the user wishes to write the script of a different file then this is the event to do it.
             # Note that __main__py is required for a pyz file or it will not build.
+            # Files written to the directory are added to the archive.
+            extra_dir = stack.enter_context(tempfile.TemporaryDirectory())
             ev_args = EventArgs(
                 name=CALLBACK_GENERATING_MAIN_PY_FILE,
                 source="script",
             )
             event_data = {
-                "dir": archive_dir,
+                "dir": extra_dir,
                 "path": path,
                 "clean": clean,
             }
             ev_args.event_data = event_data
             callback("script", ev_args)
 
-        merge_common.write_str_file(
-            os.path.join(archive_dir, "__main__.py"), gen_shebang_src
-        )
-
-        # shutil.copyfile(path, os.path.join(archive_dir, "__main__.py"))
-
-        with open(os.path.join(archive_dir, "__main__.py"), "r", encoding="utf-8") as f:
-            build_contents = f.read()
+        main_bytes = gen_shebang_src.encode("utf-8")
 
         if callback is not None:
             # if the user wants to modify the contents of the __main__.py file or append to it then
             # this is the event to do it.
+            # newlines are translated the way reading the file back in text mode did.
+            build_contents = gen_shebang_src.replace("\r\n", "\n").replace("\r", "\n")
             ev_args = EventArgs(
                 name=CALLBACK_GENERATED_MAIN_PY_FILE_CONTENT,
                 source="script",
@@ -152,66 +348,252 @@ def script(
             callback("script", ev_args)
             contents = ev_args.event_data.get("contents", build_contents)
             if contents != build_contents:
-                with open(
-                    os.path.join(archive_dir, "__main__.py"),
-                    "w",
-                    encoding="utf-8",
-                    newline="\n",
-                ) as f:
-                    f.write(contents)
-
-        init_file_path = os.path.join(archive_dir, "__init__.py")
+                main_bytes = contents.encode("utf-8")
+
         contents = ""
-        with open(init_file_path, "w", encoding="utf-8", newline="\n") as f:
-            if callback is not None:
-                # This event give a chance to modify the contents of the __init__.py file.
-                ev_args = EventArgs(
-                    name=merge_common.CALLBACK_GENERATING_INIT_PY_FILE,
-                    source="script",
-                )
-                event_data = {
-                    "contents": "",
-                    "clean": clean,
-                }
-                ev_args.event_data = event_data
-                callback("script", ev_args)
-                contents = ev_args.event_data.get("contents", contents)
-                if not isinstance(contents, str):
-                    contents = ""
-            f.write(contents)
-
-        generator = ModuleWriterGenerator(
-            sys_path=python_paths, clean=clean, callback=callback
-        )
-        generator.generate_for_file(
-            path,
-            add_python_modules=add_python_modules,
-            exclude_python_modules=_exclude_python_modules,
-        )
-        for module in generator._modules.values():
-            make_package(archive_dir=archive_dir, module=module)
-            archive_module_path = os.path.join(archive_dir, module.relative_path)
-            if module.clean:
-                with _open_source_file(module.absolute_path) as f:
-                    source = f.read()
-                source = merge_common.remove_comments_and_doc_strings(source)
-                with open(
-                    archive_module_path, "w", encoding="utf-8", newline="\n"
-                ) as f:
-                    f.write(source)
-            else:
-                shutil.copyfile(module.absolute_path, archive_module_path)
-
-        output = io.BytesIO()
-
-        zipapp.create_archive(
-            source=archive_dir,
-            target=output,
-            interpreter=shebang,  # this does not seem to make any difference when returning output.getvalue()
+        if callback is not None:
+            # This event give a chance to modify the contents of the __init__.py file.
+            ev_args = EventArgs(
+                name=merge_common.CALLBACK_GENERATING_INIT_PY_FILE,
+                source="script",
+            )
+            event_data = {
+                "contents": "",
+                "clean": clean,
+            }
+            ev_args.event_data = event_data
+            callback("script", ev_args)
+            contents = ev_args.event_data.get("contents", contents)
+            if not isinstance(contents, str):
+                contents = ""
+
+        if module_graph is None:
+            builder = ModuleGraphBuilder(
+                sys_path=python_paths,
+                clean=clean,
+                callback=callback,
+                import_cache=import_cache,
+                jobs=jobs,
+                sources=sources,
+                module_filter=module_filter,
+                python_version=read_python_version_from_python_bin(python_binary),
+                extension_suffixes=read_extension_suffixes_from_python_bin(python_binary),
+            )
+            builder.generate_for_file(
+                path,
+                add_python_modules=add_python_modules,
+                exclude_python_modules=set(exclude_python_modules or []),
+            )
+            module_graph = builder.graph()
+            if import_cache is not None:
+                import_cache.prune()
+        if build_result is not None:
+            build_result.dependencies = _dependencies(module_graph, precompile)
+
+        entries = [("__main__.py", main_bytes), ("__init__.py", contents.encode("utf-8"))]
+        # zipimport cannot load extension modules, __main__.py first imports a loader for them.
+        loader = _extension_loader(module_graph)
+        if loader is not None:
+            entries[0] = ("__main__.py", insert_loader_import(entries[0][1]))
+            entries.append((EXTENSION_LOADER_MODULE + ".py", loader))
+        if precompile:
+            entries.append((BYTECODE_LOADER_MODULE + ".py", bytecode_loader_source().encode("utf-8")))
+        modules: Iterable[Tuple[str, bytes]] = (
+            (module.relative_path, module_contents)
+            for module, module_contents in module_graph.iter_contents(
+                pipeline is not None, release=release, jobs=jobs
+            )
         )
-        return output.getvalue()
+        bytecode = None
+        if precompile:
+            # all the modules are compiled at once, in one process for another binary.
+            modules = list(modules)
+            bytecode = _compile_pycs(
+                entries + modules, precompile_binary, precompile_optimize
+            )
+
+        if shebang:
+            # the same prefix zipapp.create_archive() writes
+            output.write(b"#!" + shebang.encode("utf-8") + b"\n")
+        with zipfile.ZipFile(output, "w") as archive:
+            if fingerprint is not None:
+                archive.comment = (FINGERPRINT_PREFIX + fingerprint).encode("utf-8")
+            writer = _ArchiveWriter(
+                archive,
+                compression=_ZIP_METHODS[compression],
+                compress_level=compress_level,
+                bytecode=bytecode,
+                bytecode_only=bytecode_only,
+            )
+            for name, data in entries:
+                writer.write(name, data)
+            for name, data in modules:
+                writer.write(name, data)
+            if release:
+                sources.release(path)
+            writer.write_packages()
+            if extra_dir is not None:
+                writer.write_dir(extra_dir)
+        if artifact_cache is not None:
+            artifact_cache.prune()
+
+
+class _ArchiveWriter:
+    """
+    Writes entries to a zip archive, in the order they are given.
+
+    A module is written straight from memory. The ``__init__.py`` of a package
+    that has none is written by ``write_packages()``, once every module is known,
+    so a package ``__init__.py`` that comes after its submodules is not duplicated.
+
+    A module with ``bytecode`` is written with its ``.pyc``, or as the ``.pyc`` alone
+    with ``bytecode_only``.
+
+    Entries are compressed by ``zipfile`` as they are written.
+    """
+
+    def __init__(
+        self,
+        archive: zipfile.ZipFile,
+        compression: int = zipfile.ZIP_STORED,
+        compress_level: int | None = None,
+        bytecode: Dict[str, bytes] | None = None,
+        bytecode_only: bool = False,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            archive (zipfile.ZipFile): Archive open for writing.
+            compression (int, optional): ``zipfile.ZIP_STORED`` or ``zipfile.ZIP_DEFLATED``.
+            compress_level (int, optional): Deflate level, zlib's default when ``None``.
+            bytecode (Dict[str, bytes], optional): ``.pyc`` contents by the name of the source entry.
+            bytecode_only (bool, optional): Leaves out the source of a module that has a ``.pyc``.
+        """
+        self._archive = archive
+        self._compression = compression
+        self._compress_level = compress_level
+        self._bytecode = bytecode or {}
+        self._bytecode_only = bytecode_only
+        self._names = set()
+        self._packages = {}
+        self._date_time = _archive_date_time()
+
+    def write(self, name: str, data: bytes) -> None:
+        """
+        Writes an entry, and a directory entry for each directory above it.
+
+        Args:
+            name (str): Path of the entry in the archive, using ``/`` or ``os.sep``.
+            data (bytes): Contents of the entry.
+        """
+        name = name.replace(os.sep, "/")
+        if name in self._names:
+            return
+        parts = name.split("/")
+        for i in range(1, len(parts)):
+            package = "/".join(parts[:i])
+            if package not in self._packages:
+                self._packages[package] = True
+                self._write_entry(package + "/", b"", 0o40755)
+        pyc = self._bytecode.get(name)
+        if pyc is not None and self._bytecode_only:
+            self._names.add(name)
+        else:
+            self._write_entry(name, data, 0o100644)
+        if pyc is not None:
+            self._write_entry(name + "c", pyc, 0o100644)
+
+    def write_packages(self) -> None:
+        """
+        Writes an ``__init__.py`` for each directory that has none.
+        """
+        for package in self._packages:
+            name = package + "/__init__.py"
+            if name not in self._names:
+                self.write(name, b"\n")
+
+    def write_dir(self, root: str) -> None:
+        """
+        Writes the files below a directory that are not in the archive yet.
+
+        Args:
+            root (str): Directory to add.
+        """
+        for dir_path, dir_names, file_names in os.walk(root):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                file_path = os.path.join(dir_path, file_name)
+                with open(file_path, "rb") as f:
+                    self.write(os.path.relpath(file_path, root), f.read())
+
+    def _write_entry(self, name: str, data: bytes, mode: int) -> None:
+        self._names.add(name)
+        info = zipfile.ZipInfo(name, date_time=self._date_time)
+        info.external_attr = mode << 16
+        if name.endswith("/"):
+            info.external_attr |= 0x10  # MS-DOS directory flag
+            self._archive.writestr(info, data)
+        else:
+            self._archive.writestr(
+                info, data, compress_type=self._compression, compresslevel=self._compress_level
+            )
 
 
+def _archive_date_time() -> Tuple[int, int, int, int, int, int]:
+    # every build gets the same date, SOURCE_DATE_EPOCH as reproducible builds set it.
+    epoch = os.environ.get("SOURCE_DATE_EPOCH", "")
+    if epoch.isdigit():
+        return max(time.gmtime(int(epoch))[:6], _ZIP_EPOCH)
+    return _ZIP_EPOCH
+
+
+def _dependencies(module_graph: ModuleGraph, precompile: bool) -> List[str]:
+    return graph_dependencies(module_graph, [bytecode_loader_path()] if precompile else [])
+
+
+def _extension_loader(module_graph: ModuleGraph) -> bytes | None:
+    # the extension modules are read from the archive when they are first imported.
+    lines = []
+    for module in module_graph:
+        if module.is_extension:
+            key = extension_key(module_graph.read_module(module, False))
+            module_graph.sources.unload(module.absolute_path)
+            lines.append(
+                f"__scriptmerge_add_extension({module.module_name!r}, "
+                f"{module.relative_path!r}, {key!r})\n"
+            )
+    if not lines:
+        return None
+    return (loader_source() + "\n" + "".join(lines)).encode("utf-8")
+
+
+def _compile_pycs(
+    entries: List[Tuple[str, bytes]], python_binary: str | None, optimize: int
+) -> Dict[str, bytes]:
+    sources: Dict[str, bytes] = {}
+    for name, data in entries:
+        if name.endswith(".py"):
+            sources.setdefault(name.replace(os.sep, "/"), data)
+    # the __init__.py that write_packages() adds to a package without one
+    for name in list(sources):
+        parts = name.split("/")
+        for i in range(1, len(parts)):
+            sources.setdefault("/".join(parts[:i]) + "/__init__.py", b"\n")
+    result: Dict[str, bytes] = {}
+    # the code of each .pyc is named after the archive by a module __main__ imports first.
+    prologues = {"__main__.py": f"import {BYTECODE_LOADER_MODULE}"}
+    bytecode = compile_bytecode(sources.items(), (python_binary,), optimize, prologues)
+    for name, codes in bytecode.items():
+        for (magic, _), code in codes.items():
+            # an unchecked hash based pyc, zipimport never compares it to the source,
+            # which is not in the archive with bytecode_only.
+            source_hash = importlib.util.source_hash(sources[name])
+            result[name] = magic + b"\x01\x00\x00\x00" + source_hash + code
+    return result
+
+
+# kept for backwards compatibility, the archive is now written without a staging directory.
 def make_package(archive_dir, module: ImportTarget):
     """
     Creates a package structure in the specified archive directory based on the 
@@ -235,250 +617,23 @@ def make_package(archive_dir, module: ImportTarget):
             (partial_path / "__init__.py").write_bytes(b"\n")
 
 
-def _read_sys_path_from_python_bin(binary_path: str):
-    if binary_path is None:
-        return []
-    else:
-        output = subprocess.check_output(
-            [binary_path, "-E", "-c", "import sys;\nfor path in sys.path: print(path)"],
-        )
-        return [
-            # TODO: handle non-UTF-8 encodings
-            line.strip().decode("utf-8")
-            for line in output.split(b"\n")
-            if line.strip()
-        ]
-
-
-def _generate_interpreter(path, copy):
+def _generate_interpreter(path, copy, sources: SourceStore | None = None):
     if copy:
-        with _open_source_file(path) as script_file:
-            first_line = script_file.readline()
-            if first_line.startswith("#!"):
-                return first_line[2:]
+        if sources is None:
+            with _open_source_file(path) as script_file:
+                first_line = script_file.readline()
+        else:
+            text = sources.text(path)
+            first_line = text[: text.find("\n") + 1] if "\n" in text else text
+        if first_line.startswith("#!"):
+            return first_line[2:]
 
     return "/usr/bin/env python3"
 
 
-class ModuleWriterGenerator:
-
-    def __init__(
-        self,
-        sys_path: str,
-        clean: bool,
-        callback: Callable[[Any, EventArgs], None] | None = None,
-    ):
-        self._sys_path = sys_path
-        self._modules = {}
-        self._clean = clean
-        self._callback = callback
-
-    def generate_for_file(
-        self,
-        python_file_path: str,
-        add_python_modules: List[str],
-        exclude_python_modules: Set[str],
-    ):
-        if self._callback is not None:
-            cancel_args = CancelEventArgs(
-                name=merge_common.CALLBACK_GENERATING_FOR_FILE, source=self
-            )
-            event_data = {
-                "path": python_file_path,
-                "add_python_modules": add_python_modules,
-                "exclude_python_modules": exclude_python_modules,
-            }
-            cancel_args.event_data = event_data
-            self._callback(self, cancel_args)
-            if cancel_args.cancel:
-                return
-            python_file_path = cancel_args.event_data.get("path", python_file_path)
-            add_python_modules = cancel_args.event_data.get(
-                "add_python_modules", add_python_modules
-            )
-            exclude_python_modules = cancel_args.event_data.get(
-                "exclude_python_modules", exclude_python_modules
-            )
-        self._generate_for_module(
-            ImportTarget(
-                python_file_path,
-                relative_path=None,
-                is_package=False,
-                module_name=None,
-                clean=self._clean,
-            ),
-            exclude_python_modules,
-        )
-
-        for add_python_module in add_python_modules:
-            import_line = ImportLine(module_name=add_python_module)
-            self._generate_for_import(
-                python_module=None,
-                import_line=import_line,
-                exclude_python_modules=exclude_python_modules,
-            )
-
-    def _generate_for_module(
-        self, python_module: ImportTarget, exclude_python_modules: Set[str]
-    ):
-        def is_excluded(line: ImportLine):
-            for exclude in exclude_python_modules:
-                if re.match(exclude, line.module_name):
-                    return True
-            return False
-
-        if self._callback is not None:
-            cancel_args = CancelEventArgs(
-                name=merge_common.CALLBACK_GENERATING_FOR_MODULE, source=self
-            )
-            event_data = {
-                "module": python_module,
-                "exclude_python_modules": exclude_python_modules,
-            }
-            cancel_args.event_data = event_data
-            self._callback(self, cancel_args)
-            if cancel_args.cancel:
-                return
-            python_module = cancel_args.event_data.get("module", python_module)
-            exclude_python_modules = cancel_args.event_data.get(
-                "exclude_python_modules", exclude_python_modules
-            )
-
-        import_lines = _find_imports_in_module(python_module)
-        for import_line in import_lines:
-            if _is_stdlib_import(import_line) or is_excluded(import_line):
-                continue
-            self._generate_for_import(
-                python_module, import_line, exclude_python_modules
-            )
-
-    def _generate_for_import(
-        self,
-        python_module: ImportTarget,
-        import_line: ImportTarget,
-        exclude_python_modules: Set[str],
-    ):
-        import_targets = self._read_possible_import_targets(python_module, import_line)
-
-        for import_target in import_targets:
-            if import_target.module_name not in self._modules:
-                self._modules[import_target.module_name] = import_target
-                self._generate_for_module(
-                    python_module=import_target,
-                    exclude_python_modules=exclude_python_modules,
-                )
-
-    def _read_possible_import_targets(
-        self, python_module: ImportTarget, import_line: ImportLine
-    ) -> List[ImportTarget]:
-        module_name_parts = import_line.module_name.split(".")
-
-        module_names = [
-            ".".join(module_name_parts[0 : index + 1])
-            for index in range(len(module_name_parts))
-        ] + [import_line.module_name + "." + item for item in import_line.items]
-
-        import_targets = [
-            self._find_module(module_name) for module_name in module_names
-        ]
-
-        valid_import_targets = [
-            target for target in import_targets if target is not None
-        ]
-        return valid_import_targets
-        # TODO: allow the user some choice in what happens in this case?
-        # Detection of try/except blocks is possibly over-complicating things
-        # ~ if len(valid_import_targets) > 0:
-        # ~ return valid_import_targets
-        # ~ else:
-        # ~ raise RuntimeError("Could not find module: " + import_line.import_path)
-
-    def _find_module(self, module_name: str):
-        for sys_path in self._sys_path:
-            for is_package in (True, False):
-                if is_package:
-                    suffix = "/__init__.py"
-                else:
-                    suffix = ".py"
-
-                relative_path = module_name.replace(".", "/") + suffix
-                full_module_path = os.path.join(sys_path, relative_path)
-                if os.path.exists(full_module_path):
-                    return ImportTarget(
-                        full_module_path,
-                        relative_path=relative_path,
-                        is_package=is_package,
-                        module_name=module_name,
-                        clean=self._clean,
-                    )
-        return None
-
-
-def _find_imports_in_module(python_module: ImportTarget):
-    source = _read_binary(python_module.absolute_path)
-    parse_tree = ast.parse(source, python_module.absolute_path)
-
-    for node in ast.walk(parse_tree):
-        if isinstance(node, ast.Import):
-            for name in node.names:
-                yield ImportLine(name.name, [])
-
-        if isinstance(node, ast.ImportFrom):
-            if node.level == 0:
-                module = node.module
-            else:
-                level = node.level
-
-                if python_module.is_package:
-                    level -= 1
-
-                if level == 0:
-                    package_name = python_module.module_name
-                else:
-                    package_name = ".".join(
-                        python_module.module_name.split(".")[:-level]
-                    )
-
-                if node.module is None:
-                    module = package_name
-                else:
-                    module = package_name + "." + node.module
-
-            yield ImportLine(module, [name.name for name in node.names])
-
-
-def _read_binary(path: str) -> bytes:
-    with open(path, "rb") as file:
-        return file.read()
+# kept for backwards compatibility, the walk is shared with merge_py.
+ModuleWriterGenerator = ModuleGraphBuilder
 
 
 def _open_source_file(path: str):
     return open(path, "rt", encoding="utf-8")
-
-
-def _is_stdlib_import(import_line: ImportLine):
-    return is_stdlib_module(import_line.module_name)
-
-
-class ImportTarget:
-    def __init__(
-        self,
-        absolute_path: str,
-        relative_path: str,
-        is_package: bool,
-        module_name: str,
-        clean: bool,
-    ):
-        self.absolute_path = absolute_path
-        self.relative_path = relative_path
-        self.is_package = is_package
-        self.module_name = module_name
-        self.clean = clean
-
-
-class ImportLine:
-    def __init__(self, module_name: str, items: List[str] | None = None):
-        if not items:
-            items = []
-        self.module_name = module_name
-        self.items = items
@@ -0,0 +1,187 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Pattern, Tuple
+import fnmatch
+import re
+
+GLOB_PREFIX = "glob:"
+PREFIX_PREFIX = "prefix:"
+
+_RE_IDENTIFIER = re.compile(r"[A-Za-z0-9_]+")
+_RE_DOTTED_NAME = re.compile(r"[A-Za-z0-9_]+(?:\.[A-Za-z0-9_]+)*")
+# back references and global inline flags change meaning inside an alternation.
+_RE_NOT_COMBINABLE = re.compile(r"\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)")
+
+
+class _TrieNode:
+    __slots__ = ("children", "match_self", "match_children")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode] = {}
+        self.match_self = False
+        self.match_children = False
+
+
+class ModuleFilter:
+    """
+    Compiled set of exclude patterns for module names.
+
+    Patterns take one of three forms:
+
+    - ``prefix:pkg`` excludes ``pkg`` and every module below it.
+    - ``glob:pkg.*`` matches the whole module name with ``fnmatch`` rules.
+    - Anything else is a regular expression matched with ``re.match``, as before.
+
+    ``prefix:`` patterns, and ``glob:`` patterns of the form ``pkg.*``, are
+    looked up in a trie of name parts. Regular expressions that are a plain
+    name (``greetings`` or ``greetings.*``) become a ``str.startswith`` check.
+    The remaining regular expressions are compiled once into a single
+    alternation. The decision for each module name is memoized, so a name is
+    only matched once per build.
+
+    Counters: ``lookups`` is the number of calls to ``is_excluded()``,
+    ``memo_hits`` the calls answered from the memo and ``fast_hits`` the
+    decisions made by the trie or a name prefix without running a regular
+    expression.
+    """
+
+    def __init__(self, patterns: Iterable[str] | None = None) -> None:
+        """
+        Constructor
+
+        Args:
+            patterns (Iterable[str], optional): Exclude patterns.
+
+        Raises:
+            re.error: If a regular expression pattern is invalid.
+        """
+        self._patterns: Tuple[str, ...] = tuple(dict.fromkeys(patterns or ()))
+        self._trie = _TrieNode()
+        self._has_trie = False
+        self._name_prefixes: List[str] = []
+        self._globs: List[Pattern[str]] = []
+        regexes: List[str] = []
+        for pattern in self._patterns:
+            if pattern.startswith(PREFIX_PREFIX):
+                self._add_trie(pattern[len(PREFIX_PREFIX) :], True, True)
+            elif pattern.startswith(GLOB_PREFIX):
+                glob = pattern[len(GLOB_PREFIX) :]
+                if glob.endswith(".*") and _RE_DOTTED_NAME.fullmatch(glob[:-2]):
+                    self._add_trie(glob[:-2], False, True)
+                else:
+                    self._globs.append(re.compile(fnmatch.translate(glob)))
+            else:
+                name = pattern[:-2] if pattern.endswith(".*") else pattern
+                if _RE_IDENTIFIER.fullmatch(name):
+                    self._name_prefixes.append(name)
+                else:
+                    regexes.append(pattern)
+        self._name_prefix_tuple = tuple(self._name_prefixes)
+        self._regexes = _compile_regexes(regexes)
+        self._decisions: Dict[str, bool] = {}
+        self.lookups = 0
+        self.memo_hits = 0
+        self.fast_hits = 0
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._patterns)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def __repr__(self) -> str:
+        return f"ModuleFilter({list(self._patterns)!r})"
+
+    @property
+    def patterns(self) -> Tuple[str, ...]:
+        """Gets the patterns of this filter."""
+        return self._patterns
+
+    @property
+    def short_circuited(self) -> int:
+        """Gets the number of lookups answered without a regular expression."""
+        return self.memo_hits + self.fast_hits
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Gets lookup counters for this instance.
+        """
+        return {
+            "lookups": self.lookups,
+            "memo_hits": self.memo_hits,
+            "fast_hits": self.fast_hits,
+        }
+
+    def is_excluded(self, module_name: str) -> bool:
+        """
+        Gets if a module name matches any pattern of this filter.
+
+        Args:
+            module_name (str): Dotted module name.
+
+        Returns:
+            bool: ``True`` if the module is excluded.
+        """
+        self.lookups += 1
+        decision = self._decisions.get(module_name)
+        if decision is not None:
+            self.memo_hits += 1
+            return decision
+        if self._match_fast(module_name):
+            self.fast_hits += 1
+            decision = True
+        else:
+            decision = self._match_slow(module_name)
+        self._decisions[module_name] = decision
+        return decision
+
+    def _add_trie(self, name: str, match_self: bool, match_children: bool) -> None:
+        node = self._trie
+        for part in name.split("."):
+            node = node.children.setdefault(part, _TrieNode())
+        node.match_self = node.match_self or match_self
+        node.match_children = node.match_children or match_children
+        self._has_trie = True
+
+    def _match_fast(self, module_name: str) -> bool:
+        if self._name_prefix_tuple and module_name.startswith(self._name_prefix_tuple):
+            return True
+        if not self._has_trie:
+            return False
+        parts = module_name.split(".")
+        node = self._trie
+        for index, part in enumerate(parts):
+            node = node.children.get(part)
+            if node is None:
+                return False
+            if index + 1 < len(parts):
+                if node.match_children:
+                    return True
+            elif node.match_self:
+                return True
+        return False
+
+    def _match_slow(self, module_name: str) -> bool:
+        for regex in self._regexes:
+            if regex.match(module_name):
+                return True
+        for glob in self._globs:
+            if glob.match(module_name):
+                return True
+        return False
+
+
+def _compile_regexes(regexes: List[str]) -> List[Pattern[str]]:
+    if not regexes:
+        return []
+    # each pattern is compiled on its own first so a bad pattern reports itself.
+    compiled = [re.compile(regex) for regex in regexes]
+    combinable = [r for r in regexes if not _RE_NOT_COMBINABLE.search(r)]
+    if len(combinable) < 2:
+        return compiled
+    separate = [c for r, c in zip(regexes, compiled) if _RE_NOT_COMBINABLE.search(r)]
+    try:
+        combined = re.compile("|".join(f"(?:{regex})" for regex in combinable))
+    except re.error:
+        return compiled
+    return [combined] + separate
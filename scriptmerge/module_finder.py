@@ -0,0 +1,102 @@
+from __future__ import annotations
+from typing import Dict, List, Sequence, Set, Tuple
+import os
+
+
+class ModuleFinder:
+    """
+    Resolves module names against a list of search paths.
+
+    Each directory is listed once with ``os.scandir`` and the listing is kept
+    for the lifetime of the instance, so resolving a module costs dictionary
+    lookups instead of ``os.path.exists`` probes. Results, including modules
+    that could not be found, are memoized.
+
+    Like the import system the first search path that contains a module wins,
+    and within a search path a package wins over a module of the same name.
+    Unlike the import system a ``.py`` source wins over an extension module of
+    the same name, so a package that ships both is bundled portably.
+    """
+
+    def __init__(self, sys_path: List[str], extension_suffixes: Sequence[str] = ()) -> None:
+        """
+        Constructor
+
+        Args:
+            sys_path (List[str]): Directories to search, in priority order.
+            extension_suffixes (Sequence[str], optional): File suffixes of extension modules,
+                such as ``importlib.machinery.EXTENSION_SUFFIXES``. Defaults to none, only
+                ``.py`` modules are found.
+        """
+        self._sys_path = list(sys_path)
+        self._extension_suffixes = tuple(extension_suffixes)
+        self._listings: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        self._found: Dict[str, Tuple[str, str, bool] | None] = {}
+
+    def find(self, module_name: str) -> Tuple[str, str, bool] | None:
+        """
+        Finds a module.
+
+        Args:
+            module_name (str): Dotted module name such as ``greetings.greeting``.
+
+        Returns:
+            Tuple[str, str, bool] | None: ``(full_path, relative_path, is_package)``
+            or ``None`` when the module is not found on any search path.
+        """
+        if module_name in self._found:
+            return self._found[module_name]
+        result = self._find(module_name)
+        self._found[module_name] = result
+        return result
+
+    def _find(self, module_name: str) -> Tuple[str, str, bool] | None:
+        parts = module_name.split(".")
+        rel_dir = "/".join(parts[:-1])
+        name = parts[-1]
+        for sys_path in self._sys_path:
+            dir_path = os.path.join(sys_path, *parts[:-1])
+            dirs, files = self._listing(dir_path)
+            if name in dirs:
+                _, package_files = self._listing(os.path.join(dir_path, name))
+                if "__init__.py" in package_files:
+                    relative_path = module_name.replace(".", "/") + "/__init__.py"
+                    return (
+                        os.path.join(sys_path, relative_path),
+                        relative_path,
+                        True,
+                    )
+            if name + ".py" in files:
+                if rel_dir:
+                    relative_path = rel_dir + "/" + name + ".py"
+                else:
+                    relative_path = name + ".py"
+                return (os.path.join(sys_path, relative_path), relative_path, False)
+            for suffix in self._extension_suffixes:
+                if name + suffix in files:
+                    relative_path = (rel_dir + "/" if rel_dir else "") + name + suffix
+                    return (os.path.join(sys_path, relative_path), relative_path, False)
+        return None
+
+    def _listing(self, dir_path: str) -> Tuple[Set[str], Set[str]]:
+        listing = self._listings.get(dir_path)
+        if listing is not None:
+            return listing
+        dirs: Set[str] = set()
+        files: Set[str] = set()
+        try:
+            with os.scandir(dir_path or os.curdir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            dirs.add(entry.name)
+                        else:
+                            files.add(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            # missing directories, files such as python311.zip on sys.path, etc.
+            pass
+        listing = (dirs, files)
+        self._listings[dir_path] = listing
+        return listing
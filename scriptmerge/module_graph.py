@@ -0,0 +1,731 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Set, Tuple
+import importlib.machinery
+import os
+import subprocess
+from types import MappingProxyType
+
+from scriptmerge.stdlib import is_stdlib_module
+from scriptmerge.cache import ImportCache
+from scriptmerge.module_filter import ModuleFilter
+from scriptmerge.module_finder import ModuleFinder
+from scriptmerge.parallel import discover_imports, resolve_jobs
+from scriptmerge.source_store import SourceStore
+from scriptmerge.transforms import build_pipeline
+import scriptmerge.merge_common as merge_common
+from scriptmerge.merge_common import EventArgs, CancelEventArgs
+
+
+def resolve_module_graph(
+    path: str,
+    *,
+    add_python_modules: List[str] | None = None,
+    add_python_paths: List[str] | None = None,
+    python_binary: str | None = None,
+    exclude_python_modules: List[str] | None = None,
+    clean: bool = False,
+    callback: Callable[[Any, EventArgs], None] | None = None,
+    **kwargs: Any,
+) -> ModuleGraph:
+    """
+    Resolves every module an entry point script depends on.
+
+    The returned graph can be passed to ``merge_py.script()`` and ``merge_pyz.script()``
+    as ``module_graph`` so both outputs are built from one resolution pass.
+
+    Args:
+        path (str): Path to entry point py file
+        add_python_modules (List[str], optional): Extra Python modules to include.
+        add_python_paths (List[str], optional): Extra Python paths used to search for modules.
+        python_binary (str, optional): Python binary whose ``sys.path`` is searched for modules.
+        exclude_python_modules (List[str], optional): One or more regular expressions that match Module names to exclude.
+        clean (bool, optional): Passed on to callbacks, and adds the ``"clean"`` stage to the transforms
+            of the graph's store. Defaults to False.
+        callback (Callable[[Any, EventArgs], None], optional): Callback function.
+        import_cache (ImportCache, optional): Persistent cache of the imports found in each module.
+        transforms (List[str] | TransformPipeline, optional): Transform stages run on the modules read
+            through the graph's store. Ignored when ``sources`` is given.
+        artifact_cache (ArtifactCache, optional): Persistent cache of cleaned module contents.
+            Ignored when ``sources`` is given.
+        jobs (int, optional): Number of processes used to parse modules. Defaults to 1.
+            The writers take their own ``jobs`` for the transforms.
+        copy_shebang (bool, optional): Passed on to callbacks. Defaults to False.
+        sources (SourceStore, optional): Store the modules are read through, shared with the writers.
+        import_scanner (str, optional): ``"tokens"`` finds imports with the token scanner instead of
+            parsing each module with ``ast``. Ignored when ``sources`` is given. Defaults to ``"ast"``.
+        module_filter (ModuleFilter, optional): Compiled exclude patterns, used instead of
+            ``exclude_python_modules``. Lookup counters are available on the instance after the build.
+
+    Returns:
+        ModuleGraph: Resolved modules.
+    """
+    if add_python_modules is None:
+        add_python_modules = []
+    if exclude_python_modules is None:
+        exclude_python_modules = []
+    module_filter: ModuleFilter | None = kwargs.get("module_filter", None)
+    if module_filter is not None:
+        exclude_python_modules = list(module_filter.patterns)
+
+    python_paths = get_python_paths(
+        path,
+        add_python_paths=add_python_paths,
+        python_binary=python_binary,
+        callback=callback,
+        copy_shebang=bool(kwargs.get("copy_shebang", False)),
+        clean=clean,
+    )
+    builder = ModuleGraphBuilder(
+        sys_path=python_paths,
+        clean=clean,
+        callback=callback,
+        import_cache=kwargs.get("import_cache", None),
+        jobs=int(kwargs.get("jobs", 1)),
+        sources=kwargs.get("sources", None)
+        or SourceStore(
+            import_scanner=kwargs.get("import_scanner", "ast"),
+            artifact_cache=kwargs.get("artifact_cache", None),
+            pipeline=build_pipeline(clean, kwargs.get("transforms", None)),
+        ),
+        module_filter=module_filter,
+        python_version=read_python_version_from_python_bin(python_binary),
+        extension_suffixes=read_extension_suffixes_from_python_bin(python_binary),
+    )
+    builder.generate_for_file(
+        path,
+        add_python_modules=add_python_modules,
+        exclude_python_modules=set(exclude_python_modules),
+    )
+    return builder.graph()
+
+
+def get_python_paths(
+    path: str,
+    add_python_paths: List[str] | None = None,
+    python_binary: str | None = None,
+    callback: Callable[[Any, EventArgs], None] | None = None,
+    copy_shebang: bool = False,
+    clean: bool = False,
+) -> List[str]:
+    """
+    Gets the paths searched for modules and raises the ``GENERATED_PYTHON_PATHS`` callback.
+
+    Args:
+        path (str): Path to entry point py file, its directory is searched first.
+        add_python_paths (List[str], optional): Extra Python paths used to search for modules.
+        python_binary (str, optional): Python binary whose ``sys.path`` is searched last.
+        callback (Callable[[Any, EventArgs], None], optional): Callback function.
+        copy_shebang (bool, optional): Passed on to callbacks. Defaults to False.
+        clean (bool, optional): Passed on to callbacks. Defaults to False.
+
+    Returns:
+        List[str]: Search paths in priority order.
+    """
+    if add_python_paths is None:
+        add_python_paths = []
+    python_paths = (
+        [os.path.dirname(path)]
+        + add_python_paths
+        + read_sys_path_from_python_bin(python_binary)
+    )
+    if callback is not None:
+        ev_args = EventArgs(
+            name=merge_common.CALLBACK_GENERATED_PYTHON_PATHS, source="script"
+        )
+        event_data = {
+            "python_paths": python_paths,
+            "path": path,
+            "copy": copy_shebang,
+            "clean": clean,
+        }
+        ev_args.event_data = event_data
+        callback("script", ev_args)
+        python_paths = ev_args.event_data.get("python_paths", python_paths)
+    return python_paths
+
+
+def read_sys_path_from_python_bin(binary_path: str | None) -> List[str]:
+    """
+    Gets ``sys.path`` of a python binary, empty when ``binary_path`` is ``None``.
+    """
+    if binary_path is None:
+        return []
+    return list(_read_python_bin_info(binary_path)[1])
+
+
+def read_python_version_from_python_bin(
+    binary_path: str | None,
+) -> Tuple[int, int] | None:
+    """
+    Gets the ``(major, minor)`` version of a python binary, ``None`` when ``binary_path`` is ``None``.
+    """
+    if binary_path is None:
+        return None
+    return _read_python_bin_info(binary_path)[0]
+
+
+def read_extension_suffixes_from_python_bin(binary_path: str | None) -> List[str]:
+    """
+    Gets the file suffixes of extension modules of a python binary, those of the running
+    interpreter when ``binary_path`` is ``None``.
+    """
+    if binary_path is None:
+        return list(importlib.machinery.EXTENSION_SUFFIXES)
+    return list(_read_python_bin_info(binary_path)[2])
+
+
+_python_bin_info: Dict[str, Tuple[Tuple[int, int], Tuple[str, ...], Tuple[str, ...]]] = {}
+
+
+def _read_python_bin_info(
+    binary_path: str,
+) -> Tuple[Tuple[int, int], Tuple[str, ...], Tuple[str, ...]]:
+    # one process per binary gives the version, sys.path and the extension suffixes.
+    info = _python_bin_info.get(binary_path)
+    if info is None:
+        output = subprocess.check_output(
+            [
+                binary_path,
+                "-E",
+                "-c",
+                "import sys, importlib.machinery;\nprint('%d.%d' % sys.version_info[:2])\n"
+                "print(' '.join(importlib.machinery.EXTENSION_SUFFIXES))\n"
+                "for path in sys.path: print(path)",
+            ],
+        )
+        lines = [
+            # TODO: handle non-UTF-8 encodings
+            line.strip().decode("utf-8")
+            for line in output.split(b"\n")
+        ]
+        major, minor = lines[0].split(".")
+        info = (
+            (int(major), int(minor)),
+            tuple(line for line in lines[2:] if line),
+            tuple(lines[1].split()),
+        )
+        _python_bin_info[binary_path] = info
+    return info
+
+
+class ModuleGraph:
+    """
+    Immutable result of resolving the modules of an entry point script.
+
+    Iterating the graph gives the modules in discovery order, which is the
+    order both writers emit them in. ``imports`` records, for each module, the
+    modules it imports; the entry script is keyed as ``ModuleGraph.ENTRY``.
+
+    Modules are read through the graph's ``SourceStore``, so the source read
+    to find the imports of a module is the one written to the output, and
+    writers consuming the same graph share file reads and cleaning.
+    """
+
+    ENTRY = "__main__"
+
+    def __init__(
+        self,
+        path: str,
+        sys_path: List[str],
+        modules: Mapping[str, ImportTarget],
+        imports: Mapping[str, List[str]],
+        sources: SourceStore | None = None,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            path (str): Path to entry point py file.
+            sys_path (List[str]): Paths that were searched for modules.
+            modules (Mapping[str, ImportTarget]): Modules by name in discovery order.
+            imports (Mapping[str, List[str]]): Names of the modules each module imports.
+            sources (SourceStore, optional): Store the modules were read through.
+        """
+        self._path = path
+        self._sys_path = tuple(sys_path)
+        self._modules = MappingProxyType(dict(modules))
+        self._imports = MappingProxyType(
+            {name: tuple(names) for name, names in imports.items()}
+        )
+        self._sources = SourceStore() if sources is None else sources
+
+    def __iter__(self) -> Iterator[ImportTarget]:
+        return iter(self._modules.values())
+
+    def __len__(self) -> int:
+        return len(self._modules)
+
+    def __contains__(self, module_name: object) -> bool:
+        return module_name in self._modules
+
+    def __getitem__(self, module_name: str) -> ImportTarget:
+        return self._modules[module_name]
+
+    def __repr__(self) -> str:
+        return f"ModuleGraph({self._path!r}, modules={len(self._modules)})"
+
+    @property
+    def path(self) -> str:
+        """Gets the path of the entry point script."""
+        return self._path
+
+    @property
+    def sys_path(self) -> Tuple[str, ...]:
+        """Gets the paths that were searched for modules."""
+        return self._sys_path
+
+    @property
+    def modules(self) -> Mapping[str, ImportTarget]:
+        """Gets the modules by name in discovery order."""
+        return self._modules
+
+    @property
+    def imports(self) -> Mapping[str, Tuple[str, ...]]:
+        """Gets the names of the modules each module imports."""
+        return self._imports
+
+    @property
+    def sources(self) -> SourceStore:
+        """Gets the store the modules are read through."""
+        return self._sources
+
+    def read_module(self, module: ImportTarget, clean: bool) -> bytes:
+        """
+        Gets the contents of a module, cleaned of comments and doc strings when ``clean`` is set.
+
+        The contents of an extension module are never cleaned.
+
+        Args:
+            module (ImportTarget): Module of this graph.
+            clean (bool): Run the transforms of the store, which remove comments and doc strings
+                by default.
+
+        Returns:
+            bytes: Module contents.
+        """
+        return self._sources.contents(module.absolute_path, clean and not module.is_extension)
+
+    def release(self, module: ImportTarget) -> None:
+        """
+        Drops the source held for a module once it has been written.
+
+        Args:
+            module (ImportTarget): Module of this graph.
+        """
+        self._sources.release(module.absolute_path)
+
+    def iter_contents(
+        self, clean: bool, release: bool = False, extensions: bool = True, jobs: int = 1
+    ) -> Iterator[Tuple[ImportTarget, bytes]]:
+        """
+        Gets each module with its contents, in discovery order.
+
+        Args:
+            clean (bool): Run the transforms of the store, which remove comments and doc strings
+                by default.
+            release (bool, optional): Release each module once the next one is requested.
+                Defaults to False.
+            extensions (bool, optional): Include extension modules. Defaults to True.
+            jobs (int, optional): Number of processes the transforms run in, ahead of the module
+                being consumed, see ``SourceStore.iter_contents()``. Defaults to 1.
+
+        Yields:
+            Tuple[ImportTarget, bytes]: Module and its contents.
+        """
+        modules = [module for module in self if extensions or not module.is_extension]
+        contents = self._sources.iter_contents(
+            ((module.absolute_path, clean and not module.is_extension) for module in modules),
+            jobs=jobs,
+        )
+        for module, (_, module_contents) in zip(modules, contents):
+            yield module, module_contents
+            if release:
+                self.release(module)
+
+
+def read_module_binary(path: str, clean: bool) -> bytes:
+    """
+    Reads a module, cleaned of comments and doc strings when ``clean`` is set.
+    """
+    if clean:
+        with open(path, "rt", encoding="utf-8") as file:
+            file_str = merge_common.remove_comments_and_doc_strings(file.read())
+            return file_str.encode("utf-8")
+
+    with open(path, "rb") as file:
+        return file.read()
+
+
+class ModuleGraphBuilder:
+    """
+    Walks the imports of an entry point script and collects the modules it depends on.
+    """
+
+    def __init__(
+        self,
+        sys_path: List[str],
+        clean: bool,
+        callback: Callable[[Any, EventArgs], None] | None = None,
+        import_cache: ImportCache | None = None,
+        jobs: int = 1,
+        sources: SourceStore | None = None,
+        module_filter: ModuleFilter | None = None,
+        python_version: Tuple[int, int] | None = None,
+        extension_suffixes: List[str] | None = None,
+    ):
+        self._sys_path = sys_path
+        if extension_suffixes is None:
+            extension_suffixes = importlib.machinery.EXTENSION_SUFFIXES
+        self._finder = ModuleFinder(sys_path, extension_suffixes)
+        self._modules: Dict[str, ImportTarget] = {}
+        self._imports: Dict[str, List[str]] = {}
+        self._path = ""
+        self._clean = clean
+        self._callback = callback
+        self._import_cache = import_cache
+        self._jobs = resolve_jobs(jobs)
+        # stdlib imports of the python the output is built for are skipped.
+        self._python_version = python_version
+        self._prefetched = {}
+        self._sources = SourceStore() if sources is None else sources
+        # compiled filters by pattern set, callbacks may swap the set per module.
+        self._filters: Dict[frozenset, ModuleFilter] = {}
+        if module_filter is not None:
+            self._filters[frozenset(module_filter.patterns)] = module_filter
+
+    def graph(self) -> ModuleGraph:
+        """
+        Gets the modules found so far as an immutable graph.
+        """
+        return ModuleGraph(
+            path=self._path,
+            sys_path=self._sys_path,
+            modules=self._modules,
+            imports=self._imports,
+            sources=self._sources,
+        )
+
+    def generate_for_file(
+        self,
+        python_file_path: str,
+        add_python_modules: List[str],
+        exclude_python_modules: Set[str],
+    ) -> None:
+        if self._callback is not None:
+            cancel_args = CancelEventArgs(
+                name=merge_common.CALLBACK_GENERATING_FOR_FILE, source=self
+            )
+            event_data = {
+                "path": python_file_path,
+                "add_python_modules": add_python_modules,
+                "exclude_python_modules": exclude_python_modules,
+            }
+            cancel_args.event_data = event_data
+            self._callback(self, cancel_args)
+            if cancel_args.cancel:
+                return
+            python_file_path = cancel_args.event_data.get("path", python_file_path)
+            add_python_modules = cancel_args.event_data.get(
+                "add_python_modules", add_python_modules
+            )
+            exclude_python_modules = cancel_args.event_data.get(
+                "exclude_python_modules", exclude_python_modules
+            )
+        self._path = python_file_path
+        root_module = ImportTarget(
+            python_file_path,
+            relative_path=None,
+            is_package=False,
+            module_name=None,
+            clean=self._clean,
+        )
+        if self._jobs > 1:
+            self._prefetch_imports(
+                root_module, add_python_modules, exclude_python_modules
+            )
+        self._generate_for_module(root_module, exclude_python_modules)
+
+        for add_python_module in add_python_modules:
+            import_line = ImportLine(module_name=add_python_module)
+            self._generate_for_import(
+                python_module=None,
+                import_line=import_line,
+                exclude_python_modules=exclude_python_modules,
+            )
+
+    def _generate_for_module(
+        self, python_module: ImportTarget, exclude_python_modules: Set[str]
+    ) -> None:
+        frame = self._enter_module(python_module, exclude_python_modules)
+        if frame is not None:
+            self._walk(*frame)
+
+    def _generate_for_import(
+        self,
+        python_module: ImportTarget,
+        import_line: ImportTarget,
+        exclude_python_modules: Set[str],
+    ) -> None:
+        import_targets = self._read_possible_import_targets(python_module, import_line)
+        self._walk(
+            iter(import_targets), exclude_python_modules, _module_key(python_module)
+        )
+
+    def _walk(
+        self,
+        import_targets: Iterator[ImportTarget],
+        exclude_python_modules: Set[str],
+        parent_name: str,
+    ) -> None:
+        """
+        Adds each target and everything it imports, depth first.
+
+        Uses an explicit stack of import target iterators rather than recursion
+        so deep import chains cannot hit the recursion limit. Modules are added
+        in the same order as a recursive depth first walk.
+        """
+        stack = [(import_targets, exclude_python_modules, parent_name)]
+        while stack:
+            import_targets, exclude_python_modules, parent_name = stack[-1]
+            import_target = next(import_targets, None)
+            if import_target is None:
+                stack.pop()
+                continue
+            self._add_import(parent_name, import_target.module_name)
+            if import_target.module_name in self._modules:
+                continue
+            self._modules[import_target.module_name] = import_target
+            frame = self._enter_module(import_target, exclude_python_modules)
+            if frame is not None:
+                stack.append(frame)
+
+    def _add_import(self, parent_name: str, module_name: str) -> None:
+        names = self._imports.setdefault(parent_name, [])
+        if module_name not in names:
+            names.append(module_name)
+
+    def _enter_module(
+        self, python_module: ImportTarget, exclude_python_modules: Set[str]
+    ) -> Tuple[Iterator[ImportTarget], Set[str], str] | None:
+        module_key = _module_key(python_module)
+        if self._callback is not None:
+            cancel_args = CancelEventArgs(
+                name=merge_common.CALLBACK_GENERATING_FOR_MODULE, source=self
+            )
+            event_data = {
+                "module": python_module,
+                "exclude_python_modules": exclude_python_modules,
+            }
+            cancel_args.event_data = event_data
+            self._callback(self, cancel_args)
+            if cancel_args.cancel:
+                return None
+            python_module = cancel_args.event_data.get("module", python_module)
+            exclude_python_modules = cancel_args.event_data.get(
+                "exclude_python_modules", exclude_python_modules
+            )
+        return (
+            self._iter_import_targets(python_module, exclude_python_modules),
+            exclude_python_modules,
+            module_key,
+        )
+
+    def _iter_import_targets(
+        self, python_module: ImportTarget, exclude_python_modules: Set[str]
+    ) -> Iterator[ImportTarget]:
+        if python_module.is_extension:
+            # the imports of an extension module cannot be read, it is bundled alone.
+            return
+        import_lines = _find_imports_in_module(
+            python_module,
+            self._import_cache,
+            raw_imports=self._prefetched.get(python_module.absolute_path),
+            sources=self._sources,
+        )
+        module_filter = self._get_filter(exclude_python_modules)
+        for import_line in import_lines:
+            if _is_stdlib_import(import_line, self._python_version) or module_filter.is_excluded(
+                import_line.module_name
+            ):
+                continue
+            yield from self._read_possible_import_targets(python_module, import_line)
+
+    def _prefetch_imports(
+        self,
+        root_module: ImportTarget,
+        add_python_modules: List[str],
+        exclude_python_modules: Set[str],
+    ) -> None:
+        """
+        Parses every reachable module up front in a process pool.
+
+        The serial walk that follows reuses the parsed imports, so the order
+        modules are discovered in, and therefore the output, does not change.
+        """
+
+        module_filter = self._get_filter(exclude_python_modules)
+
+        def expand(python_module: ImportTarget, raw_imports: list):
+            for import_line in _find_imports_in_module(
+                python_module, raw_imports=raw_imports
+            ):
+                if _is_stdlib_import(import_line, self._python_version) or module_filter.is_excluded(
+                    import_line.module_name
+                ):
+                    continue
+                for import_target in self._read_possible_import_targets(
+                    python_module, import_line
+                ):
+                    # extension modules have nothing to parse
+                    if not import_target.is_extension:
+                        yield import_target
+
+        roots = [root_module]
+        for add_python_module in add_python_modules:
+            roots.extend(
+                import_target
+                for import_target in self._read_possible_import_targets(
+                    None, ImportLine(module_name=add_python_module)
+                )
+                if not import_target.is_extension
+            )
+        self._prefetched = discover_imports(
+            roots,
+            expand,
+            jobs=self._jobs,
+            import_cache=self._import_cache,
+            # a streaming store does not keep the sources of the whole tree.
+            read=None if self._sources.streaming else self._sources.read,
+            import_scanner=self._sources.import_scanner,
+        )
+
+    def _get_filter(self, exclude_python_modules: Set[str]) -> ModuleFilter:
+        key = frozenset(exclude_python_modules)
+        module_filter = self._filters.get(key)
+        if module_filter is None:
+            module_filter = ModuleFilter(exclude_python_modules)
+            self._filters[key] = module_filter
+        return module_filter
+
+    def _read_possible_import_targets(
+        self, python_module: ImportTarget, import_line: ImportLine
+    ) -> List[ImportTarget]:
+        module_name_parts = import_line.module_name.split(".")
+
+        module_names = [
+            ".".join(module_name_parts[0 : index + 1])
+            for index in range(len(module_name_parts))
+        ] + [import_line.module_name + "." + item for item in import_line.items]
+
+        import_targets = [
+            self._find_module(module_name) for module_name in module_names
+        ]
+
+        valid_import_targets = [
+            target for target in import_targets if target is not None
+        ]
+        return valid_import_targets
+        # TODO: allow the user some choice in what happens in this case?
+        # Detection of try/except blocks is possibly over-complicating things
+        # ~ if len(valid_import_targets) > 0:
+        # ~ return valid_import_targets
+        # ~ else:
+        # ~ raise RuntimeError("Could not find module: " + import_line.import_path)
+
+    def _find_module(self, module_name: str) -> ImportTarget | None:
+        found = self._finder.find(module_name)
+        if found is None:
+            return None
+        full_module_path, relative_path, is_package = found
+        return ImportTarget(
+            full_module_path,
+            relative_path=relative_path,
+            is_package=is_package,
+            module_name=module_name,
+            clean=self._clean,
+            is_extension=not relative_path.endswith(".py"),
+        )
+
+
+def _module_key(python_module: ImportTarget | None) -> str:
+    if python_module is None or python_module.module_name is None:
+        return ModuleGraph.ENTRY
+    return python_module.module_name
+
+
+def _find_imports_in_module(
+    python_module: ImportTarget,
+    import_cache: ImportCache | None = None,
+    raw_imports: list | None = None,
+    sources: SourceStore | None = None,
+):
+    path = python_module.absolute_path
+    if raw_imports is None and sources is None:
+        sources = SourceStore()
+    if raw_imports is None and import_cache is None:
+        raw_imports = sources.raw_imports(path)
+    elif raw_imports is None:
+        # the cache reads through the store, so a miss parses the buffer it read.
+        raw_imports = import_cache.get_imports(
+            path,
+            parse=lambda source: sources.raw_imports(path),
+            read=sources.read,
+        )
+    if sources is not None:
+        # a streaming store reads the file again when it is written.
+        sources.unload(path)
+
+    for module, level, names in raw_imports:
+        if level > 0:
+            if python_module.is_package:
+                level -= 1
+
+            if level == 0:
+                package_name = python_module.module_name
+            else:
+                package_name = ".".join(python_module.module_name.split(".")[:-level])
+
+            if module is None:
+                module = package_name
+            else:
+                module = package_name + "." + module
+
+        yield ImportLine(module, names)
+
+
+def _is_stdlib_import(
+    import_line: ImportLine, python_version: Tuple[int, int] | None = None
+) -> bool:
+    return is_stdlib_module(import_line.module_name, python_version)
+
+
+class ImportTarget:
+    def __init__(
+        self,
+        absolute_path: str,
+        relative_path: str,
+        is_package: bool,
+        module_name: str,
+        clean: bool,
+        is_extension: bool = False,
+    ):
+        self.absolute_path = absolute_path
+        self.relative_path = relative_path
+        self.is_package = is_package
+        self.module_name = module_name
+        self.clean = clean
+        self.is_extension = is_extension
+
+    def read_binary(self) -> bytes:
+        return read_module_binary(self.absolute_path, self.clean and not self.is_extension)
+
+    def __repr__(self):
+        return f"ImportTarget({self.module_name!r}, {self.absolute_path!r})"
+
+
+class ImportLine:
+    def __init__(self, module_name: str, items: List[str] | None = None):
+        if not items:
+            items = []
+        self.module_name = module_name
+        self.items = items
@@ -0,0 +1,159 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from scriptmerge.cache import ImportCache, RawImport
+from scriptmerge.import_scanner import IMPORT_SCANNER_TOKENS, scan_imports
+from scriptmerge.transforms import TransformPipeline
+import scriptmerge.merge_common as merge_common
+
+
+def resolve_jobs(jobs: int | None) -> int:
+    """
+    Gets the number of worker processes for a ``jobs`` option.
+
+    ``0`` or a negative number means one worker per CPU.
+    """
+    if jobs is None:
+        return 1
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def process_pool(jobs: int) -> ProcessPoolExecutor:
+    """
+    Gets a pool of worker processes that does not fork the building process.
+
+    A build can have threads running, such as the lock of a cache or the caller's own,
+    and a process forked from a process with threads can deadlock. Workers are started
+    by a fork server where the platform has one, and spawned otherwise.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    method = "forkserver" if "forkserver" in methods else "spawn"
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(method))
+
+
+def parse_imports_worker(
+    item: Tuple[str, bytes | None], import_scanner: str = "ast"
+) -> List[RawImport] | None:
+    """
+    Reads and parses one module in a worker process.
+
+    Returns ``None`` when the module cannot be read or parsed; the serial
+    pass that follows discovery will raise the real error at the right point.
+    """
+    path, source = item
+    try:
+        if source is None:
+            with open(path, "rb") as f:
+                source = f.read()
+        if import_scanner == IMPORT_SCANNER_TOKENS:
+            return scan_imports(source, path)
+        return merge_common.find_raw_imports(source, path)
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+def transform_worker(
+    item: Tuple[bytes, TransformPipeline]
+) -> Tuple[bytes, Dict[str, float]]:
+    """
+    Runs the transforms of one module in a worker process.
+
+    Returns the transformed contents with the time spent in each stage, which
+    the caller adds to the timings of its own pipeline.
+    """
+    source, pipeline = item
+    pipeline.timings = {}
+    contents = pipeline.run(merge_common.decode_source(source)).encode("utf-8")
+    return contents, pipeline.timings
+
+
+def discover_imports(
+    roots: List[Any],
+    expand: Callable[[Any, List[RawImport]], Iterable[Any]],
+    jobs: int,
+    import_cache: ImportCache | None = None,
+    read: Callable[[str], bytes] | None = None,
+    import_scanner: str = "ast",
+) -> Dict[str, List[RawImport]]:
+    """
+    Walks the import graph breadth first, parsing each wave of modules in a process pool.
+
+    Args:
+        roots (List[Any]): Import targets to start from, anything with an ``absolute_path``.
+        expand (Callable[[Any, List[RawImport]], Iterable[Any]]): Gets the import targets
+            reachable from a target given its raw imports.
+        jobs (int): Number of worker processes.
+        import_cache (ImportCache, optional): Persistent import cache consulted before parsing.
+        read (Callable[[str], bytes], optional): Reads a source in this process so the buffer
+            can be reused later in the build; workers read the file themselves when omitted.
+        import_scanner (str, optional): ``"ast"`` or ``"tokens"``, see ``SourceStore``.
+
+    Returns:
+        Dict[str, List[RawImport]]: Raw imports of each discovered module keyed by absolute path.
+    """
+    results: Dict[str, List[RawImport]] = {}
+    worker = functools.partial(parse_imports_worker, import_scanner=import_scanner)
+    seen = set()
+    frontier = []
+    for root in roots:
+        if root.absolute_path not in seen:
+            seen.add(root.absolute_path)
+            frontier.append(root)
+
+    with process_pool(jobs) as pool:
+        while frontier:
+            lookups = {}
+            pending = []
+            for target in frontier:
+                path = target.absolute_path
+                source = None
+                try:
+                    if import_cache is not None:
+                        lookup = import_cache.lookup(
+                            path, read or merge_common.read_bin_file
+                        )
+                        if lookup.imports is not None:
+                            results[path] = lookup.imports
+                            continue
+                        lookups[path] = lookup
+                        source = lookup.source
+                    elif read is not None:
+                        source = read(path)
+                except OSError:
+                    continue
+                pending.append((path, source))
+
+            if len(pending) > 1:
+                chunksize = max(1, len(pending) // (jobs * 4))
+                parsed = pool.map(worker, pending, chunksize=chunksize)
+            else:
+                parsed = map(worker, pending)
+            for (path, _), raw_imports in zip(pending, parsed):
+                if raw_imports is None:
+                    continue
+                results[path] = raw_imports
+                if path in lookups:
+                    import_cache.store(lookups[path], raw_imports)
+
+            next_frontier = []
+            for target in frontier:
+                raw_imports = results.get(target.absolute_path)
+                if raw_imports is None:
+                    continue
+                try:
+                    children = list(expand(target, raw_imports))
+                except Exception:
+                    # left for the serial pass to report
+                    continue
+                for child in children:
+                    if child.absolute_path not in seen:
+                        seen.add(child.absolute_path)
+                        next_frontier.append(child)
+            frontier = next_frontier
+    return results
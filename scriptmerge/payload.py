@@ -0,0 +1,112 @@
+from __future__ import annotations
+import base64
+
+PAYLOAD_REPR = "repr"
+PAYLOAD_ZLIB = "zlib"
+PAYLOAD_LZMA = "lzma"
+PAYLOAD_ENCODINGS = (PAYLOAD_REPR, PAYLOAD_ZLIB, PAYLOAD_LZMA)
+
+PAYLOAD_BASE85 = "base85"
+PAYLOAD_BASE64 = "base64"
+PAYLOAD_ALPHABETS = (PAYLOAD_BASE85, PAYLOAD_BASE64)
+
+
+class PayloadEncoder:
+    """
+    Encodes the module payloads written to a ``.py`` output.
+
+    ``repr`` writes the bytes as they are. ``zlib`` and ``lzma`` compress them
+    and write the result as a base85 (or base64) bytes literal, which has no
+    escapes. The prelude decodes a compressed module when it needs it.
+    """
+
+    def __init__(
+        self,
+        encoding: str = PAYLOAD_REPR,
+        level: int | None = None,
+        alphabet: str = PAYLOAD_BASE85,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            encoding (str, optional): ``"repr"``, ``"zlib"`` or ``"lzma"``. Defaults to ``"repr"``.
+            level (int, optional): Compression level, ``0`` to ``9``. Defaults to the level of the compressor.
+            alphabet (str, optional): ``"base85"`` or ``"base64"``, base64 is larger but decodes faster.
+                Defaults to ``"base85"``.
+
+        Raises:
+            ValueError: If an argument is not a known value.
+        """
+        if encoding not in PAYLOAD_ENCODINGS:
+            raise ValueError(f"encoding must be one of {PAYLOAD_ENCODINGS}, not {encoding!r}")
+        if alphabet not in PAYLOAD_ALPHABETS:
+            raise ValueError(f"alphabet must be one of {PAYLOAD_ALPHABETS}, not {alphabet!r}")
+        if level is not None and not 0 <= level <= 9:
+            raise ValueError(f"level must be between 0 and 9, not {level!r}")
+        self.encoding = encoding
+        self.level = level
+        self.alphabet = alphabet
+
+    def __repr__(self) -> str:
+        return f"PayloadEncoder({self.encoding!r}, level={self.level!r}, alphabet={self.alphabet!r})"
+
+    @property
+    def is_raw(self) -> bool:
+        """Gets if payloads are written as they are."""
+        return self.encoding == PAYLOAD_REPR
+
+    @property
+    def name(self) -> str:
+        """Gets the encoding name passed to ``__scriptmerge_write_module``, such as ``"zlib+base85"``."""
+        if self.is_raw:
+            return self.encoding
+        return f"{self.encoding}+{self.alphabet}"
+
+    def encode(self, data: bytes) -> bytes:
+        """
+        Encodes a payload.
+
+        Args:
+            data (bytes): Module source or marshalled code.
+
+        Returns:
+            bytes: Encoded payload.
+        """
+        if self.is_raw:
+            return data
+        if self.encoding == PAYLOAD_ZLIB:
+            import zlib
+
+            data = zlib.compress(data, -1 if self.level is None else self.level)
+        else:
+            import lzma
+
+            data = lzma.compress(data, preset=6 if self.level is None else self.level)
+        if self.alphabet == PAYLOAD_BASE85:
+            return base64.b85encode(data)
+        return base64.b64encode(data)
+
+    def decode(self, data: bytes) -> bytes:
+        """
+        Decodes a payload, the same way the prelude does.
+
+        Args:
+            data (bytes): Encoded payload.
+
+        Returns:
+            bytes: Module source or marshalled code.
+        """
+        if self.is_raw:
+            return data
+        if self.alphabet == PAYLOAD_BASE85:
+            data = base64.b85decode(data)
+        else:
+            data = base64.b64decode(data)
+        if self.encoding == PAYLOAD_ZLIB:
+            import zlib
+
+            return zlib.decompress(data)
+        import lzma
+
+        return lzma.decompress(data)
@@ -15,9 +15,22 @@ def __scriptmerge_temporary_dir():
 
 with __scriptmerge_temporary_dir() as __scriptmerge_working_dir:
 
-    def __scriptmerge_write_module(path, contents):
+    def __scriptmerge_write_module(path, contents, bytecode=None, encoding=None):
         import os, os.path
 
+        def decode(data):
+            import base64
+
+            compression, _, alphabet = encoding.partition("+")
+            data = base64.b85decode(data) if alphabet == "base85" else base64.b64decode(data)
+            if compression == "zlib":
+                import zlib
+
+                return zlib.decompress(data)
+            import lzma
+
+            return lzma.decompress(data)
+
         def make_package(path):
             parts = path.split("/")
             partial_path = __scriptmerge_working_dir
@@ -30,10 +43,26 @@ with __scriptmerge_temporary_dir() as __scriptmerge_working_dir:
 
         make_package(os.path.dirname(path))
 
+        if encoding:
+            contents = decode(contents)
         full_path = os.path.join(__scriptmerge_working_dir, path)
         with open(full_path, "wb") as module_file:
             module_file.write(contents)
 
+        if bytecode:
+            import importlib.util, sys
+
+            code = bytecode.get((importlib.util.MAGIC_NUMBER, sys.flags.optimize))
+            if code is not None and getattr(sys, "pycache_prefix", None) is None:
+                if encoding:
+                    code = decode(code)
+                # an unchecked hash based pyc, the source next to it never changes.
+                pyc_path = importlib.util.cache_from_source(full_path)
+                os.makedirs(os.path.dirname(pyc_path), exist_ok=True)
+                with open(pyc_path, "wb") as pyc_file:
+                    pyc_file.write(importlib.util.MAGIC_NUMBER + b"\x01\x00\x00\x00")
+                    pyc_file.write(importlib.util.source_hash(contents) + code)
+
     import sys as __scriptmerge_sys
 
     __scriptmerge_sys.path.insert(0, __scriptmerge_working_dir)
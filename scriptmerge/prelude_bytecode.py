@@ -0,0 +1,60 @@
+def __scriptmerge_bytecode_importer():
+    # zipimport runs the code of a .pyc with the file name it was compiled with, the path
+    # of the module in the archive, where the code of a source gets the path of the archive
+    # in front of it. The importer of the archive is replaced by one that renames the code
+    # of each module the way its source would be named, with the function importlib uses on
+    # the .pyc files it loads, so tracebacks are the same with or without the bytecode.
+    import os.path
+    import sys
+    import zipimport
+
+    # a private function, without it the archive keeps the importer zipimport gave it
+    # and tracebacks name the code of a .pyc by its path in the archive.
+    try:
+        from _imp import _fix_co_filename as fix_co_filename
+    except ImportError:
+        return
+    archive = getattr(globals().get("__loader__"), "archive", None)
+    if not archive:
+        return
+
+    def fix_filename(code):
+        # a source, or a .pyc for another version of Python, is compiled with its full path.
+        name = code.co_filename
+        if not (os.path.isabs(name) or name.startswith(archive + os.sep)):
+            fix_co_filename(code, os.path.join(archive, *name.split("/")))
+        return code
+
+    class Importer(zipimport.zipimporter):
+        def get_code(self, fullname):
+            return fix_filename(super().get_code(fullname))
+
+        def create_module(self, spec):
+            return None
+
+        def exec_module(self, module):
+            # zipimporter only has load_module() before Python 3.10
+            exec(self.get_code(module.__name__), module.__dict__)
+
+    def path_hook(path):
+        if not path.startswith(archive):
+            raise ImportError("not a path of this archive", path=path)
+        return Importer(path)
+
+    sys.path_hooks.insert(0, path_hook)
+    for path, finder in list(sys.path_importer_cache.items()):
+        if isinstance(finder, zipimport.zipimporter) and finder.archive == archive:
+            sys.path_importer_cache[path] = Importer(path)
+
+    # __main__ is already running, its code is renamed in place.
+    if not hasattr(sys, "_getframe"):
+        return
+    main_globals = getattr(sys.modules.get("__main__"), "__dict__", None)
+    frame = sys._getframe()
+    while frame is not None and frame.f_globals is not main_globals:
+        frame = frame.f_back
+    if frame is not None:
+        fix_filename(frame.f_code)
+
+
+__scriptmerge_bytecode_importer()
@@ -0,0 +1,230 @@
+import contextlib as __scriptmerge_contextlib
+
+
+@__scriptmerge_contextlib.contextmanager
+def __scriptmerge_extraction_cache():
+    # Extracts the bundle once into a cache directory named after a hash of the
+    # bundle file. Later runs import from that directory and reuse its pyc files.
+    import hashlib
+    import os
+    import os.path
+    import shutil
+    import sys
+    import time
+
+    marker_name = ".scriptmerge-complete"
+
+    def decode(data, encoding):
+        import base64
+
+        compression, _, alphabet = encoding.partition("+")
+        data = base64.b85decode(data) if alphabet == "base85" else base64.b64decode(data)
+        if compression == "zlib":
+            import zlib
+
+            return zlib.decompress(data)
+        import lzma
+
+        return lzma.decompress(data)
+
+    def write_module(directory, path, contents, bytecode, encoding):
+        parts = path.split("/")
+        partial_path = directory
+        for part in parts[:-1]:
+            partial_path = os.path.join(partial_path, part)
+            if not os.path.exists(partial_path):
+                os.mkdir(partial_path)
+                with open(os.path.join(partial_path, "__init__.py"), "wb") as f:
+                    f.write(b"\n")
+        if encoding:
+            contents = decode(contents, encoding)
+        full_path = os.path.join(directory, path)
+        with open(full_path, "wb") as module_file:
+            module_file.write(contents)
+        if bytecode:
+            import importlib.util
+
+            code = bytecode.get((importlib.util.MAGIC_NUMBER, sys.flags.optimize))
+            if code is not None and getattr(sys, "pycache_prefix", None) is None:
+                if encoding:
+                    code = decode(code, encoding)
+                # an unchecked hash based pyc, the source next to it never changes.
+                pyc_path = importlib.util.cache_from_source(full_path)
+                os.makedirs(os.path.dirname(pyc_path), exist_ok=True)
+                with open(pyc_path, "wb") as pyc_file:
+                    pyc_file.write(importlib.util.MAGIC_NUMBER + b"\x01\x00\x00\x00")
+                    pyc_file.write(importlib.util.source_hash(contents) + code)
+
+    def lock(lock_file):
+        try:
+            import fcntl
+        except ImportError:
+            import msvcrt
+
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    return
+                except OSError:
+                    pass
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+    def unlock(lock_file):
+        try:
+            import msvcrt
+        except ImportError:
+            return  # flock is released when the file is closed
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def remove_tree(path):
+        # renamed first, so a partly deleted directory is never mistaken for an entry
+        trash = "%s.%d.trash" % (path, os.getpid())
+        try:
+            os.rename(path, trash)
+        except OSError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def default_root():
+        root = os.environ.get("SCRIPTMERGE_BUNDLE_CACHE", "")
+        if root:
+            return root
+        root = os.environ.get("SCRIPTMERGE_CACHE_DIR", "")
+        if root:
+            return os.path.join(root, "bundles")
+        root = os.environ.get("XDG_CACHE_HOME", "")
+        if root:
+            return os.path.join(root, "scriptmerge", "bundles")
+        return os.path.join(os.path.expanduser("~"), ".cache", "scriptmerge", "bundles")
+
+    class Extraction:
+        def __init__(self):
+            self.modules = []
+            self.temporary_dir = None
+            self.bundle = globals().get("__file__")
+            self.root = os.path.abspath(default_root())
+            try:
+                self.keep = max(1, int(os.environ.get("SCRIPTMERGE_BUNDLE_CACHE_KEEP", "3")))
+            except ValueError:
+                self.keep = 3
+
+        def add(self, path, contents, bytecode=None, encoding=None):
+            self.modules.append((path, contents, bytecode, encoding))
+
+        def finish(self):
+            directory = None
+            if self.bundle:
+                try:
+                    directory = self._cached_dir()
+                except OSError:
+                    directory = None
+            if directory is None:
+                # no bundle file to hash, or the cache cannot be written.
+                import tempfile
+
+                directory = self.temporary_dir = tempfile.mkdtemp()
+                for module in self.modules:
+                    write_module(directory, *module)
+            self.modules = []
+            sys.path.insert(0, directory)
+
+        def close(self):
+            if self.temporary_dir is not None:
+                shutil.rmtree(self.temporary_dir, ignore_errors=True)
+
+        def _cached_dir(self):
+            with open(self.bundle, "rb") as bundle_file:
+                key = hashlib.sha256(bundle_file.read()).hexdigest()[:32]
+            self.name = os.path.basename(self.bundle)
+            entry = os.path.join(self.root, "%s-%s" % (self.name, key))
+            if self._is_complete(entry):
+                try:
+                    # the last use orders the entries for eviction
+                    os.utime(os.path.join(entry, marker_name))
+                except OSError:
+                    pass
+                return entry
+            os.makedirs(self.root, exist_ok=True)
+            with open(entry + ".lock", "a+b") as lock_file:
+                lock(lock_file)
+                try:
+                    # another process may have extracted it while this one waited.
+                    if not self._is_complete(entry):
+                        self._extract(entry)
+                        self._evict()
+                finally:
+                    unlock(lock_file)
+            return entry
+
+        def _is_complete(self, entry):
+            if not os.path.exists(os.path.join(entry, marker_name)):
+                return False
+            for module in self.modules:
+                if not os.path.exists(os.path.join(entry, module[0])):
+                    return False
+            return True
+
+        def _extract(self, entry):
+            staging = "%s.%d.tmp" % (entry, os.getpid())
+            shutil.rmtree(staging, ignore_errors=True)
+            os.mkdir(staging)
+            for module in self.modules:
+                write_module(staging, *module)
+            with open(os.path.join(staging, marker_name), "wb"):
+                pass
+            if os.path.exists(entry):
+                remove_tree(entry)
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+                if not self._is_complete(entry):
+                    raise
+
+        def _evict(self):
+            # keeps the most recently used versions of this bundle
+            prefix = self.name + "-"
+            entries = []
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                key = name[len(prefix) :]
+                if not name.startswith(prefix):
+                    continue
+                if len(key) == 32 and os.path.isdir(path):
+                    try:
+                        used = os.path.getmtime(os.path.join(path, marker_name))
+                    except OSError:
+                        used = 0
+                    entries.append((used, path))
+                elif name.endswith((".tmp", ".trash")):
+                    # left behind by a process that did not finish
+                    try:
+                        if time.time() - os.path.getmtime(path) > 3600:
+                            shutil.rmtree(path, ignore_errors=True)
+                    except OSError:
+                        pass
+            entries.sort(reverse=True)
+            for _, path in entries[self.keep :]:
+                remove_tree(path)
+                try:
+                    os.remove(path + ".lock")
+                except OSError:
+                    pass
+
+    extraction = Extraction()
+    try:
+        yield extraction
+    finally:
+        extraction.close()
+
+
+with __scriptmerge_extraction_cache() as __scriptmerge_extraction:
+
+    def __scriptmerge_write_module(path, contents, bytecode=None, encoding=None):
+        __scriptmerge_extraction.add(path, contents, bytecode, encoding)
+
+    def __scriptmerge_finish_modules():
+        __scriptmerge_extraction.finish()
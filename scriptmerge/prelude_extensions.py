@@ -0,0 +1,113 @@
+def __scriptmerge_extension_importer():
+    # Extension modules cannot be loaded from memory or from a zip file. Each one is
+    # extracted once to a cache directory named after a hash of its contents, shared
+    # by every run and every output that bundles it, and loaded from there.
+    import importlib.machinery
+    import importlib.util
+    import os
+    import os.path
+    import sys
+
+    module_globals = globals()
+
+    def decode(data, encoding):
+        import base64
+
+        compression, _, alphabet = encoding.partition("+")
+        data = base64.b85decode(data) if alphabet == "base85" else base64.b64decode(data)
+        if compression == "zlib":
+            import zlib
+
+            return zlib.decompress(data)
+        import lzma
+
+        return lzma.decompress(data)
+
+    def default_root():
+        root = os.environ.get("SCRIPTMERGE_EXTENSION_CACHE", "")
+        if root:
+            return root
+        root = os.environ.get("SCRIPTMERGE_CACHE_DIR", "")
+        if root:
+            return os.path.join(root, "extensions")
+        root = os.environ.get("XDG_CACHE_HOME", "")
+        if root:
+            return os.path.join(root, "scriptmerge", "extensions")
+        return os.path.join(os.path.expanduser("~"), ".cache", "scriptmerge", "extensions")
+
+    class Importer:
+        def __init__(self):
+            self.extensions = {}
+            self.temporary_dir = None
+
+        def add(self, name, path, key, contents=None, encoding=None):
+            self.extensions[name] = (path, key, contents, encoding)
+
+        def find_spec(self, fullname, path=None, target=None):
+            extension = self.extensions.get(fullname)
+            if extension is None:
+                return None
+            file_path = self.extract(*extension)
+            loader = importlib.machinery.ExtensionFileLoader(fullname, file_path)
+            return importlib.util.spec_from_file_location(fullname, file_path, loader=loader)
+
+        def invalidate_caches(self):
+            pass
+
+        def extract(self, path, key, contents, encoding):
+            file_name = path.rpartition("/")[2]
+            try:
+                directory = os.path.join(os.path.abspath(default_root()), key)
+                file_path = os.path.join(directory, file_name)
+                if not os.path.exists(file_path):
+                    os.makedirs(directory, exist_ok=True)
+                    self.write(file_path, self.read(path, contents, encoding))
+                return file_path
+            except OSError:
+                # the cache cannot be written, the module is extracted for this run only.
+                if self.temporary_dir is None:
+                    import atexit
+                    import shutil
+                    import tempfile
+
+                    self.temporary_dir = tempfile.mkdtemp()
+                    atexit.register(shutil.rmtree, self.temporary_dir, True)
+                file_path = os.path.join(self.temporary_dir, key, file_name)
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path, "wb") as f:
+                    f.write(self.read(path, contents, encoding))
+                return file_path
+
+        def read(self, path, contents, encoding):
+            if contents is None:
+                # stored next to this module, in a .pyz file
+                base = os.path.dirname(module_globals["__file__"])
+                loader = module_globals["__loader__"]
+                return loader.get_data(os.path.join(base, *path.split("/")))
+            if encoding:
+                return decode(contents, encoding)
+            return contents
+
+        def write(self, file_path, data):
+            # written aside and renamed, a process never loads a partly written file
+            staging = "%s.%d.tmp" % (file_path, os.getpid())
+            with open(staging, "wb") as f:
+                f.write(data)
+            try:
+                os.replace(staging, file_path)
+            except OSError:
+                # another process renamed first and the file is in use, on Windows.
+                os.remove(staging)
+                if not os.path.exists(file_path):
+                    raise
+
+    importer = Importer()
+    sys.meta_path.insert(0, importer)
+    return importer
+
+
+__scriptmerge_extensions = __scriptmerge_extension_importer()
+
+
+def __scriptmerge_add_extension(name, path, key, contents=None, encoding=None):
+    __scriptmerge_extensions.add(name, path, key, contents, encoding)
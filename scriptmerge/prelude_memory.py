@@ -0,0 +1,251 @@
+import contextlib as __scriptmerge_contextlib
+
+
+@__scriptmerge_contextlib.contextmanager
+def __scriptmerge_memory_importer():
+    # Serves the bundled modules from memory through a sys.meta_path finder,
+    # nothing is written to disk. The finder stays installed after the block.
+    import importlib.machinery
+    import importlib.util
+    import io
+    import marshal
+    import os.path
+    import sys
+
+    try:
+        from _imp import _fix_co_filename as fix_co_filename
+    except ImportError:
+        fix_co_filename = None
+
+    def decode(data, encoding):
+        import base64
+
+        compression, _, alphabet = encoding.partition("+")
+        data = base64.b85decode(data) if alphabet == "base85" else base64.b64decode(data)
+        if compression == "zlib":
+            import zlib
+
+            return zlib.decompress(data)
+        import lzma
+
+        return lzma.decompress(data)
+
+    bundle_path = os.path.abspath(globals().get("__file__") or sys.argv[0] or "<scriptmerge>")
+
+    class Resource:
+        # Traversable for importlib.resources.files()
+        def __init__(self, importer, path):
+            self._importer = importer
+            self._path = path
+
+        @property
+        def name(self):
+            return self._path.rsplit("/", 1)[-1]
+
+        def is_file(self):
+            return self._path in self._importer.files
+
+        def is_dir(self):
+            return self._path in self._importer.dirs
+
+        def iterdir(self):
+            prefix = self._path + "/" if self._path else ""
+            names = self._importer.dirs.get(self._path, ())
+            return iter([Resource(self._importer, prefix + name) for name in sorted(names)])
+
+        def joinpath(self, *descendants):
+            path = self._path
+            for name in descendants:
+                path = "/".join(p for p in (path, str(name).strip("/")) if p)
+            return Resource(self._importer, path)
+
+        __truediv__ = joinpath
+
+        def read_bytes(self):
+            if self._path not in self._importer.files:
+                raise FileNotFoundError(self._path)
+            return self._importer.data(self._path)
+
+        def read_text(self, encoding=None, errors=None):
+            return self.read_bytes().decode(encoding or "utf-8", errors or "strict")
+
+        def open(self, mode="r", *args, **kwargs):
+            data = io.BytesIO(self.read_bytes())
+            if "b" in mode:
+                return data
+            return io.TextIOWrapper(data, *args, **kwargs)
+
+        def __str__(self):
+            return os.path.join(bundle_path, self._path)
+
+        def __repr__(self):
+            return "Resource(%r)" % (self._path,)
+
+    class ResourceReader:
+        def __init__(self, importer, package_path):
+            self._importer = importer
+            self._package_path = package_path
+
+        def files(self):
+            return Resource(self._importer, self._package_path)
+
+        def open_resource(self, resource):
+            return self.files().joinpath(resource).open("rb")
+
+        def resource_path(self, resource):
+            raise FileNotFoundError(resource)
+
+        def is_resource(self, name):
+            return self.files().joinpath(name).is_file()
+
+        def contents(self):
+            return iter(self._importer.dirs.get(self._package_path, ()))
+
+    class Importer:
+        def __init__(self):
+            # module name -> (path in the bundle, is package)
+            self.modules = {}
+            # path in the bundle -> contents, encoded until first used
+            self.files = {}
+            # path in the bundle -> encoding of contents not decoded yet
+            self.encodings = {}
+            # path in the bundle -> (marshalled code for this interpreter, encoding)
+            self.bytecode = {}
+            # directory in the bundle -> names in it
+            self.dirs = {"": set()}
+
+        def add(self, path, contents, bytecode=None, encoding=None):
+            if bytecode:
+                code = bytecode.get((importlib.util.MAGIC_NUMBER, sys.flags.optimize))
+                if code is not None:
+                    self.bytecode[path] = (code, encoding)
+            parts = path.split("/")
+            for index in range(1, len(parts)):
+                # like the temporary directory prelude, every directory is a package.
+                package = "/".join(parts[:index]) + "/__init__.py"
+                if package not in self.files:
+                    self._add_file(package, b"\n")
+            self._add_file(path, contents, encoding)
+
+        def data(self, path):
+            contents = self.files[path]
+            encoding = self.encodings.pop(path, None)
+            if encoding:
+                contents = self.files[path] = decode(contents, encoding)
+            return contents
+
+        def _add_file(self, path, contents, encoding=None):
+            self.files[path] = contents
+            if encoding:
+                self.encodings[path] = encoding
+            else:
+                self.encodings.pop(path, None)
+            parent = ""
+            for part in path.split("/"):
+                self.dirs.setdefault(parent, set()).add(part)
+                parent = parent + "/" + part if parent else part
+            name = path[:-3].replace("/", ".")
+            if name.endswith(".__init__"):
+                self.modules[name[: -len(".__init__")]] = (path, True)
+            else:
+                self.modules[name] = (path, False)
+
+        def install(self):
+            meta_path = sys.meta_path
+            index = len(meta_path)
+            for i, finder in enumerate(meta_path):
+                if finder is importlib.machinery.PathFinder:
+                    index = i
+                    break
+            # after the builtin and frozen importers, where sys.path would have been searched
+            meta_path.insert(index, self)
+            if sys.excepthook is sys.__excepthook__:
+                # the default hook reads source lines from disk, the traceback
+                # module asks the loader through linecache.
+                def excepthook(exc_type, exc, tb):
+                    import traceback
+
+                    traceback.print_exception(exc_type, exc, tb)
+
+                sys.excepthook = excepthook
+
+        def find_spec(self, fullname, path=None, target=None):
+            entry = self.modules.get(fullname)
+            if entry is None:
+                return None
+            file_path, is_package = entry
+            spec = importlib.util.spec_from_loader(
+                fullname,
+                self,
+                origin=os.path.join(bundle_path, file_path),
+                is_package=is_package,
+            )
+            spec.has_location = True
+            if is_package:
+                spec.submodule_search_locations = [
+                    os.path.join(bundle_path, file_path.rsplit("/", 1)[0])
+                ]
+            return spec
+
+        def invalidate_caches(self):
+            pass
+
+        def create_module(self, spec):
+            return None
+
+        def exec_module(self, module):
+            code = self.get_code(module.__spec__.name)
+            exec(code, module.__dict__)
+
+        def is_package(self, fullname):
+            return self._entry(fullname)[1]
+
+        def get_filename(self, fullname):
+            return os.path.join(bundle_path, self._entry(fullname)[0])
+
+        def get_source(self, fullname):
+            return importlib.util.decode_source(self.data(self._entry(fullname)[0]))
+
+        def get_code(self, fullname):
+            file_path = self._entry(fullname)[0]
+            filename = os.path.join(bundle_path, file_path)
+            if file_path in self.bytecode:
+                code, encoding = self.bytecode[file_path]
+                if encoding:
+                    code = decode(code, encoding)
+                    self.bytecode[file_path] = (code, None)
+                code = marshal.loads(code)
+                if fix_co_filename is not None:
+                    fix_co_filename(code, filename)
+                return code
+            return compile(self.data(file_path), filename, "exec", dont_inherit=True)
+
+        def get_data(self, path):
+            prefix = bundle_path + os.sep
+            if path.startswith(prefix):
+                inner = path[len(prefix) :].replace(os.sep, "/")
+                if inner in self.files:
+                    return self.data(inner)
+            raise OSError("%s is not in the bundle" % path)
+
+        def get_resource_reader(self, fullname):
+            file_path, is_package = self._entry(fullname)
+            if not is_package:
+                return None
+            return ResourceReader(self, file_path.rsplit("/", 1)[0])
+
+        def _entry(self, fullname):
+            try:
+                return self.modules[fullname]
+            except KeyError:
+                raise ImportError("No module named %r in the bundle" % fullname, name=fullname) from None
+
+    importer = Importer()
+    importer.install()
+    yield importer
+
+
+with __scriptmerge_memory_importer() as __scriptmerge_importer:
+
+    def __scriptmerge_write_module(path, contents, bytecode=None, encoding=None):
+        __scriptmerge_importer.add(path, contents, bytecode, encoding)
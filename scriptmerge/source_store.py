@@ -0,0 +1,297 @@
+from __future__ import annotations
+from typing import Deque, Dict, Iterable, Iterator, List, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor
+import ast
+import collections
+
+import scriptmerge.merge_common as merge_common
+from scriptmerge.cache import ArtifactCache, RawImport
+from scriptmerge.import_scanner import (
+    IMPORT_SCANNER_AST,
+    IMPORT_SCANNER_TOKENS,
+    IMPORT_SCANNERS,
+    try_scan_imports,
+)
+from scriptmerge.parallel import process_pool, transform_worker
+from scriptmerge.transforms import TRANSFORM_CLEAN, TransformPipeline
+
+
+class SourceStore:
+    """
+    Per build store of source files.
+
+    Each file is read from disk once into a buffer. The decoded text, the
+    parsed ``ast`` tree, the raw imports and the cleaned contents are derived
+    from that buffer on first use and shared by every later stage of the build.
+    ``release()`` drops everything held for a file once it has been written.
+    With an ``ArtifactCache`` the transformed contents are kept across builds.
+
+    A ``streaming`` store drops the buffer of a file once its imports are found,
+    see ``unload()``, and reads the file again when it is written. The memory it
+    holds then follows the size of the largest module rather than of the whole tree.
+
+    ``reads`` and ``parses`` count the files opened and parsed, which is
+    useful to check a build touched each file only once.
+    """
+
+    def __init__(
+        self,
+        import_scanner: str = IMPORT_SCANNER_AST,
+        artifact_cache: ArtifactCache | None = None,
+        pipeline: TransformPipeline | None = None,
+        streaming: bool = False,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            import_scanner (str, optional): How ``raw_imports()`` finds import statements,
+                ``"ast"`` parses the whole module and ``"tokens"`` uses the token scanner of
+                ``scriptmerge.import_scanner``. Defaults to ``"ast"``.
+            artifact_cache (ArtifactCache, optional): Persistent cache of transformed contents.
+            pipeline (TransformPipeline, optional): Transforms run by ``contents()``.
+                Defaults to removing comments and doc strings.
+            streaming (bool, optional): ``unload()`` drops the buffers of a file. Defaults to False.
+
+        Raises:
+            ValueError: If ``import_scanner`` is not a known scanner.
+        """
+        if import_scanner not in IMPORT_SCANNERS:
+            raise ValueError(
+                f"import_scanner must be one of {IMPORT_SCANNERS}, not {import_scanner!r}"
+            )
+        self.import_scanner = import_scanner
+        self.artifact_cache = artifact_cache
+        self.pipeline = TransformPipeline([TRANSFORM_CLEAN]) if pipeline is None else pipeline
+        self.streaming = streaming
+        self._data: Dict[str, bytes] = {}
+        self._text: Dict[str, str] = {}
+        self._trees: Dict[str, ast.Module] = {}
+        self._imports: Dict[str, List[RawImport]] = {}
+        self._contents: Dict[Tuple[str, bool], bytes] = {}
+        self.reads = 0
+        self.parses = 0
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._data
+
+    def __repr__(self) -> str:
+        return f"SourceStore(files={len(self._data)}, reads={self.reads}, parses={self.parses})"
+
+    @property
+    def buffers(self) -> int:
+        """Gets the number of files whose buffer is held."""
+        return len(self._data)
+
+    def read(self, path: str) -> bytes:
+        """
+        Gets the contents of a file, reading it from disk on first use.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            bytes: File contents.
+        """
+        data = self._data.get(path)
+        if data is None:
+            data = merge_common.read_bin_file(path)
+            self.reads += 1
+            self._data[path] = data
+        return data
+
+    def text(self, path: str) -> str:
+        """
+        Gets the contents of a file decoded as utf-8 text.
+
+        Newlines are translated the same way as a file opened in text mode.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            str: File text.
+        """
+        text = self._text.get(path)
+        if text is None:
+            text = merge_common.decode_source(self.read(path))
+            self._text[path] = text
+        return text
+
+    def tree(self, path: str) -> ast.Module:
+        """
+        Gets the parsed ``ast`` tree of a python file.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            ast.Module: Parsed tree.
+        """
+        tree = self._trees.get(path)
+        if tree is None:
+            tree = ast.parse(self.read(path), path)
+            self.parses += 1
+            self._trees[path] = tree
+        return tree
+
+    def raw_imports(self, path: str) -> List[RawImport]:
+        """
+        Gets the import statements of a python file as ``(module, level, names)`` tuples.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            List[RawImport]: Raw imports in ``merge_common.find_raw_imports()`` order.
+        """
+        raw_imports = self._imports.get(path)
+        if raw_imports is None:
+            if self.import_scanner == IMPORT_SCANNER_TOKENS and path not in self._trees:
+                raw_imports = try_scan_imports(self.read(path))
+            if raw_imports is None:
+                # the ast scanner, or a source the token scanner leaves to ast. The tree is
+                # not kept, trees of large modules are many times the size of their source.
+                tree = self._trees.get(path)
+                if tree is None:
+                    tree = ast.parse(self.read(path), path)
+                    self.parses += 1
+                raw_imports = merge_common.find_raw_imports_in_tree(tree)
+            self._imports[path] = raw_imports
+        return raw_imports
+
+    def contents(self, path: str, clean: bool) -> bytes:
+        """
+        Gets the contents of a module as written to the output.
+
+        Args:
+            path (str): Path of the module.
+            clean (bool): Run the transforms of the store, which remove comments and doc strings
+                by default.
+
+        Returns:
+            bytes: Module contents.
+        """
+        key = (path, clean)
+        contents = self._contents.get(key)
+        if contents is None:
+            if clean and self.artifact_cache is not None:
+                # the text is only decoded and transformed on a miss.
+                contents = self.artifact_cache.get_artifact(
+                    self.pipeline.config, self.read(path), lambda _: self._transform(path)
+                )
+            elif clean:
+                contents = self._transform(path)
+            else:
+                contents = self.read(path)
+            self._contents[key] = contents
+        return contents
+
+    def iter_contents(
+        self, items: Iterable[Tuple[str, bool]], jobs: int = 1
+    ) -> Iterator[Tuple[str, bytes]]:
+        """
+        Gets the contents of modules as written to the output, in the order given.
+
+        With ``jobs`` above ``1`` the transforms run in a process pool, ahead of the
+        module being consumed. At most ``jobs * 2`` modules are read ahead, so the memory
+        held does not grow with the number of modules. The contents are the same as
+        ``contents()`` gives. The pipeline is pickled to the workers, so its stages must
+        be importable classes.
+
+        Args:
+            items (Iterable[Tuple[str, bool]]): Path of each module and whether to transform it,
+                as the ``clean`` argument of ``contents()``.
+            jobs (int, optional): Number of worker processes. Defaults to 1.
+
+        Yields:
+            Tuple[str, bytes]: Path and contents of each module.
+        """
+        if jobs <= 1:
+            for path, clean in items:
+                yield path, self.contents(path, clean)
+            return
+        pending: Deque[Tuple[str, bool, Future | None]] = collections.deque()
+        pool: ProcessPoolExecutor | None = None
+        try:
+            for path, clean in items:
+                future = None
+                if clean and (path, clean) not in self._contents:
+                    source = self.read(path)
+                    data = None
+                    if self.artifact_cache is not None:
+                        data = self.artifact_cache.lookup(self.pipeline.config, source)
+                    if data is None:
+                        if pool is None:
+                            pool = process_pool(jobs)
+                        future = pool.submit(transform_worker, (source, self.pipeline))
+                    else:
+                        self._contents[(path, clean)] = data
+                pending.append((path, clean, future))
+                if len(pending) > jobs * 2:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _collect(self, path: str, clean: bool, future: Future | None) -> Tuple[str, bytes]:
+        if future is None:
+            return path, self.contents(path, clean)
+        data, timings = future.result()
+        pipeline = self.pipeline
+        pipeline.modules += 1
+        for name, seconds in timings.items():
+            pipeline.timings[name] = pipeline.timings.get(name, 0.0) + seconds
+        if self.artifact_cache is not None:
+            self.artifact_cache.store(pipeline.config, self.read(path), data)
+        self._contents[(path, clean)] = data
+        return path, data
+
+    def _transform(self, path: str) -> bytes:
+        return self.pipeline.run(self.text(path)).encode("utf-8")
+
+    def release(self, path: str) -> None:
+        """
+        Drops the buffer and everything derived from it for a file.
+
+        A released file is read again if it is used later.
+
+        Args:
+            path (str): Path of the file.
+        """
+        self._data.pop(path, None)
+        self._text.pop(path, None)
+        self._trees.pop(path, None)
+        self._imports.pop(path, None)
+        self._contents.pop((path, False), None)
+        self._contents.pop((path, True), None)
+
+    def unload(self, path: str) -> None:
+        """
+        Drops the buffer and the contents held for a file in a ``streaming`` store.
+
+        The imports of the file are kept. Does nothing when the store is not ``streaming``,
+        the buffer is then kept so the file is only read once in a build.
+
+        Args:
+            path (str): Path of the file.
+        """
+        if not self.streaming:
+            return
+        self._data.pop(path, None)
+        self._text.pop(path, None)
+        self._trees.pop(path, None)
+        self._contents.pop((path, False), None)
+        self._contents.pop((path, True), None)
+
+    def clear(self) -> None:
+        """
+        Drops every buffer held by the store.
+        """
+        self._data.clear()
+        self._text.clear()
+        self._trees.clear()
+        self._imports.clear()
+        self._contents.clear()
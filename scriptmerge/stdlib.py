@@ -1,302 +1,55 @@
+from __future__ import annotations
+from typing import Dict, FrozenSet, Tuple
 import sys
 
+from scriptmerge.stdlib_names import COMMON_NAMES, VERSION_NAMES
 
-def is_stdlib_module(module_name):
-    return module_name in _stdlib_modules
+_names_by_version: Dict[Tuple[int, int], FrozenSet[str]] = {}
 
 
-_stdlib_modules = set(
-    [
-        "string",
-        "re",
-        "struct",
-        "difflib",
-        "StringIO",
-        "cStringIO",
-        "textwrap",
-        "codecs",
-        "unicodedata",
-        "stringprep",
-        "fpformat",
-        "datetime",
-        "calendar",
-        "collections",
-        "heapq",
-        "bisect",
-        "array",
-        "sets",
-        "sched",
-        "mutex",
-        "Queue",
-        "weakref",
-        "UserDict",
-        "UserList",
-        "UserString",
-        "types",
-        "new",
-        "copy",
-        "pprint",
-        "repr",
-        "numbers",
-        "math",
-        "cmath",
-        "decimal",
-        "fractions",
-        "random",
-        "itertools",
-        "functools",
-        "operator",
-        "os.path",
-        "fileinput",
-        "stat",
-        "statvfs",
-        "filecmp",
-        "tempfile",
-        "glob",
-        "fnmatch",
-        "linecache",
-        "shutil",
-        "dircache",
-        "macpath",
-        "pickle",
-        "cPickle",
-        "copy_reg",
-        "shelve",
-        "marshal",
-        "anydbm",
-        "whichdb",
-        "dbm",
-        "gdbm",
-        "dbhash",
-        "bsddb",
-        "dumbdbm",
-        "sqlite3",
-        "zlib",
-        "gzip",
-        "bz2",
-        "zipfile",
-        "tarfile",
-        "csv",
-        "ConfigParser",
-        "robotparser",
-        "netrc",
-        "xdrlib",
-        "plistlib",
-        "hashlib",
-        "hmac",
-        "md5",
-        "sha",
-        "os",
-        "io",
-        "time",
-        "argparse",
-        "optparse",
-        "getopt",
-        "logging",
-        "logging.config",
-        "logging.handlers",
-        "getpass",
-        "curses",
-        "curses.textpad",
-        "curses.ascii",
-        "curses.panel",
-        "platform",
-        "errno",
-        "ctypes",
-        "select",
-        "threading",
-        "thread",
-        "dummy_threading",
-        "dummy_thread",
-        "multiprocessing",
-        "mmap",
-        "readline",
-        "rlcompleter",
-        "subprocess",
-        "socket",
-        "ssl",
-        "signal",
-        "popen2",
-        "asyncore",
-        "asynchat",
-        "email",
-        "json",
-        "mailcap",
-        "mailbox",
-        "mhlib",
-        "mimetools",
-        "mimetypes",
-        "MimeWriter",
-        "mimify",
-        "multifile",
-        "rfc822",
-        "base64",
-        "binhex",
-        "binascii",
-        "quopri",
-        "uu",
-        "HTMLParser",
-        "sgmllib",
-        "htmllib",
-        "htmlentitydefs",
-        "xml",
-        "xml.etree",
-        "xml.etree.ElementTree",
-        "xml.dom",
-        "xml.dom.minidom",
-        "xml.dom.pulldom",
-        "xml.sax",
-        "xml.sax.handler",
-        "xml.sax.saxutils",
-        "xml.sax.xmlreader",
-        "xml.parsers",
-        "xml.parsers.expat",
-        "webbrowser",
-        "cgi",
-        "cgitb",
-        "wsgiref",
-        "urllib",
-        "urllib2",
-        "httplib",
-        "ftplib",
-        "poplib",
-        "imaplib",
-        "nntplib",
-        "smtplib",
-        "smtpd",
-        "telnetlib",
-        "uuid",
-        "urlparse",
-        "SocketServer",
-        "BaseHTTPServer",
-        "SimpleHTTPServer",
-        "CGIHTTPServer",
-        "cookielib",
-        "Cookie",
-        "xmlrpclib",
-        "SimpleXMLRPCServer",
-        "DocXMLRPCServer",
-        "audioop",
-        "imageop",
-        "aifc",
-        "sunau",
-        "wave",
-        "chunk",
-        "colorsys",
-        "imghdr",
-        "sndhdr",
-        "ossaudiodev",
-        "gettext",
-        "locale",
-        "cmd",
-        "shlex",
-        "Tkinter",
-        "ttk",
-        "Tix",
-        "ScrolledText",
-        "turtle",
-        "pydoc",
-        "doctest",
-        "unittest",
-        "test",
-        "test.test_support",
-        "bdb",
-        "pdb",
-        "hotshot",
-        "timeit",
-        "trace",
-        "sys",
-        "sysconfig",
-        "__builtin__",
-        "future_builtins",
-        "__main__",
-        "warnings",
-        "contextlib",
-        "abc",
-        "atexit",
-        "traceback",
-        "__future__",
-        "gc",
-        "inspect",
-        "site",
-        "user",
-        "fpectl",
-        "distutils",
-        "code",
-        "codeop",
-        "rexec",
-        "Bastion",
-        "imp",
-        "importlib",
-        "imputil",
-        "zipimport",
-        "pkgutil",
-        "modulefinder",
-        "runpy",
-        "parser",
-        "ast",
-        "symtable",
-        "symbol",
-        "token",
-        "keyword",
-        "tokenize",
-        "tabnanny",
-        "pyclbr",
-        "py_compile",
-        "compileall",
-        "dis",
-        "pickletools",
-        "formatter",
-        "msilib",
-        "msvcrt",
-        "_winreg",
-        "winsound",
-        "posix",
-        "pwd",
-        "spwd",
-        "grp",
-        "crypt",
-        "dl",
-        "termios",
-        "tty",
-        "pty",
-        "fcntl",
-        "pipes",
-        "posixfile",
-        "resource",
-        "nis",
-        "syslog",
-        "commands",
-        "ic",
-        "MacOS",
-        "macostools",
-        "findertools",
-        "EasyDialogs",
-        "FrameWork",
-        "autoGIL",
-        "ColorPicker",
-        "gensuitemodule",
-        "aetools",
-        "aepack",
-        "aetypes",
-        "MiniAEFrame",
-        "al",
-        "AL",
-        "cd",
-        "fl",
-        "FL",
-        "flp",
-        "fm",
-        "gl",
-        "DEVICE",
-        "GL",
-        "imgfile",
-        "jpeg",
-        "sunaudiodev",
-        "SUNAUDIODEV",
-    ]
-)
+def is_stdlib_module(module_name: str, version: Tuple[int, int] | None = None) -> bool:
+    """
+    Gets if a module belongs to the standard library.
 
+    Matching is on the top level package, so ``xml.etree.ElementTree`` and
+    ``os.path`` are standard library modules.
 
-if sys.version_info[0] >= 3:
-    _stdlib_modules.add("asyncio")
+    Args:
+        module_name (str): Dotted module name.
+        version (Tuple[int, int], optional): ``(major, minor)`` version of the Python
+            the output is built for. Defaults to the running interpreter.
+
+    Returns:
+        bool: ``True`` if the module is part of the standard library.
+    """
+    return module_name.partition(".")[0] in stdlib_module_names(version)
+
+
+def stdlib_module_names(version: Tuple[int, int] | None = None) -> FrozenSet[str]:
+    """
+    Gets the top level module names of the standard library.
+
+    The running interpreter reports its own names through ``sys.stdlib_module_names``
+    (Python 3.10+). Other versions use the tables generated by
+    ``scripts/gen_stdlib_names.py``; a version outside the tables uses the
+    nearest version that has one.
+
+    Args:
+        version (Tuple[int, int], optional): ``(major, minor)`` version. Defaults to the running interpreter.
+
+    Returns:
+        FrozenSet[str]: Module names.
+    """
+    if version is None:
+        version = sys.version_info[:2]
+    version = tuple(version[:2])
+    names = _names_by_version.get(version)
+    if names is None:
+        if version == sys.version_info[:2] and hasattr(sys, "stdlib_module_names"):
+            names = frozenset(sys.stdlib_module_names)
+        else:
+            known = sorted(VERSION_NAMES)
+            nearest = min(known, key=lambda v: (abs(v[1] - version[1]), -v[1]))
+            names = COMMON_NAMES | VERSION_NAMES[nearest]
+        _names_by_version[version] = names
+    return names
@@ -0,0 +1,461 @@
+from __future__ import annotations
+from typing import Dict, Iterator, List, Sequence, Tuple, Type
+import ast
+import bisect
+import io
+import time
+import tokenize
+
+import scriptmerge.merge_common as merge_common
+
+TRANSFORM_CLEAN = "clean"
+TRANSFORM_STRIP_ANNOTATIONS = "strip-annotations"
+
+_SKIPPED_TOKENS = (tokenize.NL, tokenize.COMMENT)
+
+
+class ParsedModule:
+    """
+    Source of a module shared by the stages of a ``TransformPipeline``.
+
+    The source is tokenized once, and parsed with ``ast`` once if a stage needs
+    the tree. Stages do not rewrite the source, they drop tokens with ``drop()``,
+    and the pipeline renders the source without them after the last stage.
+    """
+
+    def __init__(self, text: str, timings: Dict[str, float] | None = None) -> None:
+        """
+        Constructor
+
+        Args:
+            text (str): Source of the module.
+            timings (Dict[str, float], optional): Seconds spent tokenizing and parsing are added
+                to its ``"tokenize"`` and ``"parse"`` keys.
+        """
+        self.text = text
+        self.normalize_whitespace = False
+        self.dropped: Dict[int, bool] = {}
+        self._timings = {} if timings is None else timings
+        self._tokens: List[tokenize.TokenInfo] | None = None
+        self._starts: List[Tuple[int, int]] | None = None
+        self._tree: ast.Module | None = None
+        self._lines: List[str] | None = None
+
+    @property
+    def lines(self) -> List[str]:
+        """Gets the lines of the source, split the way the tokenizer reads them."""
+        if self._lines is None:
+            self._lines = io.StringIO(self.text).readlines()
+        return self._lines
+
+    @property
+    def tokens(self) -> List[tokenize.TokenInfo]:
+        """Gets the tokens of the source."""
+        if self._tokens is None:
+            start = time.perf_counter()
+            self._tokens = list(tokenize.generate_tokens(io.StringIO(self.text).readline))
+            _add_time(self._timings, "tokenize", start)
+        return self._tokens
+
+    @property
+    def tree(self) -> ast.Module:
+        """Gets the parsed ``ast`` tree of the source."""
+        if self._tree is None:
+            start = time.perf_counter()
+            self._tree = ast.parse(self.text)
+            _add_time(self._timings, "parse", start)
+        return self._tree
+
+    def drop(self, index: int, with_space: bool = False) -> None:
+        """
+        Drops a token from the output.
+
+        Args:
+            index (int): Index of the token in ``tokens``.
+            with_space (bool, optional): Drop the whitespace before the token as well.
+                Defaults to False.
+        """
+        self.dropped[index] = with_space or self.dropped.get(index, False)
+
+    def token_index(self, line: int, col: int) -> int:
+        """
+        Gets the index of the first token starting at or after a position.
+
+        Args:
+            line (int): Line number, starting at ``1``.
+            col (int): Column in characters, as in ``tokens``.
+
+        Returns:
+            int: Token index, ``len(tokens)`` when no token starts there.
+        """
+        if self._starts is None:
+            self._starts = [token.start for token in self.tokens]
+        return bisect.bisect_left(self._starts, (line, col))
+
+    def node_position(self, node: ast.AST, end: bool = False) -> Tuple[int, int]:
+        """
+        Gets the start or end position of a node in token columns.
+
+        ``ast`` columns count utf-8 bytes, token columns count characters.
+
+        Args:
+            node (ast.AST): Node of ``tree``.
+            end (bool, optional): Gets the end of the node. Defaults to False.
+
+        Returns:
+            Tuple[int, int]: Line and column.
+        """
+        if end:
+            line, col = node.end_lineno, node.end_col_offset
+        else:
+            line, col = node.lineno, node.col_offset
+        text = self.lines[line - 1]
+        if not text.isascii():
+            col = len(text.encode("utf-8")[:col].decode("utf-8", "replace"))
+        return line, col
+
+    def render(self) -> str:
+        """
+        Gets the source without the dropped tokens.
+
+        Returns:
+            str: Rendered source.
+        """
+        if self.normalize_whitespace:
+            return _render_normalized(self.tokens, self.dropped)
+        if not self.dropped:
+            return self.text
+        return _render_text(self.text, self.lines, self.tokens, self.dropped)
+
+
+class TransformStage:
+    """
+    Stage of a ``TransformPipeline``.
+
+    Subclasses set ``name`` and ``version``, and override ``apply()``. Bump
+    ``version`` when the output of the stage changes, it is part of the key
+    of cached results.
+    """
+
+    name = ""
+    version = "1"
+
+    @property
+    def config(self) -> str:
+        """Gets the name and version of the stage, as used in cache keys."""
+        return f"{self.name}:{self.version}"
+
+    def apply(self, module: ParsedModule) -> None:
+        """
+        Transforms a module.
+
+        Args:
+            module (ParsedModule): Module to transform.
+        """
+        raise NotImplementedError
+
+    def apply_text(self, text: str) -> str | None:
+        """
+        Transforms the source of a module when the stage runs alone.
+
+        A stage with a faster implementation of its own overrides this,
+        the default ``None`` runs ``apply()``.
+
+        Args:
+            text (str): Source of the module.
+
+        Returns:
+            str | None: Transformed source, or ``None``.
+        """
+        return None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class CleanStage(TransformStage):
+    """
+    Removes comments and doc strings, as ``merge_common.remove_comments_and_doc_strings()``.
+    """
+
+    name = TRANSFORM_CLEAN
+
+    def apply(self, module: ParsedModule) -> None:
+        # the same token rules as remove_comments_and_doc_strings()
+        module.normalize_whitespace = True
+        prev_toktype = tokenize.INDENT
+        for index, token in enumerate(module.tokens):
+            if token.type == tokenize.COMMENT:
+                if not token.string.startswith("#!"):
+                    module.drop(index)
+            elif token.type == tokenize.STRING:
+                if (
+                    prev_toktype == tokenize.INDENT
+                    or prev_toktype == tokenize.NEWLINE
+                    or token.start[1] == 0
+                ):
+                    module.drop(index)
+            prev_toktype = token.type
+
+    def apply_text(self, text: str) -> str | None:
+        return merge_common.remove_comments_and_doc_strings(text)
+
+
+class StripAnnotationsStage(TransformStage):
+    """
+    Removes the annotations of function arguments and return values, and of
+    assignments inside functions.
+
+    Annotations of assignments at module and class level are kept, ``dataclasses``
+    and ``typing.NamedTuple`` read them. Code that reads the annotations of
+    functions at runtime, such as ``functools.singledispatch`` without a type,
+    does not work with this stage.
+    """
+
+    name = TRANSFORM_STRIP_ANNOTATIONS
+
+    def apply(self, module: ParsedModule) -> None:
+        for annotation in _iter_annotations(module.tree):
+            _drop_annotation(module, annotation)
+
+
+TRANSFORMS: Dict[str, Type[TransformStage]] = {}
+"""Transform stages by name."""
+
+
+def register_transform(stage: Type[TransformStage]) -> Type[TransformStage]:
+    """
+    Registers a transform stage so it can be selected by name.
+
+    Can be used as a class decorator.
+
+    Args:
+        stage (Type[TransformStage]): Stage class, its ``name`` must be set.
+
+    Raises:
+        ValueError: If the stage has no name.
+
+    Returns:
+        Type[TransformStage]: ``stage``.
+    """
+    if not stage.name:
+        raise ValueError(f"{stage.__name__} has no name")
+    TRANSFORMS[stage.name] = stage
+    return stage
+
+
+register_transform(CleanStage)
+register_transform(StripAnnotationsStage)
+
+
+class TransformPipeline:
+    """
+    Runs transform stages over the source of each module.
+
+    The stages share one ``ParsedModule``, so the source is tokenized and parsed
+    once whatever the number of stages. ``timings`` adds up the seconds spent in
+    each stage, and in tokenizing, parsing and rendering, over every module run.
+    """
+
+    def __init__(self, stages: Sequence[str | TransformStage]) -> None:
+        """
+        Constructor
+
+        Args:
+            stages (Sequence[str | TransformStage]): Stages, or names of registered stages, in order.
+
+        Raises:
+            ValueError: If a name is not a registered stage.
+        """
+        self.stages: List[TransformStage] = []
+        for stage in stages:
+            if isinstance(stage, str):
+                if stage not in TRANSFORMS:
+                    raise ValueError(
+                        f"transform must be one of {tuple(TRANSFORMS)}, not {stage!r}"
+                    )
+                stage = TRANSFORMS[stage]()
+            if all(stage.name != other.name for other in self.stages):
+                self.stages.append(stage)
+        self.timings: Dict[str, float] = {}
+        self.modules = 0
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    def __contains__(self, name: object) -> bool:
+        return any(stage.name == name for stage in self.stages)
+
+    def __repr__(self) -> str:
+        return f"TransformPipeline({[stage.name for stage in self.stages]!r})"
+
+    @property
+    def config(self) -> str:
+        """Gets the stages and their versions, the transform key of cached results."""
+        return "+".join(stage.config for stage in self.stages)
+
+    def run(self, text: str) -> str:
+        """
+        Transforms the source of a module.
+
+        Args:
+            text (str): Source of the module.
+
+        Returns:
+            str: Transformed source.
+        """
+        self.modules += 1
+        if len(self.stages) == 1:
+            # a single stage needs no shared parse
+            stage = self.stages[0]
+            start = time.perf_counter()
+            result = stage.apply_text(text)
+            if result is not None:
+                _add_time(self.timings, stage.name, start)
+                return result
+        module = ParsedModule(text, self.timings)
+        for stage in self.stages:
+            start = time.perf_counter()
+            stage.apply(module)
+            _add_time(self.timings, stage.name, start)
+        start = time.perf_counter()
+        result = module.render()
+        _add_time(self.timings, "render", start)
+        return result
+
+
+def build_pipeline(
+    clean: bool, transforms: Sequence[str] | TransformPipeline | None = None
+) -> TransformPipeline | None:
+    """
+    Gets the pipeline of a build.
+
+    Args:
+        clean (bool): Remove comments and doc strings, adds the ``"clean"`` stage after ``transforms``.
+        transforms (Sequence[str] | TransformPipeline, optional): Names of the stages, or a pipeline,
+            which is used as it is.
+
+    Returns:
+        TransformPipeline | None: Pipeline, or ``None`` when there is nothing to run.
+    """
+    if isinstance(transforms, TransformPipeline):
+        return transforms if len(transforms) > 0 else None
+    names = list(transforms or [])
+    if clean:
+        names.append(TRANSFORM_CLEAN)
+    if not names:
+        return None
+    return TransformPipeline(names)
+
+
+def _add_time(timings: Dict[str, float], name: str, start: float) -> None:
+    timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def _iter_annotations(tree: ast.Module) -> Iterator[ast.expr]:
+    # (node, inside a function) pairs, a class body is not inside a function.
+    stack: List[Tuple[ast.AST, bool]] = [(tree, False)]
+    while stack:
+        node, in_function = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            args = node.args
+            for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+                if arg is not None and arg.annotation is not None:
+                    yield arg.annotation
+            if node.returns is not None:
+                yield node.returns
+            in_function = True
+        elif isinstance(node, ast.ClassDef):
+            in_function = False
+        elif isinstance(node, ast.AnnAssign) and in_function and node.value is not None:
+            yield node.annotation
+        for child in ast.iter_child_nodes(node):
+            stack.append((child, in_function))
+
+
+def _drop_annotation(module: ParsedModule, annotation: ast.expr) -> None:
+    # drops the ':' or '->' before the annotation, with any parentheses around it.
+    tokens = module.tokens
+    first = module.token_index(*module.node_position(annotation))
+    end = module.node_position(annotation, end=True)
+    last = first
+    while last < len(tokens) and tokens[last].end <= end:
+        last += 1
+    separator = first - 1
+    parentheses = 0
+    while separator >= 0:
+        token = tokens[separator]
+        if token.type in _SKIPPED_TOKENS:
+            pass
+        elif token.string == "(":
+            parentheses += 1
+        else:
+            break
+        separator -= 1
+    if separator < 0 or tokens[separator].string not in (":", "->"):
+        return
+    while parentheses > 0 and last < len(tokens):
+        token = tokens[last]
+        if token.string == ")":
+            parentheses -= 1
+        elif token.type not in _SKIPPED_TOKENS:
+            return
+        last += 1
+    if parentheses > 0:
+        return
+    for index in range(separator, last):
+        module.drop(index, with_space=True)
+
+
+def _render_normalized(tokens: List[tokenize.TokenInfo], dropped: Dict[int, bool]) -> str:
+    # the whitespace and blank line rules of remove_comments_and_doc_strings()
+    out = io.StringIO()
+    write = out.write
+    last_lineno = -1
+    last_col = 0
+    for index, (_, token_string, (start_line, start_col), (end_line, end_col), _) in enumerate(
+        tokens
+    ):
+        if start_line > last_lineno:
+            last_col = 0
+        with_space = dropped.get(index)
+        if start_col > last_col and with_space is not True:
+            write(" " * (start_col - last_col))
+        if with_space is None:
+            write(token_string)
+        last_col = end_col
+        last_lineno = end_line
+    result = out.getvalue().strip()
+    if len(result) > 0:
+        lines = [line for line in result.splitlines() if line.strip() != ""]
+        lines.append("")
+        result = "\n".join(lines)
+    return result
+
+
+def _render_text(
+    text: str, lines: List[str], tokens: List[tokenize.TokenInfo], dropped: Dict[int, bool]
+) -> str:
+    # cuts the dropped tokens out of the text, everything else is kept as it is.
+    line_offsets = [0]
+    for line in lines:
+        line_offsets.append(line_offsets[-1] + len(line))
+
+    def offset(position: Tuple[int, int]) -> int:
+        line, col = position
+        if line > len(line_offsets) - 1:
+            return len(text)
+        return line_offsets[line - 1] + col
+
+    parts: List[str] = []
+    position = 0
+    for index in sorted(dropped):
+        token = tokens[index]
+        start = offset(token.start)
+        if dropped[index] and index > 0:
+            start = min(start, offset(tokens[index - 1].end))
+        start = max(start, position)
+        parts.append(text[position:start])
+        position = max(position, offset(token.end))
+    parts.append(text[position:])
+    return "".join(parts)
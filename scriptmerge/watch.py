@@ -0,0 +1,262 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Set, Tuple
+import os
+import time
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge.cache import RawImport
+from scriptmerge.depfile import write_depfile
+from scriptmerge.merge_common import BuildResult
+from scriptmerge.module_graph import ModuleGraph, resolve_module_graph
+from scriptmerge.source_store import SourceStore
+from scriptmerge.transforms import build_pipeline
+
+DEFAULT_INTERVAL = 0.1
+"""Seconds between two polls of the files an output is built from."""
+
+# arguments of the writers that the watcher sets itself. The store holds the imports
+# of each module, which are not kept in it when they come from the import cache.
+_WATCH_OPTIONS = ("import_cache", "module_graph", "release_sources", "skip_unchanged", "sources")
+
+
+class Watcher:
+    """
+    Rebuilds an output each time a file it is built from changes.
+
+    The resolved graph and the ``SourceStore`` its modules are read through are kept
+    between builds. The files of the graph are polled with ``os.stat``, with the search
+    paths of the graph and the directories of its modules, so a module added where an
+    import looks for it is found. The output and the depfile are left out, writing them
+    is not a change. A change drops only the changed files from the store: the other
+    modules keep their parsed imports and their transformed contents. When the imports
+    of the changed files are the same as before the graph is reused as it is, otherwise
+    it is resolved again from the imports held in the store, so only the changed files
+    are parsed.
+
+    ``builds``, ``seconds``, ``changed``, ``result`` and ``error`` describe the last build.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        target: str | os.PathLike,
+        pyz_out: bool = False,
+        interval: float = DEFAULT_INTERVAL,
+        depfile: str | os.PathLike | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            path (str): Path to entry point py file.
+            target (str | os.PathLike): Path of the output file.
+            pyz_out (bool, optional): Write a ``.pyz`` archive instead of a ``.py`` file.
+                Defaults to False.
+            interval (float, optional): Seconds between two polls. Defaults to ``DEFAULT_INTERVAL``.
+            depfile (str | os.PathLike, optional): Path of a depfile written after each build,
+                see ``scriptmerge.depfile.write_depfile()``.
+            **kwargs (Any): The arguments of ``merge_py.script()`` or ``merge_pyz.script()``.
+        """
+        # polled paths are absolute, the directory of a relative script is not "".
+        self._path = os.path.abspath(path)
+        self._target = target
+        self._depfile = depfile
+        self._outputs = {
+            os.path.abspath(output) for output in (target, depfile) if output is not None
+        }
+        self._writer = merge_pyz.script_to if pyz_out else merge_py.script_to
+        self._interval = interval
+        self._options = {
+            name: value for name, value in kwargs.items() if name not in _WATCH_OPTIONS
+        }
+        self._sources = SourceStore(
+            import_scanner=str(kwargs.get("import_scanner", "ast")),
+            artifact_cache=kwargs.get("artifact_cache", None),
+            pipeline=build_pipeline(
+                bool(kwargs.get("clean", False)), kwargs.get("transforms", None)
+            ),
+        )
+        self._graph: ModuleGraph | None = None
+        self._stats: Dict[str, Tuple[int, int] | None] = {}
+        self._dirs: Set[str] = set()
+        self._listings: Dict[str, Tuple[str, ...] | None] = {}
+        self._imports: Dict[str, List[RawImport]] = {}
+        self.builds = 0
+        self.seconds = 0.0
+        self.changed: List[str] = []
+        self.result: BuildResult | None = None
+        self.error: BaseException | None = None
+
+    @property
+    def graph(self) -> ModuleGraph | None:
+        """Gets the graph of the last build, ``None`` before the first build."""
+        return self._graph
+
+    @property
+    def sources(self) -> SourceStore:
+        """Gets the store the modules are read through, kept between builds."""
+        return self._sources
+
+    def build(self, changed: List[str] | None = None) -> BuildResult:
+        """
+        Writes the output.
+
+        Args:
+            changed (List[str], optional): Files that changed since the last build,
+                every file when ``None``.
+
+        Raises:
+            Exception: The error of the writer. The graph is resolved again on the next build.
+
+        Returns:
+            BuildResult: Result of the writer.
+        """
+        start = time.perf_counter()
+        self.changed = [] if changed is None else list(changed)
+        try:
+            if changed is None:
+                self._sources.clear()
+                self._graph = None
+            for path in self.changed:
+                self._sources.release(path)
+            if self._graph is None or self._imports_changed(self.changed):
+                self._resolve()
+            self.result = self._writer(
+                self._target, self._path, module_graph=self._graph, **self._options
+            )
+            if self._depfile is not None:
+                write_depfile(self._depfile, [os.fspath(self._target)], self.result.dependencies)
+            self.error = None
+            return self.result
+        except BaseException as error:
+            self.result = None
+            self.error = error
+            self._graph = None
+            raise
+        finally:
+            self._snapshot(getattr(self.error, "filename", None))
+            self.builds += 1
+            self.seconds = time.perf_counter() - start
+
+    def poll(self) -> List[str]:
+        """
+        Gets the files of the last build that were changed, added or removed since.
+
+        A search path or module directory is changed when a file other than the output
+        or the depfile is added to it, or removed from it.
+
+        Returns:
+            List[str]: Changed files and directories.
+        """
+        changed = []
+        for path, stat in self._stats.items():
+            current = _stat(path)
+            if current == stat:
+                continue
+            if path in self._dirs and self._listing(path) == self._listings.get(path):
+                # only a file that is not polled, such as the output, was written or replaced.
+                self._stats[path] = current
+                continue
+            changed.append(path)
+        return changed
+
+    def run(self, on_build: Callable[[Watcher], None] | None = None) -> None:
+        """
+        Builds the output, then rebuilds it on each change until interrupted.
+
+        A build that fails, such as on a module with a syntax error, does not stop the
+        watcher, ``error`` is set and the next change is built again.
+
+        Args:
+            on_build (Callable[[Watcher], None], optional): Called after each build.
+        """
+        changed = None
+        while True:
+            try:
+                self.build(changed)
+            except Exception:
+                pass
+            if on_build is not None:
+                on_build(self)
+            changed = []
+            while not changed:
+                time.sleep(self._interval)
+                changed = self.poll()
+
+    def _imports_changed(self, changed: List[str]) -> bool:
+        # the graph only changes when the imports of a changed module do, or when a
+        # module is added to or removed from a directory imports are searched in.
+        for path in changed:
+            if path in self._dirs:
+                return True
+            if path not in self._imports:
+                # an extension module, its contents are read again when written.
+                continue
+            if _stat(path) is None or self._sources.raw_imports(path) != self._imports[path]:
+                return True
+        return False
+
+    def _resolve(self) -> None:
+        # resolved serially so the imports are parsed through, and kept in, the store.
+        options = dict(self._options, sources=self._sources, jobs=1)
+        graph = resolve_module_graph(self._path, **options)
+        if self._graph is not None:
+            paths = _graph_paths(graph)
+            for module in self._graph:
+                if module.absolute_path not in paths:
+                    self._sources.release(module.absolute_path)
+        self._graph = graph
+        self._imports = {
+            path: self._sources.raw_imports(path)
+            for path, is_extension in _graph_paths(graph).items()
+            if not is_extension
+        }
+
+    def _snapshot(self, extra: str | None = None) -> None:
+        # a failed build keeps watching the files of the last graph.
+        if self._graph is None:
+            paths = list(self._stats)
+        else:
+            self._dirs = _graph_dirs(self._graph)
+            paths = list(_graph_paths(self._graph)) + sorted(self._dirs)
+        paths.append(self._path)
+        if extra:
+            paths.append(extra)
+        self._stats = {path: _stat(path) for path in paths}
+        self._listings = {path: self._listing(path) for path in self._dirs}
+
+    def _listing(self, path: str) -> Tuple[str, ...] | None:
+        # the names in a directory, without the files the watcher writes itself.
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return None
+        return tuple(
+            sorted(name for name in names if os.path.join(path, name) not in self._outputs)
+        )
+
+
+def _graph_paths(module_graph: ModuleGraph) -> Dict[str, bool]:
+    # every file of the graph, and whether it is an extension module
+    paths = {module_graph.path: False}
+    for module in module_graph:
+        paths[module.absolute_path] = module.is_extension
+    return paths
+
+
+def _graph_dirs(module_graph: ModuleGraph) -> Set[str]:
+    # the directories a module added since the build would be found in: the search
+    # paths, which may not exist yet, and the directory of each module for its package.
+    dirs = {os.path.abspath(path) for path in module_graph.sys_path}
+    for module in module_graph:
+        dirs.add(os.path.abspath(os.path.dirname(module.absolute_path)))
+    return dirs
+
+
+def _stat(path: str) -> Tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,105 @@
+"""
+Compares the ast import finder with the token import scanner on large modules.
+
+Usage:
+    python scripts/bench_import_scanner.py [--rows N] [--repeat N] [FILE ...]
+
+Without files, a generated data table module and a generated protobuf style
+stub module are measured. For each module the best time of ``--repeat``
+runs and the peak memory of one run are reported for both finders, and the
+results are checked to be identical.
+"""
+from __future__ import annotations
+from typing import Callable, List, Tuple
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scriptmerge.import_scanner import try_scan_imports  # noqa: E402
+from scriptmerge.merge_common import find_raw_imports  # noqa: E402
+
+
+def _data_table(rows: int) -> str:
+    lines = ["import os\n", "from . import helpers\n", "\n", "DATA = [\n"]
+    for i in range(rows):
+        lines.append(f"    ({i}, {i * 3.5!r}, 'name_{i}', {{'k': {i}, 'v': [{i}, {i + 1}]}}),\n")
+    lines.append("]\n")
+    return "".join(lines)
+
+
+def _stub_module(rows: int) -> str:
+    lines = [
+        '"""Generated protocol buffer code."""\n',
+        "from google.protobuf import descriptor as _descriptor\n",
+        "from google.protobuf import message as _message\n",
+        "try:\n    import typing\nexcept ImportError:\n    typing = None\n",
+    ]
+    for i in range(rows // 10):
+        lines.append(
+            f"class Message{i}(_message.Message):\n"
+            f'    """Message {i}."""\n'
+            f"    __slots__ = ('field_a', 'field_b')\n"
+            f"    FIELD_A_FIELD_NUMBER: int = {i}\n"
+            f"    def __init__(self, field_a: int = ..., field_b: str = ...) -> None: ...\n"
+            f"    def ListFields(self):\n"
+            f"        from . import reflection_{i % 7}\n"
+            f"        return reflection_{i % 7}.fields(self)\n"
+        )
+    return "".join(lines)
+
+
+def _measure(func: Callable[[], object], repeat: int) -> Tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def _bench(name: str, source: bytes, repeat: int) -> None:
+    expected = find_raw_imports(source, name)
+    scanned = try_scan_imports(source)
+    if scanned is None:
+        print(f"{name}: the token scanner falls back to ast for this module")
+        return
+    if scanned != expected:
+        raise SystemExit(f"{name}: token scanner result differs from ast")
+    ast_time, ast_peak = _measure(lambda: find_raw_imports(source, name), repeat)
+    tok_time, tok_peak = _measure(lambda: try_scan_imports(source), repeat)
+    print(f"{name}: {len(source) / 1e6:.2f} MB, {len(expected)} imports")
+    print(f"    ast     {ast_time * 1000:9.1f} ms  peak {ast_peak / 1e6:8.1f} MB")
+    print(f"    tokens  {tok_time * 1000:9.1f} ms  peak {tok_peak / 1e6:8.1f} MB")
+    print(f"    speedup {ast_time / tok_time:9.1f}x")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", help="Python files to measure")
+    parser.add_argument("--rows", type=int, default=50_000, help="Rows of the generated modules")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per finder")
+    args = parser.parse_args(argv)
+
+    if args.files:
+        for path in args.files:
+            with open(path, "rb") as f:
+                _bench(path, f.read(), args.repeat)
+        return 0
+
+    with tempfile.TemporaryDirectory():
+        _bench("data_table.py", _data_table(args.rows).encode(), args.repeat)
+        _bench("stub_pb2.py", _stub_module(args.rows).encode(), args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,108 @@
+"""
+Compares the size and startup time of .py outputs with each payload encoding.
+
+Usage:
+    python scripts/bench_payload.py [--modules N] [--functions N] [--repeat N]
+
+A package of generated modules, with docstrings holding non-ASCII text, is
+bundled with the ``repr`` encoding and with each compressed encoding, for
+both preludes. Each bundle is run ``--repeat`` times importing none of the
+modules and importing all of them, and the best wall time is reported.
+"""
+from __future__ import annotations
+from typing import List
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scriptmerge.merge_py import script  # noqa: E402
+from scriptmerge.payload import PayloadEncoder  # noqa: E402
+
+_ENCODERS = [
+    PayloadEncoder("repr"),
+    PayloadEncoder("zlib", level=9),
+    PayloadEncoder("zlib", level=9, alphabet="base64"),
+    PayloadEncoder("lzma"),
+]
+
+_MAIN = """import importlib
+import sys
+
+if sys.argv[1:] == ["all"]:
+    for index in range({modules}):
+        importlib.import_module("benchpkg.module_%d" % index)
+"""
+
+
+def _module(index: int, functions: int) -> str:
+    lines = [f'"""Module {index} — générée pour la mesure."""\n', "import os\n\n"]
+    for i in range(functions):
+        lines.append(
+            f"def function_{i}(value, *, naïve=True):\n"
+            f'    """Retourne la valeur {i} « transformée » — voir la documentation."""\n'
+            f"    if naïve:\n"
+            f"        return os.path.join(str(value), 'résultat_{i}')\n"
+            f"    return {{'clé': value, 'index': {i}}}\n\n"
+        )
+    return "".join(lines)
+
+
+def _startup(bundle: str, args: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, bundle, *args], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", type=int, default=40, help="Generated modules")
+    parser.add_argument("--functions", type=int, default=200, help="Functions per module")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per bundle")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        package = os.path.join(root, "benchpkg")
+        os.mkdir(package)
+        with open(os.path.join(package, "__init__.py"), "w", encoding="utf-8") as f:
+            f.write("")
+        source_size = 0
+        for index in range(args.modules):
+            with open(os.path.join(package, f"module_{index}.py"), "w", encoding="utf-8") as f:
+                source_size += f.write(_module(index, args.functions))
+        main_path = os.path.join(root, "main.py")
+        with open(main_path, "w", encoding="utf-8") as f:
+            f.write(_MAIN.format(modules=args.modules))
+        add_modules = [f"benchpkg.module_{index}" for index in range(args.modules)]
+
+        print(f"{args.modules} modules, {source_size / 1e6:.2f} MB of source")
+        print(f"{'prelude':8} {'payload':13} {'size MB':>8} {'none ms':>8} {'all ms':>8}")
+        for prelude_mode in ("tempdir", "memory"):
+            for encoder in _ENCODERS:
+                output = script(
+                    main_path,
+                    add_python_modules=add_modules,
+                    prelude_mode=prelude_mode,
+                    payload=encoder,
+                )
+                bundle = os.path.join(root, "bundle.py")
+                with open(bundle, "w", encoding="utf-8") as f:
+                    f.write(output)
+                none = _startup(bundle, [], args.repeat)
+                every = _startup(bundle, ["all"], args.repeat)
+                print(
+                    f"{prelude_mode:8} {encoder.name:13} {len(output.encode('utf-8')) / 1e6:8.2f} "
+                    f"{none * 1000:8.1f} {every * 1000:8.1f}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,112 @@
+"""
+Compares the build time, size and startup time of .pyz outputs with each compression.
+
+Usage:
+    python scripts/bench_pyz_compress.py [--modules N] [--functions N] [--repeat N]
+
+A package of generated modules is bundled stored and deflated at several
+levels. The build is timed from a resolved module graph, so only writing the
+archive is measured. Each archive is run ``--repeat`` times importing none of
+the modules and importing all of them, and the best wall time is reported.
+"""
+from __future__ import annotations
+from typing import List
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scriptmerge.merge_pyz import script_to  # noqa: E402
+from scriptmerge.module_graph import resolve_module_graph  # noqa: E402
+
+_SETTINGS = [("none", None), ("deflate", 1), ("deflate", 6), ("deflate", 9)]
+
+_MAIN = """import importlib
+import sys
+
+if sys.argv[1:] == ["all"]:
+    for index in range({modules}):
+        importlib.import_module("benchpkg.module_%d" % index)
+"""
+
+
+def _module(index: int, functions: int) -> str:
+    lines = [f'"""Module {index}, generated for the benchmark."""\n', "import os\n\n"]
+    for i in range(functions):
+        lines.append(
+            f"def function_{i}(value, *, flag=True):\n"
+            f'    """Returns the value {i} transformed, see the documentation."""\n'
+            f"    if flag:\n"
+            f"        return os.path.join(str(value), 'result_{i}')\n"
+            f"    return {{'key': value, 'index': {i}}}\n\n"
+        )
+    return "".join(lines)
+
+
+def _startup(bundle: str, args: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, bundle, *args], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", type=int, default=200, help="Generated modules")
+    parser.add_argument("--functions", type=int, default=50, help="Functions per module")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per archive")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        package = os.path.join(root, "benchpkg")
+        os.mkdir(package)
+        with open(os.path.join(package, "__init__.py"), "w", encoding="utf-8") as f:
+            f.write("")
+        source_size = 0
+        for index in range(args.modules):
+            with open(os.path.join(package, f"module_{index}.py"), "w", encoding="utf-8") as f:
+                source_size += f.write(_module(index, args.functions))
+        main_path = os.path.join(root, "main.py")
+        with open(main_path, "w", encoding="utf-8") as f:
+            f.write(_MAIN.format(modules=args.modules))
+        module_graph = resolve_module_graph(
+            main_path,
+            add_python_modules=[f"benchpkg.module_{index}" for index in range(args.modules)],
+        )
+
+        print(f"{args.modules} modules, {source_size / 1e6:.2f} MB of source")
+        print(f"{'compress':8} {'level':>5} {'build ms':>9} {'size MB':>8} {'none ms':>8} {'all ms':>8}")
+        for compression, level in _SETTINGS:
+            build = float("inf")
+            for _ in range(args.repeat):
+                output = io.BytesIO()
+                start = time.perf_counter()
+                script_to(
+                    output,
+                    main_path,
+                    module_graph=module_graph,
+                    compression=compression,
+                    compress_level=level,
+                )
+                build = min(build, time.perf_counter() - start)
+            bundle = os.path.join(root, "bundle.pyz")
+            with open(bundle, "wb") as f:
+                f.write(output.getvalue())
+            none = _startup(bundle, [], args.repeat)
+            every = _startup(bundle, ["all"], args.repeat)
+            print(
+                f"{compression:8} {level if level is not None else '-':>5} {build * 1000:9.1f} "
+                f"{len(output.getvalue()) / 1e6:8.2f} {none * 1000:8.1f} {every * 1000:8.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,112 @@
+"""
+Compares the startup time of .pyz outputs with and without precompiled bytecode.
+
+Usage:
+    python scripts/bench_pyz_precompile.py [--modules N] [--functions N] [--repeat N]
+
+A tree of generated packages is bundled with its sources only, with a ``.pyc``
+next to each source and with the ``.pyc`` files alone, stored and deflated.
+Each archive is run ``--repeat`` times importing all the modules, and the best
+wall time is reported.
+"""
+from __future__ import annotations
+from typing import List
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scriptmerge.merge_pyz import script_to  # noqa: E402
+from scriptmerge.module_graph import resolve_module_graph  # noqa: E402
+
+_SETTINGS = [
+    ("source", {}),
+    ("precompile", {"precompile": True}),
+    ("bytecode-only", {"bytecode_only": True}),
+    ("source", {"compression": "deflate"}),
+    ("precompile", {"precompile": True, "compression": "deflate"}),
+    ("bytecode-only", {"bytecode_only": True, "compression": "deflate"}),
+]
+
+_PACKAGES = 10
+
+_MAIN = """import importlib
+
+for package in range({packages}):
+    for index in range({modules}):
+        importlib.import_module("benchpkg.sub_%d.module_%d" % (package, index))
+"""
+
+
+def _module(index: int, functions: int) -> str:
+    lines = [f'"""Module {index}, generated for the benchmark."""\n', "import os\n\n"]
+    for i in range(functions):
+        lines.append(
+            f"class Class{i}:\n"
+            f'    """Holds the value {i}."""\n\n'
+            f"    def method(self, value, *, flag=True):\n"
+            f"        if flag:\n"
+            f"            return [os.path.join(str(value), f'result_{{n}}') for n in range({i})]\n"
+            f"        return {{'key': value, 'index': {i}}}\n\n"
+        )
+    return "".join(lines)
+
+
+def _startup(bundle: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, bundle], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", type=int, default=30, help="Generated modules per package")
+    parser.add_argument("--functions", type=int, default=50, help="Classes per module")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per archive")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        package = os.path.join(root, "benchpkg")
+        os.mkdir(package)
+        with open(os.path.join(package, "__init__.py"), "w", encoding="utf-8") as f:
+            f.write("")
+        add_modules = []
+        for sub in range(_PACKAGES):
+            sub_package = os.path.join(package, f"sub_{sub}")
+            os.mkdir(sub_package)
+            with open(os.path.join(sub_package, "__init__.py"), "w", encoding="utf-8") as f:
+                f.write("")
+            for index in range(args.modules):
+                module_path = os.path.join(sub_package, f"module_{index}.py")
+                with open(module_path, "w", encoding="utf-8") as f:
+                    f.write(_module(index, args.functions))
+                add_modules.append(f"benchpkg.sub_{sub}.module_{index}")
+        main_path = os.path.join(root, "main.py")
+        with open(main_path, "w", encoding="utf-8") as f:
+            f.write(_MAIN.format(packages=_PACKAGES, modules=args.modules))
+        module_graph = resolve_module_graph(main_path, add_python_modules=add_modules)
+
+        print(f"{len(add_modules)} modules")
+        print(f"{'entries':14} {'compress':8} {'build ms':>9} {'size MB':>8} {'start ms':>9}")
+        for label, kwargs in _SETTINGS:
+            bundle = os.path.join(root, "bundle.pyz")
+            start = time.perf_counter()
+            script_to(bundle, main_path, module_graph=module_graph, **kwargs)
+            build = time.perf_counter() - start
+            startup = _startup(bundle, args.repeat)
+            print(
+                f"{label:14} {kwargs.get('compression', 'none'):8} {build * 1000:9.1f} "
+                f"{os.path.getsize(bundle) / 1e6:8.2f} {startup * 1000:9.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
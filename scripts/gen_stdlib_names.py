@@ -0,0 +1,108 @@
+"""
+Generates scriptmerge/stdlib_names.py, the standard library module names of each supported Python.
+
+Usage:
+    python scripts/gen_stdlib_names.py /path/to/python3.8 /path/to/python3.9 ...
+
+Python 3.10 and later report their names in ``sys.stdlib_module_names``.
+For older versions the names are collected from the standard library
+directory of the interpreter, in the same way ``sys.stdlib_module_names``
+is built: test and example modules are left out and platform specific
+modules that are not built on the current platform are added.
+"""
+from __future__ import annotations
+from typing import Dict, FrozenSet, List, Tuple
+import json
+import os
+import subprocess
+import sys
+
+_OUTPUT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "scriptmerge",
+    "stdlib_names.py",
+)
+
+_PROBE = r"""
+import json, os, sys, sysconfig
+
+if hasattr(sys, "stdlib_module_names"):
+    names = set(sys.stdlib_module_names)
+else:
+    names = set(sys.builtin_module_names)
+    lib = sysconfig.get_paths()["stdlib"]
+    for entry in os.listdir(lib):
+        full = os.path.join(lib, entry)
+        if entry.endswith(".py"):
+            names.add(entry[:-3])
+        elif os.path.isfile(os.path.join(full, "__init__.py")):
+            names.add(entry)
+    dynload = os.path.join(lib, "lib-dynload")
+    if os.path.isdir(dynload):
+        for entry in os.listdir(dynload):
+            if entry.endswith((".so", ".pyd")):
+                names.add(entry.split(".")[0])
+    skip = ("_test", "_xx", "xx", "_ctypes_test", "_sysconfigdata", "__phello__")
+    names = {n for n in names if n != "test" and not n.startswith(skip)}
+    names.update(
+        [
+            "_dbm", "_frozen_importlib", "_frozen_importlib_external", "_gdbm",
+            "_msi", "_overlapped", "_scproxy", "_winapi", "msilib", "msvcrt",
+            "nt", "winreg", "winsound",
+        ]
+    )
+print(json.dumps({"version": list(sys.version_info[:2]), "names": sorted(names)}))
+"""
+
+
+def _probe(python_binary: str) -> Tuple[Tuple[int, int], FrozenSet[str]]:
+    output = subprocess.check_output([python_binary, "-c", _PROBE])
+    data = json.loads(output)
+    return tuple(data["version"]), frozenset(data["names"])
+
+
+def _format_names(names: List[str], indent: str) -> str:
+    return "".join(f"{indent}{name!r},\n" for name in names)
+
+
+def main(python_binaries: List[str]) -> int:
+    tables: Dict[Tuple[int, int], FrozenSet[str]] = {}
+    for python_binary in python_binaries:
+        version, names = _probe(python_binary)
+        tables[version] = names
+    if not tables:
+        print(__doc__, file=sys.stderr)
+        return 2
+
+    common = sorted(frozenset.intersection(*tables.values()))
+    lines = [
+        '"""\n',
+        "Standard library module names of each supported Python version.\n",
+        "\n",
+        "Generated by scripts/gen_stdlib_names.py, do not edit.\n",
+        '"""\n',
+        "from typing import Dict, FrozenSet, Tuple\n",
+        "\n",
+        "COMMON_NAMES: FrozenSet[str] = frozenset(\n",
+        "    [\n",
+        _format_names(common, "        "),
+        "    ]\n",
+        ")\n",
+        "\n",
+        "# names of each version that are not in COMMON_NAMES\n",
+        "VERSION_NAMES: Dict[Tuple[int, int], FrozenSet[str]] = {\n",
+    ]
+    for version in sorted(tables):
+        extra = sorted(tables[version].difference(common))
+        lines.append(f"    {version!r}: frozenset(\n        [\n")
+        lines.append(_format_names(extra, "            "))
+        lines.append("        ]\n    ),\n")
+    lines.append("}\n")
+    with open(_OUTPUT, "w", encoding="utf-8", newline="\n") as f:
+        f.write("".join(lines))
+    print(f"wrote {_OUTPUT} for {', '.join('%d.%d' % v for v in sorted(tables))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
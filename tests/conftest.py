@@ -7,6 +7,19 @@ import zipfile
 from pathlib import Path
 
 
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", help="run the tests marked slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow, run with --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
 @pytest.fixture(scope="session")
 def find_script():
     def _find_script(path):
@@ -52,6 +65,18 @@ def venv_python_binary_path(is_windows):
     return _venv_python_binary_path
 
 
+@pytest.fixture
+def package_script(tmp_path):
+    pkg = tmp_path / "src" / "pkg"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("from . import greet\n")
+    (pkg / "greet.py").write_text("def hello():\n    return 'Hello'\n")
+    (pkg / "extra.py").write_text("NAME = 'extra'\n")
+    script = tmp_path / "src" / "main.py"
+    script.write_text("import pkg\nprint(pkg.greet.hello())\n")
+    return script
+
+
 @pytest.fixture
 def unzip_file_in_tmp(tmp_path):
     def _unzip_file(zip_path):
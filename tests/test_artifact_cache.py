@@ -0,0 +1,106 @@
+from __future__ import annotations
+import subprocess
+import pytest
+from pathlib import Path
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge.cache import ArtifactCache
+
+
+def test_artifact_cache_hits_on_second_build(find_script, tmp_path):
+    script_path: str = find_script("script_using_multi_import/hello")
+    cache = ArtifactCache(cache_dir=tmp_path)
+    first = merge_py.script(script_path, clean=True, artifact_cache=cache)
+    assert cache.hits == 0
+    assert cache.misses > 0
+    misses = cache.misses
+
+    cache = ArtifactCache(cache_dir=tmp_path)
+    second = merge_py.script(script_path, clean=True, artifact_cache=cache)
+    assert cache.misses == 0
+    assert cache.hits == misses
+    assert cache.hit_rate == 1.0
+    assert first == second
+    assert first == merge_py.script(script_path, clean=True)
+
+
+def test_artifact_cache_shared_between_py_and_pyz(find_script, tmp_path):
+    script_path: str = find_script("explicit_relative_import_from_parent_package/hello")
+    cache = ArtifactCache(cache_dir=tmp_path)
+    _ = merge_py.script(script_path, clean=True, artifact_cache=cache)
+    misses = cache.misses
+
+    cache = ArtifactCache(cache_dir=tmp_path)
+    _ = merge_pyz.script(script_path, clean=True, artifact_cache=cache)
+    assert cache.misses == 0
+    assert cache.hits == misses
+
+
+def test_artifact_cache_not_used_without_clean(find_script, tmp_path):
+    script_path: str = find_script("script_using_multi_import/hello")
+    cache = ArtifactCache(cache_dir=tmp_path)
+    _ = merge_pyz.script(script_path, artifact_cache=cache)
+    assert cache.hits + cache.misses == 0
+    assert cache.hit_rate == 0.0
+
+
+def test_artifact_cache_keyed_by_content_and_transform(tmp_path):
+    cache = ArtifactCache(cache_dir=tmp_path)
+    built = []
+
+    def build(source: bytes) -> bytes:
+        built.append(source)
+        return source.upper()
+
+    assert cache.get_artifact("upper:1", b"abc", build) == b"ABC"
+    assert cache.get_artifact("upper:1", b"abc", build) == b"ABC"
+    assert len(built) == 1
+    assert cache.get_artifact("upper:2", b"abc", build) == b"ABC"
+    assert cache.get_artifact("upper:1", b"abd", build) == b"ABD"
+    assert len(built) == 3
+    # an empty result is a hit too.
+    assert cache.get_artifact("empty:1", b"abc", lambda _: b"") == b""
+    assert cache.get_artifact("empty:1", b"abc", build) == b""
+    assert cache.stats == {"hits": 2, "misses": 4}
+
+
+def test_artifact_cache_keyed_by_python_version(tmp_path, monkeypatch):
+    from scriptmerge import cache as cache_module
+
+    cache = ArtifactCache(cache_dir=tmp_path)
+    assert cache.get_artifact("upper:1", b"abc", bytes.upper) == b"ABC"
+    # a transform run by another version of Python, whose tokenize may differ, is not used.
+    monkeypatch.setattr(cache_module, "_PYTHON_TAG", "cpython-399")
+    assert cache.lookup("upper:1", b"abc") is None
+    monkeypatch.undo()
+    assert cache.lookup("upper:1", b"abc") == b"ABC"
+
+
+def test_cli_artifact_cache_stats(find_script, tmp_path):
+    script_path: str = find_script("script_using_multi_import/hello")
+    temp_file: Path = tmp_path / "hello.pyz"
+    cnd_args = [
+        "scriptmerge",
+        "compilepyz",
+        script_path,
+        "-o",
+        str(temp_file),
+        "--clean",
+        "--cache-dir",
+        str(tmp_path / "cache"),
+        "--force",
+        "-v",
+    ]
+    result = subprocess.run(cnd_args, capture_output=True, text=True)
+    assert temp_file.exists()
+    assert "artifact cache: 0 hits" in result.stderr
+    assert (tmp_path / "cache" / "artifacts").is_dir()
+
+    result = subprocess.run(cnd_args, capture_output=True, text=True)
+    assert "0 misses, 100% hit rate" in result.stderr
+
+    result = subprocess.run(cnd_args + ["--no-cache"], capture_output=True, text=True)
+    assert "artifact cache" not in result.stderr
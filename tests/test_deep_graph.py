@@ -0,0 +1,135 @@
+from __future__ import annotations
+import inspect
+import sys
+import threading
+import time
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge.merge_pyz import ModuleWriterGenerator
+
+
+def _write_graph(root, edges):
+    pkg = root / "pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    for name, imports in edges.items():
+        lines = "".join(f"from . import {child}\n" for child in imports)
+        (pkg / f"{name}.py").write_text(lines)
+    script = root / "main.py"
+    script.write_text("import pkg.n0\n")
+    return str(script)
+
+
+def _expected_order(edges):
+    # recursive depth first order over the known edges, what the walk must reproduce.
+    order = ["pkg"]
+    seen = {"pkg"}
+
+    def visit(name):
+        for child in edges[name]:
+            if child not in seen:
+                seen.add(child)
+                order.append(child)
+                visit(child)
+
+    seen.add("n0")
+    order.append("n0")
+    visit("n0")
+    return ["pkg" if n == "pkg" else f"pkg.{n}" for n in order]
+
+
+def test_deep_chain_beyond_recursion_limit(tmp_path):
+    depth = sys.getrecursionlimit() * 2
+    edges = {f"n{i}": [f"n{i + 1}"] for i in range(depth)}
+    edges[f"n{depth}"] = []
+    script = _write_graph(tmp_path, edges)
+
+    generator = ModuleWriterGenerator(sys_path=[str(tmp_path)], clean=False)
+    generator.generate_for_file(
+        script, add_python_modules=[], exclude_python_modules=set()
+    )
+    assert len(generator._modules) == depth + 2
+    assert list(generator._modules)[-1] == f"pkg.n{depth}"
+
+    output = merge_py.script(script)
+    assert output.count("__scriptmerge_write_module('pkg/") == depth + 2
+
+
+def test_deep_and_wide_graph_order(tmp_path):
+    count, tail = 1500, 1200
+    edges = _deep_and_wide_edges(count, tail)
+    script = _write_graph(tmp_path, edges)
+
+    start = time.perf_counter()
+    generator = ModuleWriterGenerator(sys_path=[str(tmp_path)], clean=False)
+    generator.generate_for_file(
+        script, add_python_modules=[], exclude_python_modules=set()
+    )
+    elapsed = time.perf_counter() - start
+    assert list(generator._modules) == _reference_order(edges)
+    assert len(generator._modules) == count + tail + 2
+    # generous bound, only catches accidental quadratic behaviour.
+    assert elapsed < 60
+
+    output = merge_pyz.script(script)
+    assert len(output) > 0
+
+
+@pytest.mark.slow
+def test_graph_of_100k_modules(tmp_path):
+    count, tail = 100_000, 5_000
+    edges = _deep_and_wide_edges(count, tail)
+    script = _write_graph(tmp_path, edges)
+
+    generator = ModuleWriterGenerator(sys_path=[str(tmp_path)], clean=False)
+    old_limit = sys.getrecursionlimit()
+    # the walk uses the same few frames whatever the size and depth of the graph.
+    sys.setrecursionlimit(len(inspect.stack(0)) + 100)
+    try:
+        start = time.perf_counter()
+        generator.generate_for_file(
+            script, add_python_modules=[], exclude_python_modules=set()
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.setrecursionlimit(old_limit)
+    assert len(generator._modules) == count + tail + 2
+    assert list(generator._modules) == _reference_order(edges)
+    # about 10 seconds, a walk that is not linear in the modules takes hours.
+    assert elapsed < 300
+
+
+def _deep_and_wide_edges(count, tail):
+    # each node imports two children and a back edge to an earlier node.
+    edges = {}
+    for i in range(count):
+        children = [c for c in (2 * i + 1, 2 * i + 2) if c < count]
+        if i > 3:
+            children.append(i // 3)
+        edges[f"n{i}"] = [f"n{c}" for c in children]
+    # a long tail hanging off the last leaf
+    edges[f"n{count - 1}"] = ["t0"]
+    for i in range(tail):
+        edges[f"t{i}"] = [f"t{i + 1}"]
+    edges[f"t{tail}"] = []
+    return edges
+
+
+def _reference_order(edges):
+    # the recursive order can be as deep as the graph, it runs in a thread with a large stack.
+    result = []
+    old_limit = sys.getrecursionlimit()
+    old_stack_size = threading.stack_size(512 * 1024 * 1024)
+    sys.setrecursionlimit(max(old_limit, len(edges) + 1000))
+    try:
+        thread = threading.Thread(target=lambda: result.append(_expected_order(edges)))
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(old_stack_size)
+        sys.setrecursionlimit(old_limit)
+    return result[0]
@@ -0,0 +1,65 @@
+from __future__ import annotations
+import os
+import subprocess
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+import scriptmerge
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge.depfile import format_depfile
+
+
+def _expected(script) -> list:
+    src = script.parent
+    return [str(script), str(src / "pkg" / "__init__.py"), str(src / "pkg" / "greet.py")]
+
+
+def test_format_depfile():
+    result = format_depfile(["dist/out.pyz"], ["src/main.py", "my dir/a#b.py", "$x.py"])
+    assert result == "dist/out.pyz: \\\n src/main.py \\\n my\\ dir/a\\#b.py \\\n $$x.py\n"
+
+
+def test_script_to_dependencies(package_script, tmp_path):
+    prelude = os.path.join(os.path.dirname(merge_py.__file__), "prelude_memory.py")
+    result = merge_py.script_to(
+        tmp_path / "out.py", str(package_script), prelude_mode="memory"
+    )
+    assert result.dependencies == _expected(package_script) + [prelude]
+
+    result = merge_pyz.script_to(tmp_path / "out.pyz", str(package_script))
+    assert result.dependencies == _expected(package_script)
+
+    for _ in range(2):
+        result = scriptmerge.script_to(
+            tmp_path / "out.pyz", str(package_script), pyz_out=True, skip_unchanged=True
+        )
+    # an unchanged output has the same dependencies.
+    assert not result.written
+    assert result.dependencies == _expected(package_script)
+
+
+def test_script_build_result(package_script):
+    build_result = scriptmerge.BuildResult(None)
+    merge_pyz.script(str(package_script), build_result=build_result)
+    assert build_result.dependencies == _expected(package_script)
+
+
+def test_cli_depfile(package_script, tmp_path):
+    out = tmp_path / "out.py"
+    depfile = tmp_path / "out.d"
+    cmd = ["scriptmerge", "compilepy", str(package_script), "-o", str(out), "--depfile", str(depfile)]
+    subprocess.run(cmd + ["--no-cache"], check=True)
+    lines = depfile.read_text().splitlines()
+    assert lines[0] == f"{out}: \\"
+    assert [line.strip(" \\") for line in lines[1:4]] == _expected(package_script)
+    assert lines[-1].endswith("prelude.py")
+
+    result = subprocess.run(
+        ["scriptmerge", "compilepyz", str(package_script), "-o", "-", "--depfile", str(depfile)],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 2
+    assert "--depfile" in result.stderr
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import io
+import os
+import subprocess
+import sys
+import zipfile
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge.fingerprint import read_fingerprint
+
+
+@pytest.mark.parametrize("merge, kind", [(merge_py, "py"), (merge_pyz, "pyz")])
+def test_skip_unchanged(package_script, tmp_path, merge, kind):
+    out = tmp_path / f"out.{kind}"
+    first = merge.script_to(out, str(package_script), skip_unchanged=True)
+    assert first.written
+    assert read_fingerprint(out, kind) == first.fingerprint
+    data = out.read_bytes()
+    result = subprocess.run([sys.executable, str(out)], capture_output=True, text=True)
+    assert result.stdout == "Hello\n"
+
+    second = merge.script_to(out, str(package_script), skip_unchanged=True)
+    assert not second.written
+    assert second.fingerprint == first.fingerprint
+
+    forced = merge.script_to(out, str(package_script), skip_unchanged=True, force=True)
+    assert forced.written
+    assert out.read_bytes() == data
+
+    (package_script.parent / "pkg" / "greet.py").write_text("def hello():\n    return 'Hi'\n")
+    changed = merge.script_to(out, str(package_script), skip_unchanged=True)
+    assert changed.written
+    assert changed.fingerprint != first.fingerprint
+    result = subprocess.run([sys.executable, str(out)], capture_output=True, text=True)
+    assert result.stdout == "Hi\n"
+
+    cleaned = merge.script_to(out, str(package_script), clean=True, skip_unchanged=True)
+    assert cleaned.written
+    assert cleaned.fingerprint != changed.fingerprint
+
+
+def test_fingerprint_not_embedded_without_skip_unchanged(package_script, tmp_path):
+    out = tmp_path / "out.py"
+    result = merge_py.script_to(out, str(package_script))
+    assert result.written
+    assert result.fingerprint is None
+    assert read_fingerprint(out, "py") is None
+    assert out.read_text() == merge_py.script(str(package_script))
+
+
+def test_callback_disables_fingerprint(package_script, tmp_path):
+    out = tmp_path / "out.pyz"
+    for _ in range(2):
+        result = merge_pyz.script_to(
+            out, str(package_script), skip_unchanged=True, callback=lambda source, args: None
+        )
+        assert result.written
+        assert result.fingerprint is None
+
+
+def test_archive_is_deterministic(package_script, monkeypatch):
+    first = merge_pyz.script(str(package_script), compression="deflate")
+    assert merge_pyz.script(str(package_script), compression="deflate") == first
+    with zipfile.ZipFile(io.BytesIO(first)) as archive:
+        assert {info.date_time for info in archive.infolist()} == {(1980, 1, 1, 0, 0, 0)}
+
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+    dated = merge_pyz.script(str(package_script))
+    with zipfile.ZipFile(io.BytesIO(dated)) as archive:
+        assert archive.infolist()[0].date_time == (2023, 11, 14, 22, 13, 20)
+
+
+def test_failed_write_keeps_existing_output(package_script, tmp_path):
+    out = tmp_path / "out.py"
+    out.write_text("previous\n")
+    os.chmod(out, 0o750)
+    with pytest.raises(ValueError):
+        merge_py.script_to(out, str(package_script), prelude_mode="zip")
+    assert out.read_text() == "previous\n"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    merge_py.script_to(out, str(package_script))
+    assert out.read_text() == merge_py.script(str(package_script))
+    # the mode of the replaced file is kept.
+    assert out.stat().st_mode & 0o777 == 0o750
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="posix file modes")
+def test_new_output_mode_follows_umask(package_script, tmp_path, monkeypatch):
+    out = tmp_path / "out.py"
+    umask = os.umask(0o027)
+    try:
+        # the umask is process wide, reading it by setting it races with other threads.
+        monkeypatch.setattr(os, "umask", None)
+        merge_py.script_to(out, str(package_script))
+    finally:
+        monkeypatch.undo()
+        os.umask(umask)
+    assert out.stat().st_mode & 0o777 == 0o640
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_cli_skips_unchanged_output(package_script, tmp_path):
+    out = tmp_path / "out.pyz"
+    cmd = ["scriptmerge", "compilepyz", str(package_script), "-o", str(out), "--no-cache", "-v"]
+    subprocess.run(cmd, capture_output=True, check=True)
+    mtime = out.stat().st_mtime_ns
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    assert f"unchanged: {out}" in result.stderr
+    assert out.stat().st_mtime_ns == mtime
+
+    result = subprocess.run(cmd + ["--force"], capture_output=True, text=True, check=True)
+    assert "unchanged" not in result.stderr
+
+
+def test_fingerprint_covers_bytecode_interpreter(package_script, tmp_path, monkeypatch):
+    from scriptmerge import fingerprint
+
+    out = tmp_path / "out.pyz"
+    binary = str(tmp_path / "python")
+    versions = {binary: "3.11.4 a70d0d0a"}
+    monkeypatch.setattr(fingerprint, "interpreter_version", versions.__getitem__)
+    options = dict(precompile=True, precompile_binary=binary)
+
+    def build_fingerprint():
+        return fingerprint.check_unchanged("pyz", out, str(package_script), options)[0].fingerprint
+
+    first = build_fingerprint()
+    assert build_fingerprint() == first
+    # the same path now runs another version of Python.
+    versions[binary] = "3.12.1 cb0d0d0a"
+    assert build_fingerprint() != first
+
+
+def test_fingerprint_covers_source_date_epoch(package_script, tmp_path, monkeypatch):
+    out = tmp_path / "out.pyz"
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+    first = merge_pyz.script_to(out, str(package_script), skip_unchanged=True)
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1800000000")
+    second = merge_pyz.script_to(out, str(package_script), skip_unchanged=True)
+    assert second.written
+    assert second.fingerprint != first.fingerprint
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="the binary is a shell script")
+def test_interpreter_version_follows_binary(tmp_path, monkeypatch):
+    from scriptmerge import bytecode
+
+    binary = tmp_path / "python"
+    binary.write_text(f'#!/bin/sh\nexec "{sys.executable}" "$@"\n')
+    binary.chmod(0o755)
+    runs = []
+    run = subprocess.run
+
+    def counted_run(*args, **kwargs):
+        runs.append(args)
+        return run(*args, **kwargs)
+
+    monkeypatch.setattr(bytecode.subprocess, "run", counted_run)
+    version = bytecode.interpreter_version(str(binary))
+    assert version == bytecode.interpreter_version(None)
+    assert bytecode.interpreter_version(str(binary)) == version
+    assert len(runs) == 1
+
+    # a binary replaced by another is asked again.
+    stat = os.stat(binary)
+    binary.write_text(f'#!/bin/sh\nexec "{sys.executable}" "$@"  \n')
+    os.utime(binary, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert bytecode.interpreter_version(str(binary)) == version
+    assert len(runs) == 2
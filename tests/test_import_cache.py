@@ -0,0 +1,124 @@
+from __future__ import annotations
+import os
+import subprocess
+import pytest
+from pathlib import Path
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge.cache import ImportCache
+
+
+def test_import_cache_hits_on_second_build(find_script, tmp_path):
+    script_path: str = find_script("script_using_multi_import/hello")
+    cache = ImportCache(cache_dir=tmp_path)
+    first = merge_py.script(script_path, import_cache=cache)
+    assert cache.hits == 0
+    assert cache.misses > 0
+    misses = cache.misses
+
+    cache = ImportCache(cache_dir=tmp_path)
+    second = merge_py.script(script_path, import_cache=cache)
+    assert cache.misses == 0
+    assert cache.hits == misses
+    assert first == second
+
+
+def test_import_cache_shared_between_py_and_pyz(find_script, tmp_path):
+    script_path: str = find_script("explicit_relative_import_from_parent_package/hello")
+    cache = ImportCache(cache_dir=tmp_path)
+    _ = merge_py.script(script_path, import_cache=cache)
+    misses = cache.misses
+
+    cache = ImportCache(cache_dir=tmp_path)
+    _ = merge_pyz.script(script_path, import_cache=cache)
+    assert cache.misses == 0
+    assert cache.hits == misses
+
+
+def test_import_cache_content_hash_fallback(tmp_path):
+    src = tmp_path / "mod.py"
+    src.write_text("import os\nfrom . import sibling\n", encoding="utf-8")
+    cache = ImportCache(cache_dir=tmp_path / "cache")
+    parsed = []
+
+    def parse(source: bytes):
+        parsed.append(source)
+        return [("os", 0, []), (None, 1, ["sibling"])]
+
+    def read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    expected = [("os", 0, []), (None, 1, ["sibling"])]
+    assert cache.get_imports(str(src), parse, read) == expected
+    assert len(parsed) == 1
+
+    # same content, new mtime: found by content hash without parsing.
+    st = src.stat()
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000_000))
+    assert cache.get_imports(str(src), parse, read) == expected
+    assert len(parsed) == 1
+    assert cache.hits == 1
+
+    src.write_text("import sys\n", encoding="utf-8")
+    cache.get_imports(str(src), parse, read)
+    assert len(parsed) == 2
+    assert cache.misses == 2
+
+
+def test_import_cache_keyed_by_python_version(find_script, tmp_path, monkeypatch):
+    from scriptmerge import cache as cache_module
+
+    script_path: str = find_script("script_using_multi_import/hello")
+    cache = ImportCache(cache_dir=tmp_path)
+    _ = merge_py.script(script_path, import_cache=cache)
+    misses = cache.misses
+
+    # entries made by another version of Python, whose ast may differ, are not used.
+    monkeypatch.setattr(cache_module, "_PYTHON_TAG", "cpython-399")
+    cache = ImportCache(cache_dir=tmp_path)
+    _ = merge_py.script(script_path, import_cache=cache)
+    assert cache.hits == 0
+    assert cache.misses == misses
+
+    monkeypatch.undo()
+    cache = ImportCache(cache_dir=tmp_path)
+    _ = merge_py.script(script_path, import_cache=cache)
+    assert cache.misses == 0
+
+
+def test_import_cache_prune(tmp_path):
+    cache = ImportCache(cache_dir=tmp_path, max_size=300)
+    for i in range(10):
+        cache.set(f"{i:02d}" + "0" * 62, b"x" * 100)
+    removed = cache.prune()
+    assert removed == 7
+    remaining = [p for p in Path(cache.cache_dir).rglob("*") if p.is_file()]
+    assert len(remaining) == 3
+
+
+def test_cli_import_cache_stats(find_script, tmp_path):
+    script_path: str = find_script("script_using_multi_import/hello")
+    temp_file: Path = tmp_path / "hello.py"
+    cnd_args = [
+        "scriptmerge",
+        "compilepy",
+        script_path,
+        "-o",
+        str(temp_file),
+        "--cache-dir",
+        str(tmp_path / "cache"),
+        "-v",
+    ]
+    result = subprocess.run(cnd_args, capture_output=True, text=True)
+    assert temp_file.exists()
+    assert "import cache: 0 hits" in result.stderr
+
+    result = subprocess.run(cnd_args, capture_output=True, text=True)
+    assert "0 misses" in result.stderr
+
+    result = subprocess.run(cnd_args + ["--no-cache"], capture_output=True, text=True)
+    assert "import cache" not in result.stderr
@@ -0,0 +1,187 @@
+from __future__ import annotations
+import os
+import sysconfig
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py
+from scriptmerge.import_scanner import scan_imports, try_scan_imports
+from scriptmerge.merge_common import find_raw_imports
+from scriptmerge.source_store import SourceStore
+
+SOURCES = {
+    "plain": "import os\nimport a.b as c, d\nfrom x import y as z, w\n",
+    "relative": "from . import a\nfrom .. import b\nfrom ...pkg.mod import c\nfrom .... import d\nfrom . mod import *\n",
+    "parenthesized": "from pkg import (\n    a,\n    b as c,  # comment\n)\nfrom pkg import (d)\n",
+    "continuation": "import a, \\\n    b\nfrom c \\\n    import d\n",
+    "strings": 's = "import fake"\nt = """\nimport fake2\n"""\n# import fake3\nimport real\n',
+    "prefixed_strings": "x = rb'import a'\ny = f'{z!r} import'\nimport real\n",
+    "semicolons": "import a; import b\nx = 1; from c import d\n",
+    "nested": (
+        "import top\n"
+        "def f():\n"
+        "    import in_def\n"
+        "    class C:\n"
+        "        import in_class\n"
+        "import after\n"
+    ),
+    "try_chain": (
+        "try:\n"
+        "    import t_body\n"
+        "except ImportError:\n"
+        "    import t_handler\n"
+        "except (OSError, ValueError) as e:\n"
+        "    import t_handler2\n"
+        "else:\n"
+        "    import t_else\n"
+        "finally:\n"
+        "    import t_finally\n"
+        "import after\n"
+    ),
+    "if_chain": (
+        "if a:\n"
+        "    import i_body\n"
+        "elif b:\n"
+        "    import i_elif\n"
+        "elif c:\n"
+        "    if d:\n"
+        "        import i_nested\n"
+        "    import i_elif2\n"
+        "else:\n"
+        "    import i_else\n"
+    ),
+    "inline_suites": (
+        "if a: import x; import y\n"
+        "else: import z\n"
+        "try: import t\n"
+        "except ImportError: t = None\n"
+        "class K: import k\n"
+    ),
+    "loops": (
+        "for i in range(3):\n"
+        "    import f_body\n"
+        "else:\n"
+        "    import f_else\n"
+        "while x:\n"
+        "    import w_body\n"
+        "async def g():\n"
+        "    async with a as b:\n"
+        "        import aw\n"
+        "with open(p) as f, lock:\n"
+        "    import w\n"
+    ),
+    "headers_with_colons": (
+        "def f(x: int = {1: 2}[1], y=lambda: 3) -> 'T':\n"
+        "    import annotated\n"
+        "x: int = 3\n"
+        "for k in sorted(d, key=lambda v: v[1:2]):\n"
+        "    import sorted_loop\n"
+        "if (n := 10) > 5:\n"
+        "    import walrus\n"
+    ),
+    "decorators": "@decorator\ndef f():\n    import in_f\n@a.b(1)\nclass C:\n    pass\nimport x\n",
+    "yield_from": "def g():\n    yield from h()\n    raise E from None\nimport x\n",
+    "crlf": "import a\r\nif b:\r\n    import c\r\n",
+    "no_imports": "x = 1\n",
+    "empty": "",
+}
+
+
+@pytest.mark.parametrize("name", sorted(SOURCES))
+def test_matches_ast(name):
+    source = SOURCES[name].encode("utf-8")
+    expected = find_raw_imports(source, name)
+    assert try_scan_imports(source) == expected
+
+
+def test_encodings():
+    source = "# -*- coding: latin-1 -*-\ns = 'é'\nimport a\n".encode("latin-1")
+    assert try_scan_imports(source) == find_raw_imports(source, "latin")
+    source = b"\xef\xbb\xbfimport a\n"
+    assert try_scan_imports(source) == find_raw_imports(source, "bom")
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "match x:\n    case 1:\n        import a\n",
+        "if x:\n\timport a\n",
+        "import a\nfrom b import\n",
+        "x = (\nimport a\n",
+        "s = '''unterminated\nimport a\n",
+        "if x\n    import a\n",
+        "x = lambda: 1 if y else 2; import z\nif lambda: 0: import q\n",
+    ],
+)
+def test_ambiguous_sources_fall_back(source):
+    assert try_scan_imports(source.encode("utf-8")) is None
+
+
+def test_fallback_raises_syntax_error():
+    with pytest.raises(SyntaxError):
+        scan_imports(b"import a\nfrom b import\n", "bad.py")
+
+
+def _corpus():
+    stdlib = sysconfig.get_paths()["stdlib"]
+    paths = []
+    for root in (
+        os.path.join(stdlib, "email"),
+        os.path.join(stdlib, "asyncio"),
+        os.path.join(stdlib, "json"),
+        os.path.dirname(os.path.dirname(__file__)),
+    ):
+        for dir_path, dir_names, file_names in os.walk(root):
+            dir_names[:] = [d for d in dir_names if not d.startswith(".")]
+            paths.extend(
+                os.path.join(dir_path, f) for f in file_names if f.endswith(".py")
+            )
+    for name in ("typing.py", "argparse.py", "inspect.py", "subprocess.py"):
+        paths.append(os.path.join(stdlib, name))
+    return paths
+
+
+def test_corpus_matches_ast():
+    scanned = 0
+    for path in _corpus():
+        with open(path, "rb") as f:
+            source = f.read()
+        try:
+            expected = find_raw_imports(source, path)
+        except (SyntaxError, ValueError):
+            continue
+        result = try_scan_imports(source)
+        if result is not None:
+            scanned += 1
+            assert result == expected, path
+    assert scanned > 50
+
+
+@pytest.mark.parametrize(
+    "script_path",
+    [
+        "explicit_relative_import_from_parent_package/hello",
+        "imports_in_imported_modules/hello",
+        "script_using_from_to_import_multiple_modules/hello",
+        "circular_reference/hello",
+    ],
+)
+def test_script_output_identical(find_script, script_path):
+    path = find_script(script_path)
+    assert merge_py.script(path, import_scanner="tokens") == merge_py.script(path)
+    assert merge_py.script(path, import_scanner="tokens", jobs=2) == merge_py.script(path)
+
+
+def test_tokens_scanner_skips_parsing(tmp_path):
+    module = tmp_path / "big.py"
+    module.write_text("import os\nDATA = [\n" + "(1, 'a'),\n" * 1000 + "]\n")
+    store = SourceStore(import_scanner="tokens")
+    assert store.raw_imports(str(module)) == [("os", 0, [])]
+    assert store.parses == 0
+
+
+def test_unknown_scanner():
+    with pytest.raises(ValueError):
+        SourceStore(import_scanner="regex")
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import re
+import subprocess
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py
+from scriptmerge.module_filter import ModuleFilter
+
+NAMES = [
+    "greetings",
+    "greetings.english",
+    "greetingsx",
+    "greeting",
+    "vendor",
+    "vendor.six",
+    "vendor.six.moves",
+    "vendorized",
+    "pkg.vendor.six",
+    "Foo.bar",
+    "foo.bar",
+    "aa.aa",
+    "ab.ab",
+    "",
+]
+
+
+@pytest.mark.parametrize(
+    "patterns",
+    [
+        ["greetings*"],
+        ["greetings"],
+        ["greetings.*"],
+        ["vendor", "greeting.*", "^pkg\\."],
+        ["(?i)foo\\.bar"],
+        ["(?i)foo", "vendor\\.six$"],
+        ["(a)\\1\\.", "greet(ing)s"],
+        ["(?P<x>a)(?P=x)", "vendor"],
+        ["v.ndor\\.six\\..*", "^pkg", "(?i)FOO", "ab?\\.a"],
+    ],
+)
+def test_regex_patterns_match_re_match(patterns):
+    module_filter = ModuleFilter(patterns)
+    for name in NAMES:
+        expected = any(re.match(p, name) for p in patterns)
+        assert module_filter.is_excluded(name) == expected, name
+
+
+def test_prefix_pattern():
+    module_filter = ModuleFilter(["prefix:vendor"])
+    assert module_filter.is_excluded("vendor")
+    assert module_filter.is_excluded("vendor.six")
+    assert module_filter.is_excluded("vendor.six.moves")
+    assert not module_filter.is_excluded("vendorized")
+    assert not module_filter.is_excluded("pkg.vendor")
+
+
+def test_glob_pattern():
+    module_filter = ModuleFilter(["glob:vendor.*", "glob:*.tests", "glob:gr?etings"])
+    assert not module_filter.is_excluded("vendor")
+    assert module_filter.is_excluded("vendor.six")
+    assert module_filter.is_excluded("vendor.six.moves")
+    assert module_filter.is_excluded("pkg.tests")
+    assert not module_filter.is_excluded("pkg.tests.unit")
+    assert module_filter.is_excluded("greetings")
+    assert not module_filter.is_excluded("greetings.english")
+
+
+def test_decisions_memoized():
+    module_filter = ModuleFilter(["prefix:vendor", "^x\\d+"])
+    for _ in range(3):
+        module_filter.is_excluded("vendor.six")
+        module_filter.is_excluded("x12")
+        module_filter.is_excluded("other")
+    assert module_filter.lookups == 9
+    assert module_filter.memo_hits == 6
+    assert module_filter.fast_hits == 1
+    assert module_filter.short_circuited == 7
+
+
+def test_invalid_regex_raises():
+    with pytest.raises(re.error):
+        ModuleFilter(["[invalid"])
+
+
+def test_script_with_prefix_exclude(find_script):
+    result = merge_py.script(
+        find_script("imports_in_imported_modules/hello"),
+        exclude_python_modules=["prefix:greetings"],
+    )
+    assert "__scriptmerge_write_module('" not in result
+
+
+def test_script_with_module_filter(find_script):
+    module_filter = ModuleFilter(["glob:greetings.*"])
+    result = merge_py.script(
+        find_script("imports_in_imported_modules/hello"), module_filter=module_filter
+    )
+    assert "__scriptmerge_write_module('greetings/__init__.py'" in result
+    assert "greetings/english.py" not in result
+    assert module_filter.lookups > 0
+
+
+def test_cli_filter_stats(find_script, tmp_path):
+    temp_file = tmp_path / "hello.py"
+    cnd_args = [
+        "scriptmerge",
+        "compilepy",
+        find_script("script_using_multi_import/hello"),
+        "-o",
+        str(temp_file),
+        "-e",
+        "prefix:greetings",
+        "--no-cache",
+        "-v",
+    ]
+    result = subprocess.run(cnd_args, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "exclude filter:" in result.stderr
+    assert "short-circuited" in result.stderr
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import os
+import sys
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import module_finder
+from scriptmerge.module_finder import ModuleFinder
+
+
+def _exists_find(sys_path, module_name):
+    # the os.path.exists probing ModuleFinder replaces.
+    for path in sys_path:
+        for is_package in (True, False):
+            suffix = "/__init__.py" if is_package else ".py"
+            relative_path = module_name.replace(".", "/") + suffix
+            full_module_path = os.path.join(path, relative_path)
+            if os.path.exists(full_module_path):
+                return (full_module_path, relative_path, is_package)
+    return None
+
+
+@pytest.fixture
+def search_paths(tmp_path):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    (first / "pkg").mkdir(parents=True)
+    (first / "pkg" / "__init__.py").write_text("")
+    (first / "pkg" / "mod.py").write_text("")
+    (first / "nopkg").mkdir()
+    (first / "nopkg" / "inner.py").write_text("")
+    (first / "both.py").write_text("")
+    (second / "both").mkdir(parents=True)
+    (second / "both" / "__init__.py").write_text("")
+    (second / "pkg.py").write_text("")
+    (second / "only_second.py").write_text("")
+    (second / "same").mkdir()
+    (second / "same" / "__init__.py").write_text("")
+    (second / "same.py").write_text("")
+    return [str(first), str(second), str(tmp_path / "missing")]
+
+
+@pytest.mark.parametrize(
+    "module_name",
+    [
+        "pkg",
+        "pkg.mod",
+        "pkg.missing",
+        "nopkg",
+        "nopkg.inner",
+        "both",
+        "only_second",
+        "same",
+        "not_there",
+        "not_there.at_all",
+    ],
+)
+def test_matches_exists_probing(search_paths, module_name):
+    finder = ModuleFinder(search_paths)
+    assert finder.find(module_name) == _exists_find(search_paths, module_name)
+
+
+def test_first_path_wins(search_paths):
+    finder = ModuleFinder(search_paths)
+    full_path, relative_path, is_package = finder.find("both")
+    assert full_path.startswith(search_paths[0])
+    assert relative_path == "both.py"
+    assert is_package is False
+
+
+def test_package_wins_in_same_path(search_paths):
+    finder = ModuleFinder(search_paths)
+    _, relative_path, is_package = finder.find("same")
+    assert relative_path == "same/__init__.py"
+    assert is_package is True
+
+
+def test_directories_listed_once(search_paths, monkeypatch):
+    calls = []
+    real_scandir = os.scandir
+
+    def counting_scandir(path):
+        calls.append(path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(module_finder.os, "scandir", counting_scandir)
+    finder = ModuleFinder(search_paths)
+    for _ in range(3):
+        finder.find("pkg.mod")
+        finder.find("not_there")
+        finder.find("only_second")
+    assert len(calls) == len(set(calls))
+
+
+def test_matches_exists_probing_on_sys_path():
+    finder = ModuleFinder(sys.path)
+    for module_name in ("pytest", "_pytest.config", "scriptmerge.main", "no_such_mod"):
+        assert finder.find(module_name) == _exists_find(sys.path, module_name)
+
+
+def test_extension_modules(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("")
+    (tmp_path / "pkg" / "fast.cpython-311-x86_64-linux-gnu.so").write_bytes(b"")
+    (tmp_path / "pkg" / "both.abi3.so").write_bytes(b"")
+    (tmp_path / "pkg" / "both.py").write_text("")
+    suffixes = [".cpython-311-x86_64-linux-gnu.so", ".abi3.so", ".so"]
+    finder = ModuleFinder([str(tmp_path)], suffixes)
+    full_path, relative_path, is_package = finder.find("pkg.fast")
+    assert relative_path == "pkg/fast.cpython-311-x86_64-linux-gnu.so"
+    assert full_path == os.path.join(str(tmp_path), relative_path)
+    assert is_package is False
+    # the source is bundled portably
+    assert finder.find("pkg.both")[1] == "pkg/both.py"
+    # without suffixes, only sources
+    assert ModuleFinder([str(tmp_path)]).find("pkg.fast") is None
@@ -0,0 +1,85 @@
+from __future__ import annotations
+import io
+import os
+import subprocess
+import zipfile
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge.module_graph import ModuleGraph, resolve_module_graph
+
+
+def _entries(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return [(name, zf.read(name)) for name in zf.namelist()]
+
+
+def test_graph_modules_and_edges(find_script):
+    graph = resolve_module_graph(find_script("imports_in_imported_modules/hello"))
+    assert list(graph.modules) == ["greetings", "greetings.english"]
+    assert graph.imports[ModuleGraph.ENTRY] == ("greetings",)
+    assert "greetings.english" in graph.imports["greetings"]
+    assert "greetings" in graph
+    assert len(graph) == 2
+
+
+def test_graph_is_immutable(find_script):
+    graph = resolve_module_graph(find_script("implicit_init_import/hello"))
+    with pytest.raises(TypeError):
+        graph.modules["other"] = None
+    with pytest.raises(TypeError):
+        graph.imports[ModuleGraph.ENTRY] = ()
+
+
+@pytest.mark.parametrize(
+    "script_path",
+    [
+        "explicit_relative_import/hello",
+        "imports_in_imported_modules/hello",
+        "circular_reference/hello",
+    ],
+)
+@pytest.mark.parametrize("clean", [False, True])
+def test_shared_graph_matches_separate_builds(find_script, script_path, clean):
+    path = find_script(script_path)
+    graph = resolve_module_graph(path, clean=clean)
+    assert merge_py.script(path, clean=clean, module_graph=graph) == merge_py.script(
+        path, clean=clean
+    )
+    assert _entries(merge_pyz.script(path, clean=clean, module_graph=graph)) == _entries(
+        merge_pyz.script(path, clean=clean)
+    )
+
+
+def test_shared_graph_reads_each_module_once(find_script):
+    path = find_script("imports_in_imported_modules/hello")
+    graph = resolve_module_graph(path)
+    merge_py.script(path, module_graph=graph)
+    merge_pyz.script(path, module_graph=graph)
+    # the entry script and each module
+    assert graph.sources.reads == len(graph) + 1
+    assert graph.sources.parses == len(graph) + 1
+
+
+def test_compileboth_cli(find_script, tmp_path):
+    out_base = tmp_path / "hello"
+    cnd_args = [
+        "scriptmerge",
+        "compileboth",
+        find_script("imports_in_imported_modules/hello"),
+        "-o",
+        str(out_base) + ".py",
+        "--no-cache",
+    ]
+    result = subprocess.run(cnd_args, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert os.path.isfile(str(out_base) + ".py")
+    assert os.path.isfile(str(out_base) + ".pyz")
+    for suffix in (".py", ".pyz"):
+        output = subprocess.run(
+            ["python", str(out_base) + suffix], capture_output=True, text=True
+        )
+        assert output.stdout == "Hello\n"
@@ -0,0 +1,84 @@
+from __future__ import annotations
+import io
+import zipfile
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge.cache import ImportCache
+
+SCRIPTS = [
+    "explicit_relative_import/hello",
+    "explicit_relative_import_from_parent_package/hello",
+    "implicit_init_import/hello",
+    "imports_in_imported_modules/hello",
+    "script_using_from_to_import_multiple_modules/hello",
+    "script_using_multi_import/hello",
+    "circular_reference/hello",
+]
+
+
+@pytest.fixture
+def synthetic_graph(tmp_path):
+    # a package with fan out, shared modules and relative imports.
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("from . import m0\n")
+    for i in range(30):
+        lines = [f"from . import m{(i * 7 + j) % 30}\n" for j in range(1, 4)]
+        lines.append("import json\n")
+        lines.append(f"VALUE = {i}\n")
+        (pkg / f"m{i}.py").write_text("".join(lines))
+    script = tmp_path / "main.py"
+    script.write_text("import pkg\nprint(pkg.m0.VALUE)\n")
+    return str(script)
+
+
+@pytest.mark.parametrize("script_path", SCRIPTS)
+def test_parallel_py_output_identical(find_script, script_path):
+    serial = merge_py.script(find_script(script_path))
+    parallel = merge_py.script(find_script(script_path), jobs=3)
+    assert serial == parallel
+
+
+@pytest.mark.parametrize("script_path", SCRIPTS)
+def test_parallel_pyz_modules_identical(find_script, script_path):
+    def entries(data: bytes):
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            return [(name, zf.read(name)) for name in zf.namelist()]
+
+    serial = merge_pyz.script(find_script(script_path))
+    parallel = merge_pyz.script(find_script(script_path), jobs=3)
+    assert entries(serial) == entries(parallel)
+
+
+def test_parallel_synthetic_graph(synthetic_graph, tmp_path):
+    serial = merge_py.script(synthetic_graph)
+    parallel = merge_py.script(synthetic_graph, jobs=4)
+    assert serial == parallel
+    assert serial.count("__scriptmerge_write_module('") == 31
+
+
+def test_parallel_with_import_cache(synthetic_graph, tmp_path):
+    serial = merge_py.script(synthetic_graph)
+    cache = ImportCache(cache_dir=tmp_path / "cache")
+    first = merge_py.script(synthetic_graph, jobs=4, import_cache=cache)
+    assert cache.misses == 32
+    cache = ImportCache(cache_dir=tmp_path / "cache")
+    second = merge_py.script(synthetic_graph, jobs=4, import_cache=cache)
+    assert cache.hits == 32
+    assert cache.misses == 0
+    assert serial == first == second
+
+
+
+def test_process_pool_does_not_fork(monkeypatch):
+    from scriptmerge import parallel
+
+    # a forked worker would see the attribute set in this process only.
+    monkeypatch.setattr(parallel, "_FORKED", True, raising=False)
+    check = "getattr(__import__('sys').modules.get('scriptmerge.parallel'), '_FORKED', False)"
+    with parallel.process_pool(2) as pool:
+        assert pool.submit(eval, check).result() is False
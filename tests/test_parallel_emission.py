@@ -0,0 +1,105 @@
+from __future__ import annotations
+import io
+import zipfile
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge import source_store
+from scriptmerge.cache import ArtifactCache
+from scriptmerge.source_store import SourceStore
+from scriptmerge.transforms import TransformPipeline
+
+
+@pytest.fixture
+def documented_package(tmp_path):
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text(
+        '"""Package."""\n' + "".join(f"from . import m{i}\n" for i in range(12))
+    )
+    for i in range(12):
+        (pkg / f"m{i}.py").write_text(
+            f'"""Module {i}."""\n'
+            "# comment\n"
+            f"def value(x: int = {i}) -> int:\n"
+            '    """Doc."""\n'
+            "    return x  # the value\n"
+        )
+    script = tmp_path / "main.py"
+    script.write_text("import pkg\nprint(pkg.m3.value())\n")
+    return tmp_path
+
+
+def _entries(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return [(name, zf.read(name)) for name in zf.namelist()]
+
+
+@pytest.mark.parametrize("transforms", [None, ["strip-annotations"]])
+def test_parallel_clean_identical(documented_package, transforms):
+    script = str(documented_package / "main.py")
+    serial = merge_py.script(script, clean=True, transforms=transforms)
+    parallel = merge_py.script(script, clean=True, transforms=transforms, jobs=3)
+    assert serial == parallel
+    serial = merge_pyz.script(script, clean=True, transforms=transforms)
+    parallel = merge_pyz.script(script, clean=True, transforms=transforms, jobs=3)
+    assert _entries(serial) == _entries(parallel)
+
+
+def test_parallel_transform_timings(documented_package):
+    script = str(documented_package / "main.py")
+    pipeline = TransformPipeline(["strip-annotations", "clean"])
+    merge_pyz.script(script, transforms=pipeline, jobs=2)
+    assert pipeline.modules == 13
+    assert pipeline.timings["clean"] > 0.0
+
+
+def test_parallel_uses_artifact_cache(documented_package, tmp_path):
+    script = str(documented_package / "main.py")
+    cache = ArtifactCache(cache_dir=tmp_path / "cache")
+    first = merge_py.script(script, clean=True, artifact_cache=cache, jobs=2)
+    assert cache.stats == {"hits": 0, "misses": 13}
+
+    cache = ArtifactCache(cache_dir=tmp_path / "cache")
+    pipeline = TransformPipeline(["clean"])
+    second = merge_py.script(script, transforms=pipeline, artifact_cache=cache, jobs=2)
+    assert cache.stats == {"hits": 13, "misses": 0}
+    # every module was a hit, nothing ran in the pool.
+    assert pipeline.modules == 0
+    assert first == second
+
+
+def test_parallel_read_ahead_is_bounded(documented_package, monkeypatch):
+    # counts the modules transformed but not yet consumed.
+    in_flight = []
+    submit_counts = []
+    real_worker = source_store.transform_worker
+
+    class InlinePool:
+        def __init__(self, max_workers):
+            pass
+
+        def submit(self, fn, item):
+            from concurrent.futures import Future
+
+            in_flight.append(item)
+            submit_counts.append(len(in_flight))
+            future = Future()
+            future.set_result(real_worker(item))
+            return future
+
+        def shutdown(self):
+            pass
+
+    monkeypatch.setattr(source_store, "process_pool", InlinePool)
+    store = SourceStore()
+    paths = sorted(str(path) for path in (documented_package / "pkg").glob("*.py"))
+    results = []
+    for path, data in store.iter_contents(((path, True) for path in paths), jobs=2):
+        in_flight.pop(0)
+        results.append((path, data))
+    assert max(submit_counts) == 5
+    assert results == [(path, SourceStore().contents(path, True)) for path in paths]
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import inspect
+import io
+import tokenize
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge.merge_common import remove_comments_and_doc_strings
+
+KEPT_COMMENTS = "x = 1\n#!keep me?\ny = 2  #!inline\n"
+
+
+def _baseline_remove_comments_and_doc_strings(source: str) -> str:
+    # the cleaner before it wrote to a single buffer, the output must stay the same.
+    io_obj = io.StringIO(source)
+    out = ""
+    prev_toktype = tokenize.INDENT
+    last_lineno = -1
+    last_col = 0
+    i = 0
+
+    for tok in tokenize.generate_tokens(io_obj.readline):
+        token_type = tok[0]
+        token_string = tok[1]
+        start_line, start_col = tok[2]
+        end_line, end_col = tok[3]
+        if start_line > last_lineno:
+            last_col = 0
+        if start_col > last_col:
+            out += " " * (start_col - last_col)
+        if token_type == tokenize.COMMENT:
+            if i > 0:
+                pass
+            else:
+                if token_string.startswith("#!"):
+                    out += token_string
+        elif token_type == tokenize.STRING:
+            if prev_toktype != tokenize.INDENT:
+                if prev_toktype != tokenize.NEWLINE:
+                    if start_col > 0:
+                        out += token_string
+        else:
+            out += token_string
+        prev_toktype = token_type
+        last_col = end_col
+        last_lineno = end_line
+
+    result = out.strip()
+    if len(result) > 0:
+        lines = [line for line in result.splitlines() if line.strip() != ""]
+        lines.append("")
+        result = "\n".join(lines)
+    return result
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("", ""),
+        ("# only a comment\n", ""),
+        ("#!/usr/bin/env python3\n# comment\nx = 1\n", "#!/usr/bin/env python3\nx = 1\n"),
+        ("x = 1\n#!not a shebang\n", "x = 1\n#!not a shebang\n"),
+        ('"""Module."""\nimport os\n', "import os\n"),
+        (
+            'def f():\n    """Doc."""\n    return 1\n',
+            "def f():\n    return 1\n",
+        ),
+        (
+            'class A:\n    "Doc."\n\n\n    x = [\n        "kept",\n    ]\n',
+            'class A:\n    x = [\n        "kept",\n    ]\n',
+        ),
+        ('s = ("a"\n     "b")\n', 's = ("a"\n     "b")\n'),
+        ("x = 1  # trailing\ny = 2\n", "x = 1  \ny = 2\n"),
+        ("if x:\n\ty = 1\nz = 2\n", "if x:\n\ty = 1\nz = 2\n"),
+        ("x = 1 + \\\n    2\n", "x = 1 +    2\n"),
+        ('def f():\n    x = 1\n    """not first, still removed"""\n', "def f():\n    x = 1\n"),
+    ],
+)
+def test_remove_comments_and_doc_strings(source: str, expected: str) -> None:
+    assert remove_comments_and_doc_strings(source) == expected
+
+
+def test_large_source() -> None:
+    # each copy is cleaned the same no matter how large the source is.
+    block = 'def f{i}():\n    """Doc {i}."""\n    # comment\n    return {i}  # value\n\n'
+    source = "".join(block.format(i=i) for i in range(20_000))
+    expected = "".join(f"def f{i}():\n    return {i}  \n" for i in range(20_000))
+    # the result is stripped, the last line loses its trailing spaces.
+    expected = expected.rstrip() + "\n"
+    assert remove_comments_and_doc_strings(source) == expected
+
+
+@pytest.mark.parametrize("source", [KEPT_COMMENTS, "#!/usr/bin/env python3\n#!again\nx = 1\n"])
+def test_matches_baseline(source: str) -> None:
+    # every comment starting with "#!" is kept, not only a leading shebang.
+    expected = _baseline_remove_comments_and_doc_strings(source)
+    assert remove_comments_and_doc_strings(source) == expected
+    assert expected == source
+
+
+def test_matches_baseline_on_stdlib() -> None:
+    for module in (inspect, tokenize):
+        with open(module.__file__, encoding="utf-8") as f:
+            source = f.read()
+        expected = _baseline_remove_comments_and_doc_strings(source)
+        assert remove_comments_and_doc_strings(source) == expected
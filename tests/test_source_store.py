@@ -0,0 +1,117 @@
+from __future__ import annotations
+import builtins
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge import merge_common
+from scriptmerge.source_store import SourceStore
+
+
+@pytest.fixture
+def count_opens(monkeypatch, tmp_path):
+    # counts opens of the files under the project written by the fixture.
+    opened = []
+    real_open = builtins.open
+
+    def counting_open(file, *args, **kwargs):
+        if str(file).startswith(str(tmp_path / "src")):
+            opened.append(str(file))
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", counting_open)
+    return opened
+
+
+@pytest.fixture
+def project(tmp_path):
+    src = tmp_path / "src"
+    pkg = src / "pkg"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text('"""Package."""\nfrom . import a\n')
+    (pkg / "a.py").write_text("# comment\nfrom . import b\nVALUE = 'a'\n")
+    (pkg / "b.py").write_text("from pkg import a\r\nVALUE = 'b'\r\n")
+    script = src / "main.py"
+    script.write_text("#!/usr/bin/env python3\nimport pkg\nprint(pkg.a.VALUE)\n")
+    return str(script)
+
+
+@pytest.mark.parametrize("clean", [False, True])
+@pytest.mark.parametrize("merge", [merge_py, merge_pyz])
+def test_each_file_opened_once(project, count_opens, merge, clean):
+    merge.script(project, clean=clean, copy_shebang=True)
+    assert len(count_opens) == 4
+    assert len(set(count_opens)) == 4
+
+
+@pytest.mark.parametrize("clean", [False, True])
+def test_output_matches_direct_reads(project, clean):
+    # the store must give the same bytes and text as reading the files directly.
+    store = SourceStore()
+    for name in ("pkg/__init__.py", "pkg/a.py", "pkg/b.py", "main.py"):
+        path = project.replace("main.py", name)
+        assert store.read(path) == merge_common.read_bin_file(path)
+        assert store.text(path) == merge_common.read_str_file(path)
+        if clean:
+            expected = merge_common.remove_comments_and_doc_strings(
+                merge_common.read_str_file(path)
+            ).encode("utf-8")
+        else:
+            expected = merge_common.read_bin_file(path)
+        assert store.contents(path, clean) == expected
+        assert store.raw_imports(path) == merge_common.find_raw_imports(
+            merge_common.read_bin_file(path), path
+        )
+    assert store.reads == 4
+    assert store.parses == 4
+
+
+def test_release(project):
+    store = SourceStore()
+    store.raw_imports(project)
+    assert project in store
+    store.release(project)
+    assert project not in store
+    store.read(project)
+    assert store.reads == 2
+
+
+@pytest.fixture
+def wide_project(tmp_path):
+    src = tmp_path / "wide"
+    pkg = src / "pkg"
+    pkg.mkdir(parents=True)
+    names = [f"m{i}" for i in range(20)]
+    (pkg / "__init__.py").write_text("".join(f"from . import {name}\n" for name in names))
+    for name in names:
+        (pkg / f"{name}.py").write_text(f"# {name}\nVALUE = {'x' * 10_000!r}\n")
+    script = src / "main.py"
+    script.write_text("import pkg\nprint(len(pkg.m0.VALUE))\n")
+    return str(script)
+
+
+@pytest.mark.parametrize("skip_unchanged", [False, True])
+@pytest.mark.parametrize("clean", [False, True])
+@pytest.mark.parametrize("merge, name", [(merge_py, "out.py"), (merge_pyz, "out.pyz")])
+def test_script_to_holds_one_buffer(
+    wide_project, tmp_path, monkeypatch, merge, name, clean, skip_unchanged
+):
+    # every module is read again when it is written, the store never holds the whole tree.
+    held = []
+    contents = SourceStore.contents
+
+    def counting_contents(self, path, clean):
+        held.append(self.buffers)
+        return contents(self, path, clean)
+
+    monkeypatch.setattr(SourceStore, "contents", counting_contents)
+    merge.script_to(tmp_path / name, wide_project, clean=clean, skip_unchanged=skip_unchanged)
+    assert len(held) == 21
+    # the entry script, and the module before the one being read.
+    assert max(held) <= 2
+
+    held.clear()
+    merge.script(wide_project, clean=clean)
+    assert max(held) == 22
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import sys
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, module_finder
+from scriptmerge.module_graph import read_python_version_from_python_bin
+from scriptmerge.stdlib import is_stdlib_module, stdlib_module_names
+from scriptmerge.stdlib_names import VERSION_NAMES
+
+
+@pytest.mark.parametrize(
+    "module_name",
+    [
+        "json",
+        "logging",
+        "logging.handlers",
+        "os.path",
+        "concurrent.futures",
+        "email.mime.text",
+        "xml.etree.ElementTree",
+        "importlib.metadata",
+        "__future__",
+    ],
+)
+def test_modern_stdlib_modules(module_name):
+    assert is_stdlib_module(module_name)
+
+
+@pytest.mark.parametrize(
+    "module_name", ["StringIO", "sets", "mutex", "greetings", "test_json", "jsonx"]
+)
+def test_not_stdlib_modules(module_name):
+    assert not is_stdlib_module(module_name)
+
+
+@pytest.mark.parametrize(
+    "module_name, stdlib_in, not_in",
+    [
+        ("tomllib", (3, 11), (3, 10)),
+        ("distutils", (3, 11), (3, 12)),
+        ("asynchat", (3, 11), (3, 12)),
+        ("zoneinfo", (3, 9), (3, 8)),
+        ("dummy_threading", (3, 8), (3, 9)),
+    ],
+)
+def test_version_aware(module_name, stdlib_in, not_in):
+    assert is_stdlib_module(module_name, stdlib_in)
+    assert not is_stdlib_module(module_name, not_in)
+
+
+def test_versions_outside_tables_use_nearest():
+    assert stdlib_module_names((3, 7)) == stdlib_module_names((3, 8))
+    newest = max(VERSION_NAMES)
+    assert stdlib_module_names((3, 99)) == stdlib_module_names(newest)
+
+
+@pytest.mark.skipif(
+    not hasattr(sys, "stdlib_module_names"), reason="needs sys.stdlib_module_names"
+)
+def test_table_matches_running_interpreter():
+    version = sys.version_info[:2]
+    if version not in VERSION_NAMES:
+        pytest.skip("no table for this version")
+    from scriptmerge.stdlib_names import COMMON_NAMES
+
+    assert COMMON_NAMES | VERSION_NAMES[version] == frozenset(sys.stdlib_module_names)
+
+
+def test_read_python_version_from_python_bin():
+    assert read_python_version_from_python_bin(None) is None
+    assert read_python_version_from_python_bin(sys.executable) == sys.version_info[:2]
+
+
+def test_stdlib_imports_are_not_searched(tmp_path, monkeypatch):
+    found = []
+    real_find = module_finder.ModuleFinder.find
+
+    def counting_find(self, module_name):
+        found.append(module_name)
+        return real_find(self, module_name)
+
+    monkeypatch.setattr(module_finder.ModuleFinder, "find", counting_find)
+    script = tmp_path / "main.py"
+    script.write_text(
+        "import json\nimport logging.handlers\nimport xml.etree.ElementTree\n"
+        "from concurrent import futures\nimport local_mod\n"
+    )
+    (tmp_path / "local_mod.py").write_text("from email.mime import text\n")
+    output = merge_py.script(str(script))
+    assert found == ["local_mod"]
+    assert "__scriptmerge_write_module('local_mod.py'" in output
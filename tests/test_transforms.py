@@ -0,0 +1,207 @@
+from __future__ import annotations
+import glob
+import inspect
+import os
+import subprocess
+import sys
+import tokenize
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge import merge_py, merge_pyz
+from scriptmerge import transforms
+from scriptmerge.cache import ArtifactCache
+from scriptmerge.merge_common import remove_comments_and_doc_strings
+from scriptmerge.transforms import (
+    CleanStage,
+    ParsedModule,
+    TransformPipeline,
+    TransformStage,
+    build_pipeline,
+    register_transform,
+)
+from test_scripts import root as test_script_root
+
+ANNOTATED = '''"""Module."""
+from typing import Dict
+
+
+def f(a: int, b: "str" = "x", *args: int, c: Dict[
+        str, int] = None, **kw: (int)) -> Dict[str, int]:  # keep
+    x: int = 1
+    y: int
+    return {"é": x}
+
+
+class A:
+    z: int = 3
+
+    async def m(self, q: "A") -> None:
+        w: list = []
+'''
+
+
+def _sources():
+    paths = [
+        path
+        for path in glob.glob(os.path.join(test_script_root, "**", "*"), recursive=True)
+        if os.path.isfile(path) and not path.endswith((".pyc", ".so"))
+    ]
+    paths += [inspect.__file__, tokenize.__file__]
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            yield f.read()
+
+
+def test_clean_stage_matches_remove_comments_and_doc_strings():
+    # the stage, run on the shared parse, gives the same output as the function.
+    for source in _sources():
+        module = ParsedModule(source)
+        CleanStage().apply(module)
+        assert module.render() == remove_comments_and_doc_strings(source)
+
+
+def test_clean_keeps_shebang_comments():
+    # as remove_comments_and_doc_strings(), every comment starting with "#!" is kept.
+    source = "x = 1\n#!keep me?\ny = 2  #!inline\n"
+    assert TransformPipeline([transforms.TRANSFORM_CLEAN]).run(source) == source
+    module = ParsedModule(source)
+    CleanStage().apply(module)
+    assert module.render() == source
+
+
+def test_strip_annotations():
+    result = TransformPipeline(["strip-annotations"]).run(ANNOTATED)
+    assert result == '''"""Module."""
+from typing import Dict
+
+
+def f(a, b = "x", *args, c = None, **kw):  # keep
+    x = 1
+    y: int
+    return {"é": x}
+
+
+class A:
+    z: int = 3
+
+    async def m(self, q):
+        w = []
+'''
+
+
+def test_strip_annotations_and_clean():
+    result = TransformPipeline(["strip-annotations", "clean"]).run(ANNOTATED)
+    # the spaces before the comment are kept, as remove_comments_and_doc_strings() does.
+    assert result == '''from typing import Dict
+def f(a, b = "x", *args, c = None, **kw):  
+    x = 1
+    y: int
+    return {"é": x}
+class A:
+    z: int = 3
+    async def m(self, q):
+        w = []
+'''
+
+
+def test_stages_share_one_parse(monkeypatch):
+    calls = []
+    generate_tokens = tokenize.generate_tokens
+
+    def counting_generate_tokens(readline):
+        calls.append(readline)
+        return generate_tokens(readline)
+
+    monkeypatch.setattr(transforms.tokenize, "generate_tokens", counting_generate_tokens)
+    pipeline = TransformPipeline(["strip-annotations", "clean"])
+    pipeline.run(ANNOTATED)
+    assert len(calls) == 1
+    assert set(pipeline.timings) == {"tokenize", "parse", "strip-annotations", "clean", "render"}
+    assert pipeline.modules == 1
+
+
+def test_pipeline_config():
+    pipeline = TransformPipeline(["strip-annotations", "clean", "clean"])
+    assert len(pipeline) == 2
+    assert "clean" in pipeline
+    assert pipeline.config == "strip-annotations:1+clean:1"
+    assert build_pipeline(False) is None
+    assert build_pipeline(True).config == "clean:1"
+    assert build_pipeline(True, ["strip-annotations"]).config == "strip-annotations:1+clean:1"
+    assert build_pipeline(True, pipeline) is pipeline
+    with pytest.raises(ValueError):
+        TransformPipeline(["minify"])
+
+
+def test_register_transform(monkeypatch):
+    monkeypatch.setattr(transforms, "TRANSFORMS", dict(transforms.TRANSFORMS))
+
+    @register_transform
+    class DropPass(TransformStage):
+        name = "drop-pass"
+
+        def apply(self, module: ParsedModule) -> None:
+            for index, token in enumerate(module.tokens):
+                if token.string == "pass":
+                    module.drop(index, with_space=True)
+
+    assert TransformPipeline(["drop-pass"]).run("x = 1; pass\n") == "x = 1;\n"
+    with pytest.raises(ValueError):
+        register_transform(type("Nameless", (TransformStage,), {}))
+
+
+def test_artifact_cache_keyed_by_pipeline(tmp_path):
+    script = tmp_path / "main.py"
+    (tmp_path / "annotated.py").write_text(ANNOTATED, encoding="utf-8")
+    script.write_text("import annotated\nprint(annotated.f(1))\n", encoding="utf-8")
+    cache = ArtifactCache(cache_dir=tmp_path / "cache")
+    cleaned = merge_pyz.script(str(script), clean=True, artifact_cache=cache)
+    stripped = merge_pyz.script(
+        str(script), clean=True, transforms=["strip-annotations"], artifact_cache=cache
+    )
+    assert cache.stats == {"hits": 0, "misses": 2}
+    assert cleaned != stripped
+
+
+@pytest.mark.parametrize("merge", [merge_py, merge_pyz])
+def test_script_with_transforms(tmp_path, merge):
+    (tmp_path / "annotated.py").write_text(ANNOTATED, encoding="utf-8")
+    script = tmp_path / "main.py"
+    script.write_text(
+        "import annotated\n"
+        "print(annotated.f(1), annotated.f.__annotations__)\n",
+        encoding="utf-8",
+    )
+    output = tmp_path / ("out.pyz" if merge is merge_pyz else "out.py")
+    pipeline = TransformPipeline(["strip-annotations"])
+    merge.script_to(str(output), str(script), transforms=pipeline)
+    assert pipeline.modules == 1
+    result = subprocess.run([sys.executable, str(output)], capture_output=True, text=True)
+    assert result.stdout == "{'é': 1} {}\n"
+
+
+def test_cli_transform(find_script, tmp_path):
+    script_path: str = find_script("script_using_multi_import/hello")
+    temp_file = tmp_path / "hello.pyz"
+    result = subprocess.run(
+        [
+            "scriptmerge",
+            "compilepyz",
+            script_path,
+            "-o",
+            str(temp_file),
+            "--transform",
+            "strip-annotations",
+            "--clean",
+            "--no-cache",
+            "-v",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert temp_file.exists()
+    assert "transforms: " in result.stderr
+    assert "strip-annotations" in result.stderr
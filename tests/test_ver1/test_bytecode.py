@@ -0,0 +1,79 @@
+from __future__ import annotations
+from pathlib import Path
+import importlib.util
+import marshal
+import subprocess
+import sys
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+from scriptmerge.bytecode import _compile_with_binary, compile_bytecode
+from scriptmerge.merge_py import script
+
+
+def test_compile_bytecode_keys() -> None:
+    result = compile_bytecode([("m.py", b"x = 1\n")], [None, sys.executable], optimize=2)
+    assert list(result["m.py"]) == [(importlib.util.MAGIC_NUMBER, 2)]
+    code = marshal.loads(result["m.py"][(importlib.util.MAGIC_NUMBER, 2)])
+    assert code.co_filename == "m.py"
+
+
+def test_compile_bytecode_skips_invalid_source() -> None:
+    result = compile_bytecode([("bad.py", b"def (:\n"), ("ok.py", b"pass\n")])
+    assert result["bad.py"] == {}
+    assert len(result["ok.py"]) == 1
+
+
+def test_compile_bytecode_invalid_optimize() -> None:
+    with pytest.raises(ValueError):
+        compile_bytecode([("m.py", b"pass\n")], optimize=3)
+
+
+def test_compile_with_binary_matches_in_process() -> None:
+    items = [("m.py", b"x = [i for i in range(3)]\n")]
+    magic, codes = _compile_with_binary(sys.executable, items, 0)
+    assert magic == importlib.util.MAGIC_NUMBER
+    expected = compile_bytecode(items)["m.py"][(magic, 0)]
+    assert marshal.loads(codes[0]) == marshal.loads(expected)
+
+
+@pytest.mark.parametrize("prelude_mode", ["tempdir", "memory"])
+def test_bytecode_is_used_and_source_is_the_fallback(
+    find_script, tmp_path: Path, prelude_mode: str
+) -> None:
+    output = script(
+        find_script("script_with_single_local_import/hello"),
+        bytecode_targets=[None],
+        prelude_mode=prelude_mode,
+    )
+    assert "__scriptmerge_write_module('greeting.py', b'message = \"Hello\"\\n', {(" in output
+    # change the embedded source only, the bytecode still says Hello.
+    output = output.replace("b'message = \"Hello\"\\n'", "b'message = \"Source\"\\n'")
+    bundle = tmp_path / "bundle.py"
+    bundle.write_text(output, encoding="utf-8")
+
+    result = subprocess.run([sys.executable, str(bundle)], capture_output=True, check=True)
+    assert result.stdout.strip() == b"Hello"
+    # the bytecode is for optimization level 0, -O runs the source.
+    result = subprocess.run([sys.executable, "-O", str(bundle)], capture_output=True, check=True)
+    assert result.stdout.strip() == b"Source"
+
+
+def test_cli_bytecode(find_script, tmp_path: Path) -> None:
+    temp_file = tmp_path / "hello.py"
+    cmd_args = [
+        "scriptmerge",
+        "compilepy",
+        find_script("script_with_single_local_import/hello"),
+        "-o",
+        str(temp_file),
+        "--bytecode",
+        "--bytecode-optimize",
+        "1",
+    ]
+    subprocess.run(cmd_args, check=True)
+    assert repr((importlib.util.MAGIC_NUMBER, 1)) in temp_file.read_text(encoding="utf-8")
+    result = subprocess.run([sys.executable, "-O", str(temp_file)], capture_output=True)
+    assert result.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
@@ -0,0 +1,79 @@
+from __future__ import annotations
+from pathlib import Path
+import os
+import shutil
+import subprocess
+import sys
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+import _bisect
+
+from scriptmerge.merge_py import script
+from scriptmerge.payload import PayloadEncoder
+
+pytestmark = pytest.mark.skipif(
+    getattr(_bisect, "__file__", None) is None, reason="_bisect is built in"
+)
+
+_SCRIPT = """from fastpkg import _bisect
+print(_bisect.bisect_right([1, 2, 3], 2), os.path.basename(os.path.dirname(_bisect.__file__)))
+"""
+
+
+@pytest.fixture
+def extension_script(tmp_path: Path) -> Path:
+    # a copy of a stdlib extension module, in a package of its own
+    package = tmp_path / "src" / "fastpkg"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    shutil.copy(_bisect.__file__, package)
+    hello = tmp_path / "src" / "hello"
+    hello.write_text("import os\n" + _SCRIPT)
+    return hello
+
+
+def _run(bundle: Path, cache_dir: Path) -> bytes:
+    env = dict(os.environ)
+    env["SCRIPTMERGE_EXTENSION_CACHE"] = str(cache_dir)
+    result = subprocess.run(
+        [sys.executable, str(bundle)], capture_output=True, env=env, cwd=str(bundle.parent)
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+@pytest.mark.parametrize("prelude_mode", ["tempdir", "memory", "cache"])
+def test_extension_module_is_bundled(extension_script: Path, tmp_path: Path, prelude_mode: str) -> None:
+    output = script(
+        str(extension_script), prelude_mode=prelude_mode, payload=PayloadEncoder("zlib")
+    )
+    assert "__scriptmerge_add_extension('fastpkg._bisect', 'fastpkg/_bisect." in output
+    bundle = tmp_path / "bundle.py"
+    bundle.write_text(output, encoding="utf-8")
+    shutil.rmtree(extension_script.parent)
+
+    cache_dir = tmp_path / "cache"
+    out = _run(bundle, cache_dir)
+    (key,) = os.listdir(cache_dir)
+    assert out == f"2 {key}".encode()
+    # extracted once
+    extension = next((cache_dir / key).iterdir())
+    inode = extension.stat().st_ino
+    assert _run(bundle, cache_dir) == out
+    assert extension.stat().st_ino == inode
+
+
+def test_extension_module_without_cache(extension_script: Path, tmp_path: Path) -> None:
+    bundle = tmp_path / "bundle.py"
+    bundle.write_text(script(str(extension_script)), encoding="utf-8")
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("")
+    assert _run(bundle, not_a_dir / "cache").startswith(b"2 ")
+
+
+def test_no_loader_without_extension_modules(find_script) -> None:
+    output = script(find_script("script_using_module_in_package/hello"))
+    assert "__scriptmerge_add_extension" not in output
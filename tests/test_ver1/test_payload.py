@@ -0,0 +1,94 @@
+from __future__ import annotations
+from pathlib import Path
+import re
+import subprocess
+import sys
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+from scriptmerge.merge_py import script
+from scriptmerge.payload import PayloadEncoder
+
+_ENCODERS = [
+    PayloadEncoder("zlib"),
+    PayloadEncoder("zlib", level=1, alphabet="base64"),
+    PayloadEncoder("lzma", level=9),
+    PayloadEncoder("lzma", alphabet="base64"),
+]
+
+
+@pytest.mark.parametrize("encoder", _ENCODERS, ids=repr)
+def test_payload_round_trip(encoder: PayloadEncoder) -> None:
+    data = "naïve café — \\ ' \"\n".encode("utf-8") * 100
+    encoded = encoder.encode(data)
+    assert len(encoded) < len(repr(data))
+    assert b"\\" not in encoded and b"'" not in encoded
+    assert encoder.decode(encoded) == data
+
+
+def test_payload_repr_is_unchanged(get_script_str) -> None:
+    plain = get_script_str("script_using_module_in_package/hello")
+    assert get_script_str("script_using_module_in_package/hello", payload=PayloadEncoder()) == plain
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"encoding": "gzip"}, {"alphabet": "base32"}, {"encoding": "zlib", "level": 10}]
+)
+def test_payload_invalid_arguments(kwargs) -> None:
+    with pytest.raises(ValueError):
+        PayloadEncoder(**kwargs)
+
+
+@pytest.mark.parametrize("prelude_mode", ["tempdir", "memory"])
+@pytest.mark.parametrize("encoder", _ENCODERS, ids=repr)
+def test_payload_script_runs(chk_script_output, prelude_mode, encoder) -> None:
+    chk_script_output(
+        script_path="explicit_relative_import_from_parent_package/hello",
+        expected_output=b"Hello\n",
+        prelude_mode=prelude_mode,
+        payload=encoder,
+        bytecode_targets=[None],
+    )
+
+
+def test_payload_is_decoded_on_first_import(tmp_path: Path) -> None:
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "used.py").write_text("VALUE = 'used'\n")
+    (src / "unused.py").write_text("VALUE = 'unused'\n")
+    main = src / "main.py"
+    main.write_text("import used\nprint(used.VALUE, sorted(__scriptmerge_importer.encodings))\n")
+    output = script(
+        str(main),
+        add_python_modules=["unused"],
+        prelude_mode="memory",
+        payload=PayloadEncoder("zlib"),
+    )
+    assert set(re.findall(r"encoding='([^']*)'", output)) == {"zlib+base85"}
+    bundle = tmp_path / "bundle.py"
+    bundle.write_text(output, encoding="utf-8")
+    result = subprocess.run([sys.executable, str(bundle)], capture_output=True, check=True)
+    assert result.stdout.strip() == b"used ['unused.py']"
+
+
+def test_cli_payload(find_script, tmp_path: Path) -> None:
+    temp_file = tmp_path / "hello.py"
+    cmd_args = [
+        "scriptmerge",
+        "compilepy",
+        find_script("script_using_module_in_package/hello"),
+        "-o",
+        str(temp_file),
+        "--payload",
+        "lzma",
+        "--payload-level",
+        "9",
+        "--payload-alphabet",
+        "base64",
+    ]
+    subprocess.run(cmd_args, check=True)
+    assert "encoding='lzma+base64'" in temp_file.read_text(encoding="utf-8")
+    result = subprocess.run([sys.executable, str(temp_file)], capture_output=True)
+    assert result.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
@@ -0,0 +1,115 @@
+from __future__ import annotations
+from pathlib import Path
+import os
+import subprocess
+import sys
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+from scriptmerge.merge_py import script
+
+
+def _bundle(find_script, tmp_path: Path, name: str = "hello.py", **kwargs) -> Path:
+    output = script(
+        find_script("explicit_relative_import_from_parent_package/hello"),
+        prelude_mode="cache",
+        **kwargs,
+    )
+    bundle = tmp_path / name
+    bundle.write_text(output, encoding="utf-8")
+    return bundle
+
+
+def _env(cache_dir: Path, **extra: str) -> dict:
+    env = dict(os.environ)
+    env["SCRIPTMERGE_BUNDLE_CACHE"] = str(cache_dir)
+    env.update(extra)
+    return env
+
+
+def _run(bundle: Path, env: dict) -> bytes:
+    result = subprocess.run([sys.executable, str(bundle)], capture_output=True, env=env)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.replace(b"\r\n", b"\n")
+
+
+def _entries(cache_dir: Path):
+    return sorted(p.name for p in cache_dir.iterdir() if p.is_dir())
+
+
+def test_cache_prelude_extracts_once(find_script, tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+    bundle = _bundle(find_script, tmp_path, bytecode_targets=[None])
+    assert _run(bundle, _env(cache_dir)) == b"Hello\n"
+    (entry,) = _entries(cache_dir)
+    assert entry.startswith("hello.py-")
+    init_py = cache_dir / entry / "greetings" / "__init__.py"
+    inode = init_py.stat().st_ino
+    assert list((cache_dir / entry / "greetings" / "__pycache__").glob("__init__.*.pyc"))
+
+    assert _run(bundle, _env(cache_dir)) == b"Hello\n"
+    assert _entries(cache_dir) == [entry]
+    assert init_py.stat().st_ino == inode
+
+
+def test_cache_prelude_concurrent_start(find_script, tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+    bundle = _bundle(find_script, tmp_path)
+    procs = [
+        subprocess.Popen([sys.executable, str(bundle)], stdout=subprocess.PIPE, env=_env(cache_dir))
+        for _ in range(12)
+    ]
+    outputs = [proc.communicate()[0].replace(b"\r\n", b"\n") for proc in procs]
+    assert outputs == [b"Hello\n"] * len(procs)
+    assert all(proc.returncode == 0 for proc in procs)
+    # one entry, no staging directories left behind
+    assert len(_entries(cache_dir)) == 1
+
+
+def test_cache_prelude_evicts_old_versions(find_script, tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+    env = _env(cache_dir, SCRIPTMERGE_BUNDLE_CACHE_KEEP="2")
+    bundle = _bundle(find_script, tmp_path)
+    for version in range(4):
+        with open(bundle, "a", encoding="utf-8") as f:
+            f.write(f"\n# version {version}\n")
+        assert _run(bundle, env) == b"Hello\n"
+    assert len(_entries(cache_dir)) == 2
+    assert len(list(cache_dir.glob("*.lock"))) == 2
+
+
+def test_cache_prelude_repairs_entry(find_script, tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+    bundle = _bundle(find_script, tmp_path)
+    _run(bundle, _env(cache_dir))
+    (entry,) = _entries(cache_dir)
+    (cache_dir / entry / "greetings" / "messages.py").unlink()
+    assert _run(bundle, _env(cache_dir)) == b"Hello\n"
+    assert (cache_dir / entry / "greetings" / "messages.py").exists()
+
+
+def test_cache_prelude_falls_back_to_temp_dir(find_script, tmp_path: Path) -> None:
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("")
+    bundle = _bundle(find_script, tmp_path)
+    assert _run(bundle, _env(not_a_dir / "cache")) == b"Hello\n"
+
+
+def test_cli_prelude_cache(find_script, tmp_path: Path) -> None:
+    temp_file = tmp_path / "hello.py"
+    cmd_args = [
+        "scriptmerge",
+        "compilepy",
+        find_script("script_using_module_in_package/hello"),
+        "-o",
+        str(temp_file),
+        "--prelude",
+        "cache",
+        "--payload",
+        "zlib",
+    ]
+    subprocess.run(cmd_args, check=True)
+    assert "__scriptmerge_finish_modules()" in temp_file.read_text(encoding="utf-8")
+    assert _run(temp_file, _env(tmp_path / "cache")) == b"Hello\n"
@@ -0,0 +1,98 @@
+from __future__ import annotations
+from pathlib import Path
+import subprocess
+import sys
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+from scriptmerge.merge_py import script
+
+
+def _make_project(root: Path) -> Path:
+    pkg = root / "pkg"
+    (pkg / "sub").mkdir(parents=True)
+    (pkg / "__init__.py").write_text("NAME = 'pkg'\n")
+    # no __init__.py, the bundle makes every directory a package
+    (pkg / "sub" / "boom.py").write_text("def explode():\n    raise RuntimeError('boom')\n")
+    (pkg / "info.py").write_text(
+        "import os\n"
+        "import importlib.resources\n"
+        "ON_DISK = os.path.exists(__file__)\n"
+        "SOURCE = (importlib.resources.files('pkg') / 'info.py').read_text()\n"
+    )
+    main = root / "main.py"
+    main.write_text(
+        "import sys\n"
+        "import pkg\n"
+        "import pkg.info\n"
+        "import pkg.sub.boom\n"
+        "print(pkg.NAME)\n"
+        "print(pkg.info.ON_DISK)\n"
+        "print(pkg.info.__spec__.origin == pkg.info.__file__)\n"
+        "print(pkg.__path__[0].endswith('pkg'))\n"
+        "print(pkg.info.SOURCE.startswith('import os'))\n"
+        "if len(sys.argv) > 1:\n"
+        "    pkg.sub.boom.explode()\n"
+    )
+    return main
+
+
+def _run(tmp_path: Path, *args: str) -> subprocess.CompletedProcess:
+    main = _make_project(tmp_path / "src")
+    out = tmp_path / "bundle.py"
+    out.write_text(script(str(main), prelude_mode="memory"), encoding="utf-8")
+    return subprocess.run(
+        [sys.executable, str(out), *args], capture_output=True, text=True, cwd=str(tmp_path)
+    )
+
+
+def test_memory_prelude_imports_from_memory(tmp_path: Path) -> None:
+    result = _run(tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == ["pkg", "False", "True", "True", "True"]
+
+
+def test_memory_prelude_traceback_shows_source(tmp_path: Path) -> None:
+    result = _run(tmp_path, "explode")
+    assert result.returncode != 0
+    bundled_file = str(tmp_path / "bundle.py" / "pkg" / "sub" / "boom.py")
+    assert f'File "{bundled_file}", line 2, in explode' in result.stderr
+    assert "raise RuntimeError('boom')" in result.stderr
+
+
+def test_memory_prelude_runs_packages(chk_script_output) -> None:
+    chk_script_output(
+        script_path="explicit_relative_import_from_parent_package/hello",
+        expected_output=b"Hello\n",
+        prelude_mode="memory",
+    )
+
+
+def test_memory_prelude_does_not_use_temp_dir(get_script_str) -> None:
+    result = get_script_str("script_using_module_in_package/hello", prelude_mode="memory")
+    assert "__scriptmerge_memory_importer" in result
+    assert "__scriptmerge_temporary_dir" not in result
+
+
+def test_unknown_prelude_mode(find_script) -> None:
+    with pytest.raises(ValueError):
+        script(find_script("single_file/hello"), prelude_mode="zip")
+
+
+def test_cli_prelude_memory(find_script, tmp_path: Path) -> None:
+    temp_file = tmp_path / "hello.py"
+    cmd_args = [
+        "scriptmerge",
+        "compilepy",
+        find_script("script_using_module_in_package/hello"),
+        "-o",
+        str(temp_file),
+        "--prelude",
+        "memory",
+    ]
+    subprocess.run(cmd_args, check=True)
+    assert "__scriptmerge_memory_importer" in temp_file.read_text(encoding="utf-8")
+    result = subprocess.run([sys.executable, str(temp_file)], capture_output=True)
+    assert result.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
@@ -0,0 +1,61 @@
+from __future__ import annotations
+from pathlib import Path
+import io
+import subprocess
+import sys
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+import scriptmerge
+from scriptmerge.merge_py import script, script_to
+
+
+class _RecordingSink(io.StringIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.chunks = []
+
+    def write(self, s: str) -> int:
+        self.chunks.append(len(s))
+        return super().write(s)
+
+
+def test_script_to_text_stream_matches_script(find_script) -> None:
+    script_path = find_script("explicit_relative_import_from_parent_package/hello")
+    sink = _RecordingSink()
+    script_to(sink, script_path)
+    assert sink.getvalue() == script(script_path)
+    # shebang, prelude, one chunk per module and the script
+    assert len(sink.chunks) >= 5
+    assert max(sink.chunks) < len(sink.getvalue())
+
+
+def test_script_to_binary_stream_and_path(find_script, tmp_path: Path) -> None:
+    script_path = find_script("script_using_module_in_package/hello")
+    expected = script(script_path).encode("utf-8")
+    buffer = io.BytesIO()
+    script_to(buffer, script_path)
+    assert buffer.getvalue() == expected
+
+    out = tmp_path / "hello.py"
+    scriptmerge.script_to(out, script_path)
+    assert out.read_bytes() == expected
+
+
+def test_script_to_removes_partial_file(find_script, tmp_path: Path) -> None:
+    out = tmp_path / "hello.py"
+    with pytest.raises(ValueError):
+        script_to(out, find_script("single_file/hello"), prelude_mode="zip")
+    assert not out.exists()
+
+
+def test_cli_output_to_stdout(find_script) -> None:
+    script_path = find_script("explicit_relative_import_from_parent_package/hello")
+    result = subprocess.run(
+        ["scriptmerge", "compilepy", script_path, "-o", "-"], capture_output=True, check=True
+    )
+    assert result.stdout.decode("utf-8") == script(script_path)
+    run = subprocess.run([sys.executable, "-"], input=result.stdout, capture_output=True)
+    assert run.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
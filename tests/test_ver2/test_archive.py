@@ -0,0 +1,157 @@
+from __future__ import annotations
+from pathlib import Path
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import zipfile
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+from scriptmerge import merge_pyz
+from scriptmerge.merge_pyz import script
+
+
+def test_archive_without_staging_dir(find_script, monkeypatch, tmp_path: Path) -> None:
+    def no_staging(*args, **kwargs):
+        raise AssertionError("staging directory created")
+
+    monkeypatch.setattr(tempfile, "TemporaryDirectory", no_staging)
+    output = script(find_script("explicit_relative_import_from_parent_package/hello"))
+    assert output.startswith(b"#!/usr/bin/env python3\n")
+    archive = zipfile.ZipFile(io.BytesIO(output))
+    names = archive.namelist()
+    assert len(names) == len(set(names))
+    assert names[:2] == ["__main__.py", "__init__.py"]
+    assert "greetings/" in names
+    assert "greetings/__init__.py" in names
+
+    out = tmp_path / "hello.pyz"
+    out.write_bytes(output)
+    result = subprocess.run([sys.executable, str(out)], capture_output=True, check=True)
+    assert result.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
+
+
+def test_archive_synthesizes_package_init() -> None:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        writer = merge_pyz._ArchiveWriter(archive)
+        writer.write("a/b/c.py", b"c = 1\n")
+        writer.write("a/__init__.py", b"a = 1\n")
+        writer.write("a/__init__.py", b"again\n")
+        writer.write_packages()
+    archive = zipfile.ZipFile(buffer)
+    assert archive.namelist() == [
+        "a/",
+        "a/b/",
+        "a/b/c.py",
+        "a/__init__.py",
+        "a/b/__init__.py",
+    ]
+    assert archive.read("a/__init__.py") == b"a = 1\n"
+    assert archive.read("a/b/__init__.py") == b"\n"
+
+
+def test_archive_includes_files_from_callback_dir(find_script) -> None:
+    def on_callback(source, args) -> None:
+        if args.name == merge_pyz.CALLBACK_GENERATING_MAIN_PY_FILE:
+            data_dir = os.path.join(args.event_data["dir"], "data")
+            os.mkdir(data_dir)
+            with open(os.path.join(data_dir, "values.txt"), "wb") as f:
+                f.write(b"1 2 3\n")
+            with open(os.path.join(args.event_data["dir"], "__main__.py"), "wb") as f:
+                f.write(b"replaced\n")
+
+    output = script(
+        find_script("explicit_relative_import_from_parent_package/hello"),
+        callback=on_callback,
+    )
+    archive = zipfile.ZipFile(io.BytesIO(output))
+    assert archive.read("data/values.txt") == b"1 2 3\n"
+    # __main__.py is written from the script, as before.
+    assert archive.read("__main__.py") != b"replaced\n"
+
+
+class _Unseekable(io.RawIOBase):
+    def __init__(self) -> None:
+        self.data = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.data += b
+        return len(b)
+
+
+def _entries(output: bytes):
+    archive = zipfile.ZipFile(io.BytesIO(output))
+    assert archive.testzip() is None
+    return [(info.filename, info.compress_type, info.CRC, info.compress_size) for info in archive.infolist()]
+
+
+def test_archive_deflate(find_script, tmp_path: Path) -> None:
+    script_path = find_script("explicit_relative_import_from_parent_package/hello")
+    stored = zipfile.ZipFile(io.BytesIO(script(script_path)))
+    output = script(script_path, compression="deflate", compress_level=9)
+    archive = zipfile.ZipFile(io.BytesIO(output))
+    assert archive.namelist() == stored.namelist()
+    for info in archive.infolist():
+        assert archive.read(info) == stored.read(info.filename)
+        if not info.is_dir():
+            assert info.compress_type == zipfile.ZIP_DEFLATED
+
+    # written in the same order, with the same data, by a stream that cannot seek
+    stream = _Unseekable()
+    merge_pyz.script_to(stream, script_path, compression="deflate", compress_level=9)
+    assert _entries(bytes(stream.data)) == _entries(output)
+
+    out = tmp_path / "hello.pyz"
+    out.write_bytes(output)
+    result = subprocess.run([sys.executable, str(out)], capture_output=True, check=True)
+    assert result.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
+
+
+def test_archive_deflate_matches_zipfile() -> None:
+    data = [("pkg/mod_%d.py" % i, ("value = %r\n" % list(range(i * 50))).encode()) for i in range(200)]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        writer = merge_pyz._ArchiveWriter(archive, compression=zipfile.ZIP_DEFLATED)
+        for name, contents in data:
+            writer.write(name, contents)
+    expected = io.BytesIO()
+    with zipfile.ZipFile(expected, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, contents in data:
+            archive.writestr(name, contents)
+    assert _entries(buffer.getvalue())[1:] == _entries(expected.getvalue())
+
+
+def test_archive_compression_arguments(find_script) -> None:
+    script_path = find_script("explicit_relative_import_from_parent_package/hello")
+    with pytest.raises(ValueError):
+        script(script_path, compression="bzip2")
+    with pytest.raises(ValueError):
+        script(script_path, compression="deflate", compress_level=10)
+
+
+def test_cli_compress(find_script, tmp_path: Path) -> None:
+    out = tmp_path / "hello.pyz"
+    cmd_args = [
+        "scriptmerge",
+        "compilepyz",
+        find_script("explicit_relative_import_from_parent_package/hello"),
+        "-o",
+        str(out),
+        "--compress",
+        "deflate",
+        "--compress-level",
+        "6",
+    ]
+    subprocess.run(cmd_args, check=True)
+    archive = zipfile.ZipFile(out)
+    assert archive.getinfo("__main__.py").compress_type == zipfile.ZIP_DEFLATED
+    result = subprocess.run([sys.executable, str(out)], capture_output=True, check=True)
+    assert result.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
@@ -0,0 +1,82 @@
+from __future__ import annotations
+from pathlib import Path
+import io
+import os
+import shutil
+import subprocess
+import sys
+import zipfile
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+import _bisect
+
+from scriptmerge.extensions import EXTENSION_LOADER_MODULE, insert_loader_import
+from scriptmerge.merge_pyz import script
+
+_SCRIPT = """from fastpkg import _bisect
+print(_bisect.bisect_right([1, 2, 3], 2), os.path.basename(os.path.dirname(_bisect.__file__)))
+"""
+
+_needs_bisect_file = pytest.mark.skipif(
+    getattr(_bisect, "__file__", None) is None, reason="_bisect is built in"
+)
+
+
+@pytest.fixture
+def extension_script(tmp_path: Path) -> Path:
+    # a copy of a stdlib extension module, in a package of its own
+    package = tmp_path / "src" / "fastpkg"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    shutil.copy(_bisect.__file__, package)
+    hello = tmp_path / "src" / "hello"
+    hello.write_text('"""Doc."""\nfrom __future__ import annotations\nimport os\n' + _SCRIPT)
+    return hello
+
+
+def _run(archive: Path, cache_dir: Path) -> bytes:
+    env = dict(os.environ)
+    env["SCRIPTMERGE_EXTENSION_CACHE"] = str(cache_dir)
+    result = subprocess.run([sys.executable, str(archive)], capture_output=True, env=env)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+@_needs_bisect_file
+@pytest.mark.parametrize("options", [{}, {"bytecode_only": True, "compression": "deflate"}])
+def test_extension_module_is_bundled(extension_script: Path, tmp_path: Path, options: dict) -> None:
+    output = script(str(extension_script), **options)
+    names = zipfile.ZipFile(io.BytesIO(output)).namelist()
+    assert "fastpkg/" + os.path.basename(_bisect.__file__) in names
+    archive = tmp_path / "hello.pyz"
+    archive.write_bytes(output)
+    shutil.rmtree(extension_script.parent)
+
+    cache_dir = tmp_path / "cache"
+    out = _run(archive, cache_dir)
+    (key,) = os.listdir(cache_dir)
+    assert out == f"2 {key}".encode()
+
+
+def test_insert_loader_import() -> None:
+    line = f"import {EXTENSION_LOADER_MODULE}  # loads the bundled extension modules\n".encode()
+    assert insert_loader_import(b"import os\n") == line + b"import os\n"
+    assert (
+        insert_loader_import(b"#!/usr/bin/env python3\n# -*- coding: utf-8 -*-\nimport os\n")
+        == b"#!/usr/bin/env python3\n# -*- coding: utf-8 -*-\n" + line + b"import os\n"
+    )
+    source = b'"""Doc\nstring."""\nfrom __future__ import annotations\nimport os\n'
+    assert (
+        insert_loader_import(source)
+        == b'"""Doc\nstring."""\nfrom __future__ import annotations\n' + line + b"import os\n"
+    )
+    assert insert_loader_import(b'"""Doc."""') == b'"""Doc."""\n' + line
+
+
+def test_no_loader_without_extension_modules(find_script) -> None:
+    output = script(find_script("script_using_module_in_package/hello"))
+    names = zipfile.ZipFile(io.BytesIO(output)).namelist()
+    assert EXTENSION_LOADER_MODULE + ".py" not in names
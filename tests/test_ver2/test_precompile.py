@@ -0,0 +1,136 @@
+from __future__ import annotations
+from pathlib import Path
+import importlib.util
+import io
+import os
+import subprocess
+import sys
+import zipfile
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+from scriptmerge.merge_pyz import script
+
+
+def _run(archive: Path, *args: str) -> bytes:
+    result = subprocess.run([sys.executable, *args, str(archive)], capture_output=True, check=True)
+    return result.stdout.replace(b"\r\n", b"\n")
+
+
+def test_precompile_pyc_is_used(find_script, tmp_path: Path) -> None:
+    output = script(find_script("script_with_single_local_import/hello"), precompile=True)
+    archive = zipfile.ZipFile(io.BytesIO(output))
+    names = archive.namelist()
+    for name in ("__main__.py", "__init__.py", "greeting.py"):
+        assert name in names
+        pyc = archive.read(name + "c")
+        assert pyc[:4] == importlib.util.MAGIC_NUMBER
+        assert pyc[4:8] == b"\x01\x00\x00\x00"
+
+    # change the source only, the bytecode still says Hello.
+    out = tmp_path / "hello.pyz"
+    with zipfile.ZipFile(out, "w") as changed:
+        for info in archive.infolist():
+            data = archive.read(info)
+            if info.filename == "greeting.py":
+                data = b'message = "Source"\n'
+            changed.writestr(info, data)
+    assert _run(out) == b"Hello\n"
+    # loaded at any optimization level
+    assert _run(out, "-O") == b"Hello\n"
+
+
+def test_bytecode_only(find_script, tmp_path: Path) -> None:
+    output = script(
+        find_script("explicit_relative_import_from_parent_package/hello"),
+        bytecode_only=True,
+        compression="deflate",
+    )
+    names = zipfile.ZipFile(io.BytesIO(output)).namelist()
+    assert not [name for name in names if name.endswith(".py")]
+    assert "__main__.pyc" in names
+    assert "greetings/__init__.pyc" in names
+    out = tmp_path / "hello.pyz"
+    out.write_bytes(output)
+    assert _run(out) == b"Hello\n"
+
+
+def test_precompile_invalid_optimize(find_script) -> None:
+    with pytest.raises(ValueError):
+        script(find_script("script_with_single_local_import/hello"), precompile=True, precompile_optimize=3)
+
+
+def test_cli_precompile(find_script, tmp_path: Path) -> None:
+    out = tmp_path / "hello.pyz"
+    cmd_args = [
+        "scriptmerge",
+        "compilepyz",
+        find_script("script_with_single_local_import/hello"),
+        "-o",
+        str(out),
+        "--precompile",
+        sys.executable,
+        "--precompile-optimize",
+        "2",
+        "--bytecode-only",
+    ]
+    subprocess.run(cmd_args, check=True)
+    names = zipfile.ZipFile(out).namelist()
+    assert sorted(names) == ["__init__.pyc", "__main__.pyc", "_scriptmerge_bytecode.pyc", "greeting.pyc"]
+    assert _run(out) == b"Hello\n"
+
+
+def _traceback(archive: Path) -> str:
+    result = subprocess.run([sys.executable, str(archive)], capture_output=True, text=True)
+    assert result.returncode == 1
+    lines = [line.strip() for line in result.stderr.splitlines() if line.strip().startswith("File ")]
+    return "\n".join(lines).replace(str(archive), "ARCHIVE")
+
+
+@pytest.mark.parametrize("option", ["precompile", "bytecode_only"])
+def test_precompile_traceback(tmp_path: Path, option: str) -> None:
+    # the code of a .pyc has the file name the source would get, with the archive in front.
+    pkg = tmp_path / "src" / "pkg"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "mod.py").write_text("def boom():\n    raise ValueError('boom')\n")
+    main = tmp_path / "src" / "main.py"
+    main.write_text('"""Doc."""\nfrom __future__ import annotations\nfrom pkg import mod\n\nmod.boom()\n')
+    source_only = tmp_path / "source.pyz"
+    source_only.write_bytes(script(str(main)))
+    precompiled = tmp_path / "precompiled.pyz"
+    precompiled.write_bytes(script(str(main), **{option: True}))
+
+    expected = _traceback(source_only)
+    # __main__.py starts with the shebang of the archive
+    assert f'File "ARCHIVE{os.sep}__main__.py", line 6, in <module>' in expected
+    assert f'File "ARCHIVE{os.sep}pkg{os.sep}mod.py", line 2, in boom' in expected
+    assert _traceback(precompiled) == expected
+
+
+@pytest.mark.parametrize(
+    "remove",
+    [
+        # importlib keeps its own reference to _imp, only the loader sees the empty module.
+        "sys.modules['_imp'] = types.ModuleType('_imp')",
+        "del sys._getframe",
+    ],
+)
+def test_precompile_without_private_api(tmp_path: Path, remove: str) -> None:
+    # the bytecode loader uses private functions, an interpreter without them runs the archive
+    # with the importer zipimport gives it.
+    pkg = tmp_path / "src" / "pkg"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "mod.py").write_text("def hello():\n    return 'Hello'\n")
+    main = tmp_path / "src" / "main.py"
+    main.write_text("from pkg import mod\nprint(mod.hello())\n")
+    archive = tmp_path / "precompiled.pyz"
+    archive.write_bytes(script(str(main), precompile=True))
+    run = f"runpy.run_path({str(archive)!r}, run_name='__main__')"
+    code = f"import runpy, sys, types\n{remove}\n{run}\n"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.stderr == ""
+    assert result.stdout == "Hello\n"
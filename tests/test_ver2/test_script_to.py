@@ -0,0 +1,50 @@
+from __future__ import annotations
+from pathlib import Path
+import io
+import subprocess
+import sys
+import zipfile
+import pytest
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
+
+import scriptmerge
+from scriptmerge.merge_pyz import script, script_to
+
+
+def test_script_to_matches_script(find_script, tmp_path: Path) -> None:
+    script_path = find_script("explicit_relative_import_from_parent_package/hello")
+    expected = zipfile.ZipFile(io.BytesIO(script(script_path)))
+    buffer = io.BytesIO()
+    script_to(buffer, script_path)
+    actual = zipfile.ZipFile(io.BytesIO(buffer.getvalue()))
+    assert sorted(actual.namelist()) == sorted(expected.namelist())
+    for name in expected.namelist():
+        assert actual.read(name) == expected.read(name)
+
+    out = tmp_path / "hello.pyz"
+    scriptmerge.script_to(out, script_path, pyz_out=True)
+    result = subprocess.run([sys.executable, str(out)], capture_output=True, check=True)
+    assert result.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
+
+
+def test_cli_pyz_to_stdout(find_script, tmp_path: Path) -> None:
+    script_path = find_script("explicit_relative_import_from_parent_package/hello")
+    result = subprocess.run(
+        ["scriptmerge", "compilepyz", script_path, "-o", "-"], capture_output=True, check=True
+    )
+    out = tmp_path / "hello.pyz"
+    out.write_bytes(result.stdout)
+    run = subprocess.run([sys.executable, str(out)], capture_output=True, check=True)
+    assert run.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
+
+
+@pytest.mark.parametrize("pyz_out", [False, True])
+def test_script_to_include_main_py(find_script, tmp_path: Path, pyz_out: bool) -> None:
+    script_path = find_script("explicit_relative_import_from_parent_package/hello")
+    out = tmp_path / ("hello.pyz" if pyz_out else "hello.py")
+    scriptmerge.script_to(out, script_path, pyz_out=pyz_out, include_main_py=pyz_out)
+    assert scriptmerge.script(script_path, pyz_out=pyz_out, include_main_py=pyz_out)
+    result = subprocess.run([sys.executable, str(out)], capture_output=True, check=True)
+    assert result.stdout.replace(b"\r\n", b"\n") == b"Hello\n"
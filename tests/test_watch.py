@@ -0,0 +1,146 @@
+from __future__ import annotations
+import os
+import subprocess
+import sys
+import pytest
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+from scriptmerge.watch import Watcher
+
+
+def _edit(path, text: str) -> None:
+    # the stat of the file must change even on a file system with coarse timestamps.
+    stat = os.stat(path)
+    path.write_text(text)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def _run(path) -> str:
+    return subprocess.run([sys.executable, str(path)], capture_output=True, text=True).stdout
+
+
+@pytest.mark.parametrize("pyz_out", [False, True])
+def test_watcher_rebuilds_changed_module(package_script, tmp_path, pyz_out):
+    out = tmp_path / ("out.pyz" if pyz_out else "out.py")
+    watcher = Watcher(str(package_script), out, pyz_out=pyz_out, clean=True)
+    watcher.build()
+    assert _run(out) == "Hello\n"
+    assert watcher.poll() == []
+    graph = watcher.graph
+    parses = watcher.sources.parses
+
+    greet = package_script.parent / "pkg" / "greet.py"
+    _edit(greet, "def hello():\n    return 'Hi'  # changed\n")
+    changed = watcher.poll()
+    assert changed == [str(greet)]
+    watcher.build(changed)
+    assert _run(out) == "Hi\n"
+    # only the changed module is parsed, and its imports did not change the graph.
+    assert watcher.sources.parses == parses + 1
+    assert watcher.graph is graph
+
+    _edit(greet, "from . import extra\ndef hello():\n    return extra.NAME\n")
+    watcher.build(watcher.poll())
+    assert _run(out) == "extra\n"
+    assert watcher.graph is not graph
+    assert "pkg.extra" in watcher.graph
+    assert watcher.sources.parses == parses + 3
+
+
+def test_watcher_recovers_from_errors(package_script, tmp_path):
+    out = tmp_path / "out.py"
+    watcher = Watcher(str(package_script), out)
+    watcher.build()
+
+    greet = package_script.parent / "pkg" / "greet.py"
+    _edit(greet, "def hello(:\n")
+    with pytest.raises(SyntaxError):
+        watcher.build(watcher.poll())
+    assert isinstance(watcher.error, SyntaxError)
+    assert watcher.result is None
+    # the last output is kept, and the broken file is not built again until it changes.
+    assert _run(out) == "Hello\n"
+    assert watcher.poll() == []
+
+    _edit(greet, "def hello():\n    return 'Fixed'\n")
+    watcher.build(watcher.poll())
+    assert watcher.error is None
+    assert _run(out) == "Fixed\n"
+
+
+@pytest.mark.parametrize("module", ["plugin.py", "pkg/plugin.py"])
+def test_watcher_finds_added_module(package_script, module):
+    src = package_script.parent
+    name = module[: -len(".py")].replace("/", ".")
+    package_script.write_text(
+        f"try:\n    import {name} as plugin\nexcept ImportError:\n    plugin = None\n"
+        "print(getattr(plugin, 'NAME', None))\n"
+    )
+    # the output is written next to the script, which is not a change.
+    watcher = Watcher(str(package_script), src / "out.py")
+    watcher.build()
+    assert _run(src / "out.py") == "None\n"
+    assert watcher.poll() == []
+
+    # a module that satisfies an import which was not found before
+    (src / module).write_text("NAME = 'plugin'\n")
+    changed = watcher.poll()
+    assert str((src / module).parent) in changed
+    watcher.build(changed)
+    assert name in watcher.graph
+    assert _run(src / "out.py") == "plugin\n"
+
+
+def test_watcher_ignores_own_outputs(package_script):
+    src = package_script.parent
+    depfile = src / "main.d"
+    # the output and the depfile are written next to the script, in a polled directory.
+    watcher = Watcher(str(package_script), src / "out.py", depfile=depfile)
+    watcher.build()
+    assert depfile.read_text().startswith(f"{src / 'out.py'}:")
+    assert watcher.poll() == []
+    watcher.build([])
+    assert watcher.poll() == []
+
+    (src / "notes.txt").write_text("a file that is not the output\n")
+    assert watcher.poll() == [str(src)]
+
+
+def test_watcher_relative_script(package_script, monkeypatch):
+    src = package_script.parent
+    monkeypatch.chdir(src)
+    package_script.write_text(
+        "try:\n    import plugin\nexcept ImportError:\n    plugin = None\n"
+        "print(getattr(plugin, 'NAME', None))\n"
+    )
+    watcher = Watcher("main.py", "out.py")
+    watcher.build()
+    assert _run(src / "out.py") == "None\n"
+    assert watcher.poll() == []
+
+    (src / "plugin.py").write_text("NAME = 'plugin'\n")
+    changed = watcher.poll()
+    assert str(src) in changed
+    watcher.build(changed)
+    assert "plugin" in watcher.graph
+    assert _run(src / "out.py") == "plugin\n"
+
+
+def test_cli_watch(package_script, tmp_path):
+    out = tmp_path / "out.py"
+    process = subprocess.Popen(
+        ["scriptmerge", "watch", str(package_script), "-o", str(out), "--no-cache", "--interval", "0.05"],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert process.stderr.readline().startswith(f"built {out} in ")
+        _edit(package_script.parent / "pkg" / "greet.py", "def hello():\n    return 'Hi'\n")
+        assert process.stderr.readline().endswith(", 1 changed\n")
+        assert _run(out) == "Hi\n"
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        process.stderr.close()